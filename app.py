@@ -14,8 +14,17 @@ from models import (
     JobHousingPhoto, RegistrationRequest, Notification, create_notification_for_users
 )
 from sqlalchemy import func
-from auth_utils import login_required
+from auth_utils import login_required, get_principal, invalidate_principal
+from counters import get_header_counters, registration_status_changed
+from perf import init_perf
+from metrics import init_metrics, render as render_metrics
+from comment_seen import init_comment_seen
+import refcache
+import storage
 from config import Config
+from commands import register_commands
+from scheduler import start_background as start_scheduler
+import hmac
 import os
 
 # =====================
@@ -29,6 +38,10 @@ app.config.from_object(Config)
 engine = get_engine()
 init_db()
 db.configure(bind=engine)
+init_perf(app, engine)
+init_metrics(app, engine)
+# Регистрируется раньше shutdown_session: буфер сбрасывается после закрытия сессии запроса
+init_comment_seen(app, engine)
 
 # =====================
 #   CONTEXT PROCESSORS
@@ -37,15 +50,14 @@ db.configure(bind=engine)
 @app.context_processor
 def inject_notifications():
     """Inject unread notifications count for the current user into all templates."""
-    user = getattr(g, "user", None)
-    unread = 0
-    if user is not None:
-        unread = (
-            db.session.query(Notification)
-            .filter_by(user_id=user.id, is_read=False)
-            .count()
-        )
-    return {"unread_notifications": unread}
+    # Значение уже прочитано из user_counters в load_user_into_g
+    return {"unread_notifications": getattr(g, "notifications_unread_count", 0)}
+
+
+@app.context_processor
+def inject_file_version():
+    # url_for(..., v=file_version(путь)) — версионированный URL файла, см. storage.version_of
+    return {"file_version": storage.version_of}
 
 
 @app.context_processor
@@ -58,55 +70,53 @@ def inject_brand():
 #      BEFORE REQUEST
 # =====================
 
+# Отдача файлов: шапку не рисуют, счётчики им не нужны (304 на картинку обходится без базы)
+FILE_ENDPOINTS = frozenset({
+    "jobs.job_thumb",
+    "jobs.job_housing_photo",
+    "candidates.candidate_doc",
+    "partner.partner_doc",
+    "finance.finance_payment_file",
+})
+
+
 @app.before_request
 def load_user_into_g():
     g.user = None
     uid = session.get("uid")
     if uid:
-        g.user = db.session.get(User, uid)
+        # Кэшированный principal вместо загрузки User из БД на каждый запрос
+        g.user = get_principal(uid)
 
     # Счётчики для шапки
     g.inbox_count = 0
     g.news_unread_count = 0
+    g.notifications_unread_count = 0
 
     # Флаги и данные профиля партнёра
     g.partner_profile_incomplete = False
     g.partner_profile_missing_fields = []
 
-    if g.user and g.user.role in ("recruiter", "coordinator", "director"):
-        g.inbox_count = (
-            db.session.query(func.count(Candidate.id))
-            .filter(Candidate.status == "Подан")
-            .scalar()
-        )
-
-    if g.user:
-        g.news_unread_count = (
-            db.session.query(func.count(News.id))
-            .outerjoin(
-                NewsRead,
-                (NewsRead.news_id == News.id) & (NewsRead.user_id == g.user.id)
-            )
-            .filter(News.is_published == True, NewsRead.id.is_(None))
-            .scalar()
-        )
+    if g.user and request.endpoint not in FILE_ENDPOINTS:
+        # Поддерживаемые счётчики: одна строка вместо трёх COUNT-запросов
+        counters = get_header_counters(g.user.id)
+        g.news_unread_count = counters["news_unread"]
+        g.notifications_unread_count = counters["notifications_unread"]
+        if g.user.role in ("recruiter", "coordinator", "director"):
+            g.inbox_count = counters["inbox"]
 
-        # Проверка заполненности профиля партнёра
+        # Проверка заполненности профиля партнёра (посчитана при загрузке principal)
         if g.user.role == "partner":
-            required_fields = {
-                "bank_account": "Реквизиты счета",
-                "bank_name": "Банк",
-                "company_name": "Название компании",
-                "tax_id": "Tax ID / NIP",
-                "address": "Адрес",
-                "payout_note": "Комментарий по выплатам",
-            }
-            missing = []
-            for field, label in required_fields.items():
-                if not getattr(g.user, field, "").strip():
-                    missing.append(label)
-            g.partner_profile_missing_fields = missing
-            g.partner_profile_incomplete = bool(missing)
+            g.partner_profile_missing_fields = list(g.user.profile_missing_fields)
+            g.partner_profile_incomplete = g.user.profile_incomplete
+
+
+@app.teardown_appcontext
+def shutdown_session(exc=None):
+    # Не держим сессию (и транзакцию SQLite) между запросами
+    db.session.remove()
+
+
 # =====================
 #         ROUTES
 # =====================
@@ -135,12 +145,7 @@ def register():
         return redirect(url_for("main.index"))
 
     # Список рекрутёров для выбора в форме
-    recruiters = (
-        db.session.query(User)
-        .filter(User.role == "recruiter", User.is_active == True)
-        .order_by(User.name.asc())
-        .all()
-    )
+    recruiters = refcache.get("active_recruiters")
 
     if request.method == "POST":
         email = (request.form.get("email") or "").strip().lower()
@@ -194,6 +199,7 @@ def register():
             assigned_recruiter_id=assigned_recruiter_id,
         )
         db.session.add(req)
+        registration_status_changed(None, req.status)
         db.session.commit()
 
         # Уведомляем закреплённого рекрутёра о новой заявке
@@ -202,6 +208,7 @@ def register():
                 [req.assigned_recruiter_id],
                 f"Новая заявка на регистрацию партнёра {req.full_name or req.email} закреплена за вами."
             )
+            db.session.commit()
 
         return redirect(url_for("register_thanks"))
 
@@ -228,15 +235,17 @@ def change_password():
         new_password = (request.form.get("new_password") or "").strip()
         confirm_password = (request.form.get("confirm_password") or "").strip()
 
-        if not current_password or not check_password_hash(g.user.password_hash, current_password):
+        user = db.session.get(User, g.user.id)
+        if not current_password or not check_password_hash(user.password_hash, current_password):
             error = "Текущий пароль введён неверно."
         elif len(new_password) < 6:
             error = "Новый пароль должен быть не короче 6 символов."
         elif new_password != confirm_password:
             error = "Пароли не совпадают."
         else:
-            g.user.password_hash = generate_password_hash(new_password)
+            user.password_hash = generate_password_hash(new_password)
             db.session.commit()
+            invalidate_principal(user.id)
             flash("Пароль успешно обновлён.", "success")
             return redirect(url_for("main.index"))
 
@@ -265,6 +274,21 @@ from blueprints.relax import relax_bp
 from blueprints.training import training_bp
 
 
+@app.route("/metrics")
+def metrics_endpoint():
+    """Метрики для Prometheus (агрегированы по всем воркерам).
+
+    Доступ только с токеном Config.METRICS_TOKEN: в метриках бизнес-показатели
+    (входящие, неоплаченные выплаты, заявки). Пока токен не задан, эндпоинта нет.
+    """
+    token = app.config.get("METRICS_TOKEN") or ""
+    if not token:
+        abort(404)
+    if not hmac.compare_digest(request.headers.get("Authorization", "").encode(), f"Bearer {token}".encode()):
+        abort(403)
+    return render_metrics(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
+
 @app.route("/set-lang/<lang>")
 def set_lang(lang):
     if lang not in ["ru", "uk"]:
@@ -285,6 +309,10 @@ app.register_blueprint(notifications_bp)
 app.register_blueprint(relax_bp)
 app.register_blueprint(training_bp)
 
+register_commands(app)
+if Config.SCHEDULER_ENABLED:
+    start_scheduler(app, Config.SCHEDULER_POLL_SECONDS)
+
 # =====================
 #      RUN SERVER
 # =====================
@@ -1,6 +1,99 @@
+from dataclasses import dataclass
 from functools import wraps
+import threading
+import time
+
 from flask import g, redirect, url_for, session
 from models import db, User
+from config import Config
+
+
+# Обязательные поля профиля партнёра (поле -> подпись для шапки)
+PARTNER_PROFILE_REQUIRED_FIELDS = {
+    "bank_account": "Реквизиты счета",
+    "bank_name": "Банк",
+    "company_name": "Название компании",
+    "tax_id": "Tax ID / NIP",
+    "address": "Адрес",
+    "payout_note": "Комментарий по выплатам",
+}
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Неизменяемый «срез» пользователя для g.user.
+
+    Содержит только то, что нужно декораторам доступа и шапке. Для изменения
+    данных пользователя загружайте ORM-объект User явно.
+    """
+    id: int
+    role: str
+    name: str
+    note: str
+    is_blocked: bool
+    assigned_recruiter_id: int | None
+    profile_missing_fields: tuple = ()
+
+    @property
+    def profile_incomplete(self) -> bool:
+        return bool(self.profile_missing_fields)
+
+
+_principal_cache: dict[int, tuple[float, Principal]] = {}
+_principal_lock = threading.Lock()
+
+
+def _load_principal(user_id: int) -> Principal | None:
+    row = (
+        db.session.query(
+            User.id, User.role, User.name, User.note, User.is_blocked,
+            User.assigned_recruiter_id,
+            *[getattr(User, field) for field in PARTNER_PROFILE_REQUIRED_FIELDS],
+        )
+        .filter(User.id == user_id)
+        .first()
+    )
+    if row is None:
+        return None
+    missing = ()
+    if row.role == "partner":
+        missing = tuple(
+            label
+            for field, label in PARTNER_PROFILE_REQUIRED_FIELDS.items()
+            if not (getattr(row, field) or "").strip()
+        )
+    return Principal(
+        id=row.id,
+        role=row.role,
+        name=row.name,
+        note=row.note or "",
+        is_blocked=bool(row.is_blocked),
+        assigned_recruiter_id=row.assigned_recruiter_id,
+        profile_missing_fields=missing,
+    )
+
+
+def get_principal(user_id: int) -> Principal | None:
+    """Principal из кэша воркера (TTL Config.PRINCIPAL_CACHE_TTL) или из БД."""
+    now = time.monotonic()
+    with _principal_lock:
+        cached = _principal_cache.get(user_id)
+    if cached and cached[0] > now:
+        return cached[1]
+    principal = _load_principal(user_id)
+    if principal is not None:
+        with _principal_lock:
+            _principal_cache[user_id] = (now + Config.PRINCIPAL_CACHE_TTL, principal)
+    return principal
+
+
+def invalidate_principal(user_id: int | None = None) -> None:
+    """Сбросить кэш principal для пользователя (или для всех, если user_id=None)."""
+    with _principal_lock:
+        if user_id is None:
+            _principal_cache.clear()
+        else:
+            _principal_cache.pop(user_id, None)
 
 
 def load_user():
@@ -0,0 +1,75 @@
+"""Правила выплат партнёрам по трудоустройствам.
+
+Дата, с которой трудоустройство подлежит выплате (payable_from), и сумма к
+выплате (amount_effective) хранятся прямо в placements и выставляются при
+фиксации выхода на работу. Экран выплат выбирает их диапазоном по частичному
+индексу неоплаченных, а не пересчитывает даты и суммы для каждой строки.
+
+amount_effective — единственный источник суммы выплаты: отчёты и агрегаты
+суммируют его напрямую по placements, без join к jobs.
+"""
+from datetime import date, timedelta
+
+from sqlalchemy import text
+
+from models import db
+
+# Выплата партнёру — после 30 дней с даты выхода на работу
+PAYOUT_AFTER_DAYS = 30
+
+
+def payable_from_for(start_date: date | None) -> date | None:
+    """Дата, начиная с которой трудоустройство подлежит выплате."""
+    if not start_date:
+        return None
+    return start_date + timedelta(days=PAYOUT_AFTER_DAYS)
+
+
+def effective_amount(partner_commission, job) -> float:
+    """Сумма к выплате партнёру.
+
+    Явная комиссия по трудоустройству, если задана; иначе ставка вакансии
+    с промо-множителем.
+    """
+    if partner_commission and partner_commission > 0:
+        return partner_commission
+    if job is not None and job.partner_fee_amount and job.partner_fee_amount > 0:
+        promo = 1.0 if job.promo_multiplier is None else job.promo_multiplier
+        return job.partner_fee_amount * promo
+    return 0.0
+
+
+def submission_fee(job, gender: str) -> float:
+    """Комиссия партнёру, фиксируемая при подаче кандидата.
+
+    Ставка вакансии с текущим промо-множителем; для мужчин — плюс мужской
+    бонус вакансии, если он включён.
+    """
+    fee = (job.partner_fee_amount or 0.0) * (job.promo_multiplier or 1.0)
+    if gender == "male" and job.male_bonus_enabled and (job.male_bonus_percent or 0) > 0:
+        fee = fee * (1 + job.male_bonus_percent / 100.0)
+    return fee
+
+
+def apply_placement_terms(placement, job) -> None:
+    """Пересчитать payable_from и amount_effective трудоустройства (без коммита)."""
+    placement.payable_from = payable_from_for(placement.start_date)
+    placement.amount_effective = effective_amount(placement.partner_commission, job)
+
+
+def refresh_job_amounts(job) -> None:
+    """Пересчитать amount_effective после смены ставки или промо вакансии (без коммита).
+
+    Затрагивает только неоплаченные трудоустройства без явной комиссии:
+    у оплаченных сумма выплаты уже зафиксирована.
+    """
+    db.session.execute(
+        text(
+            """
+            UPDATE placements SET amount_effective = :amount
+            WHERE job_id = :job_id AND partner_paid = 0
+              AND (partner_commission IS NULL OR partner_commission <= 0)
+            """
+        ),
+        {"amount": effective_amount(None, job), "job_id": job.id},
+    )
@@ -25,10 +25,15 @@ from models import (
     JobHousingPhoto,
     RegistrationRequest,
     Notification,
+    UserCounter,
     create_notification_for_users,
 )
 from constants import PIPELINE
-from auth_utils import login_required, roles_required
+from auth_utils import login_required, roles_required, invalidate_principal
+from counters import invalidate_user_counter, registration_status_changed
+from perf import endpoint_stats, reset_stats
+from metrics import FLUSH_INTERVAL
+import refcache
 
 import os
 
@@ -76,6 +81,7 @@ def registration_approve(req_id):
     if existing_user:
         flash("Пользователь с таким email уже существует. Заявка помечена как обработанная.", "warning")
         req.status = "approved"
+        registration_status_changed("new", req.status)
         db.session.commit()
         return redirect(url_for("admin.admin_users"))
 
@@ -92,6 +98,7 @@ def registration_approve(req_id):
     )
     db.session.add(user)
     req.status = "approved"
+    registration_status_changed("new", req.status)
     db.session.commit()
 
     # Уведомим рекрутёра о создании партнёра, но пароль ему не показываем
@@ -100,6 +107,7 @@ def registration_approve(req_id):
             [user.assigned_recruiter_id],
             f"Партнёр {user.name} ({user.email}) создан и закреплён за вами."
         )
+        db.session.commit()
 
     flash(f"Партнёр {user.email} создан.", "success")
     return redirect(url_for(redirect_endpoint))
@@ -123,6 +131,7 @@ def registration_reject(req_id):
         return redirect(url_for("main.my_partners"))
 
     req.status = "rejected"
+    registration_status_changed("new", req.status)
     db.session.commit()
     flash("Заявка отклонена.", "info")
     return redirect(url_for(redirect_endpoint))
@@ -190,12 +199,7 @@ def admin_user_create():
         ("partner", "Партнёр"),
         ("finance", "Бухгалтер"),
     ]
-    recruiters = (
-        db.session.query(User)
-        .filter(User.role == "recruiter", User.is_active == True)
-        .order_by(User.name.asc())
-        .all()
-    )
+    recruiters = refcache.get("active_recruiters")
     return render_template("admin/user_form.html", user=None, roles=roles, recruiters=recruiters)
 
 
@@ -264,6 +268,7 @@ def admin_user_edit(user_id):
             user.password_hash = generate_password_hash(password)
 
         db.session.commit()
+        invalidate_principal(user.id)
         flash("Пользователь обновлён.", "success")
         return redirect(url_for("admin.admin_users"))
 
@@ -274,12 +279,7 @@ def admin_user_edit(user_id):
         ("finance", "Бухгалтер"),
         ("director", "Директор"),
     ]
-    recruiters = (
-        db.session.query(User)
-        .filter(User.role == "recruiter", User.is_active == True)
-        .order_by(User.name.asc())
-        .all()
-    )
+    recruiters = refcache.get("active_recruiters")
     return render_template("admin/user_form.html", user=user, roles=roles, recruiters=recruiters)
 
 
@@ -313,8 +313,10 @@ def admin_user_delete(user_id):
         )
         return redirect(url_for("admin.admin_users"))
 
+    db.session.query(UserCounter).filter(UserCounter.user_id == user.id).delete()
     db.session.delete(user)
     db.session.commit()
+    invalidate_principal(user_id)
     flash("Пользователь удалён.", "success")
     return redirect(url_for("admin.admin_users"))
 
@@ -345,6 +347,7 @@ def admin_news_create():
             author_id=g.user.id,
         )
         db.session.add(n)
+        invalidate_user_counter("news_unread")
         db.session.commit()
         flash("Новость добавлена.", "success")
         return redirect(url_for("admin.admin_news"))
@@ -368,6 +371,7 @@ def admin_news_edit(news_id):
         n.title = title
         n.body = body
         n.is_published = is_published
+        invalidate_user_counter("news_unread")
         db.session.commit()
         flash("Новость обновлена.", "success")
         return redirect(url_for("admin.admin_news"))
@@ -383,6 +387,24 @@ def admin_news_delete(news_id):
         abort(404)
     db.session.query(NewsRead).filter(NewsRead.news_id == news_id).delete()
     db.session.delete(n)
+    invalidate_user_counter("news_unread")
     db.session.commit()
     flash("Новость удалена.", "success")
     return redirect(url_for("admin.admin_news"))
+
+
+@admin_bp.route("/admin/perf")
+@login_required
+@roles_required("coordinator")
+def admin_perf():
+    """Время ответа по эндпоинтам (p50/p95/p99) и нагрузка на БД по всем воркерам."""
+    return render_template("admin/perf.html", stats=endpoint_stats(), flush_interval=FLUSH_INTERVAL)
+
+
+@admin_bp.route("/admin/perf/reset", methods=["POST"])
+@login_required
+@roles_required("coordinator")
+def admin_perf_reset():
+    reset_stats()
+    flash("Статистика производительности сброшена.", "info")
+    return redirect(url_for("admin.admin_perf"))
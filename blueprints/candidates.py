@@ -1,9 +1,12 @@
 from datetime import date, datetime
 
-from flask import Blueprint, render_template, request, redirect, url_for, session, g, abort, flash, send_from_directory
+from flask import (
+    Blueprint, render_template, request, redirect, url_for, session, g, abort, flash, send_from_directory, jsonify,
+    Response, stream_with_context,
+)
 from werkzeug.security import check_password_hash, generate_password_hash
 from werkzeug.utils import secure_filename
-from sqlalchemy import func, text, case
+from sqlalchemy import func, text, case, or_, select, insert, union_all, literal, Integer, DateTime
 from sqlalchemy.orm import aliased
 
 from models import (
@@ -30,23 +33,41 @@ from models import (
 )
 from constants import PIPELINE
 from auth_utils import login_required, roles_required
+from counters import inbox_status_changed, inbox_statuses_changed, unpaid_placement_changed
+from billing import apply_placement_terms
+from kpi import kpi_apply, kpi_snapshot, kpi_snapshot_many
+from pagination import keyset_page
+from search import PARTNER_COLUMNS, matching_ids, ranked_search
+from duplicates import find_duplicates
+from comment_seen import mark_seen, pending_seen
+from timeline import LOG_ACTION_LABELS, TIMELINE_PAGE_SIZE, candidate_timeline
+from export import EXPORT_HEADERS, csv_stream, export_rows, xlsx_stream
+from importer import COLUMN_ALIASES, MAX_ROWS, ImportFileError, import_candidates, read_rows
+import refcache
+import storage
 
 import os
 
 
 candidates_bp = Blueprint('candidates', __name__)
 
-@candidates_bp.route("/candidates")
-@login_required
-def candidates():
+# Размер страницы списка кандидатов (keyset-пагинация, см. pagination.py)
+CANDIDATES_PAGE_SIZE = 100
+# Массовая смена статуса: не больше кандидатов за раз и имён в сводном уведомлении
+BULK_STATUS_MAX = 500
+BULK_NOTIFY_NAMES = 5
+
+
+def _candidates_query():
+    """Список кандидатов с фильтрами из request.args: (query, текущие фильтры)."""
     job_id = request.args.get("job_id", type=int)
     recruiter_id = request.args.get("recruiter_id", type=int)
     partner_id = request.args.get("partner_id", type=int)
     status = request.args.get("status")
     min_fee = request.args.get("min_fee", type=float)
     max_fee = request.args.get("max_fee", type=float)
+    search = (request.args.get("q") or "").strip()
 
-    from sqlalchemy import select
     partner_fee_base = (Job.partner_fee_amount * Job.promo_multiplier).label("partner_fee_base")
 
     q = (db.session.query(
@@ -79,10 +100,69 @@ def candidates():
         q = q.filter(Job.partner_fee_amount>=min_fee)
     if max_fee is not None:
         q = q.filter(Job.partner_fee_amount<=max_fee)
+    if search:
+        # Полнотекстовый поиск (FTS5, см. search.py); партнёр ищет только по своим полям
+        columns = PARTNER_COLUMNS if g.user.role == "partner" else None
+        ids = matching_ids(search, columns)
+        if ids is not None:
+            q = q.filter(Candidate.id.in_(ids))
+
+    current = {
+        "job_id": job_id,
+        "recruiter_id": recruiter_id,
+        "partner_id": partner_id,
+        "status": status,
+        "min_fee": min_fee,
+        "max_fee": max_fee,
+        "q": search,
+    }
+    return q, current
+
+
+def _unread_comment_counts(user_id: int, candidate_ids) -> dict[int, int]:
+    """Число непрочитанных пользователем комментариев по кандидатам: {candidate_id: count}.
+
+    Один агрегирующий запрос: комментарии считаются в базе по индексу
+    (candidate_id, created_at), в Python приходит по строке на кандидата.
+    """
+    if not candidate_ids:
+        return {}
+    seen_rows = select(CandidateCommentSeen.candidate_id, CandidateCommentSeen.last_seen_at).where(
+        CandidateCommentSeen.user_id == user_id, CandidateCommentSeen.candidate_id.in_(candidate_ids)
+    )
+    # Отметки из буфера воркера, ещё не записанные в базу
+    pending = pending_seen(user_id, candidate_ids)
+    if pending:
+        seen_rows = union_all(seen_rows, *(
+            select(literal(cid, Integer).label("candidate_id"), literal(ts, DateTime).label("last_seen_at"))
+            for cid, ts in pending.items()
+        ))
+    seen_rows = seen_rows.subquery()
+    seen = (
+        select(seen_rows.c.candidate_id, func.max(seen_rows.c.last_seen_at).label("last_seen_at"))
+        .group_by(seen_rows.c.candidate_id)
+        .subquery()
+    )
+    rows = db.session.execute(
+        select(CandidateComment.candidate_id, func.count(CandidateComment.id))
+        .outerjoin(seen, seen.c.candidate_id == CandidateComment.candidate_id)
+        .where(
+            CandidateComment.candidate_id.in_(candidate_ids),
+            or_(seen.c.last_seen_at.is_(None), CandidateComment.created_at > seen.c.last_seen_at),
+        )
+        .group_by(CandidateComment.candidate_id)
+    ).all()
+    return {candidate_id: count for candidate_id, count in rows}
 
-    rows = q.order_by(Candidate.created_at.desc()).limit(400).all()
-    jobs = db.session.query(Job.id, Job.title).filter(Job.status=="active").order_by(Job.title.asc()).all()
-    recruiters = db.session.query(User.id, User.name).filter(User.role=="recruiter").order_by(User.name.asc()).all()
+
+@candidates_bp.route("/candidates")
+@login_required
+def candidates():
+    q, current = _candidates_query()
+    page = keyset_page(q, Candidate.created_at, Candidate.id, request.args.get("cursor"), CANDIDATES_PAGE_SIZE)
+    rows = page.rows
+    jobs = refcache.get("active_jobs")
+    recruiters = refcache.get("recruiters")
     submitter_ids = {c.submitter_id for (c, *_) in rows}
     if submitter_ids:
         partners = db.session.query(User.id, User.name).filter(User.id.in_(submitter_ids)).order_by(User.name.asc()).all()
@@ -91,18 +171,7 @@ def candidates():
 
     unread_comments = {}
     if g.user:
-        candidate_ids = [c.id for (c, *_) in rows]
-        if candidate_ids:
-            all_comments = db.session.query(CandidateComment).filter(CandidateComment.candidate_id.in_(candidate_ids)).all()
-            seen_rows = db.session.query(CandidateCommentSeen).filter(
-                CandidateCommentSeen.candidate_id.in_(candidate_ids),
-                CandidateCommentSeen.user_id == g.user.id,
-            ).all()
-            seen_map = {s.candidate_id: s.last_seen_at for s in seen_rows}
-            for cm in all_comments:
-                last_seen = seen_map.get(cm.candidate_id)
-                if (not last_seen) or (cm.created_at > last_seen):
-                    unread_comments[cm.candidate_id] = unread_comments.get(cm.candidate_id, 0) + 1
+        unread_comments = _unread_comment_counts(g.user.id, [c.id for (c, *_) in rows])
 
     return render_template(
         "candidates.html",
@@ -111,15 +180,143 @@ def candidates():
         recruiters=recruiters,
         partners=partners,
         pipeline=PIPELINE,
-        current={
-            "job_id": job_id,
-            "recruiter_id": recruiter_id,
-            "partner_id": partner_id,
-            "status": status,
-            "min_fee": min_fee,
-            "max_fee": max_fee,
-        },
+        current=current,
         unread_comments=unread_comments,
+        status_reasons=refcache.get("status_reasons"),
+        page=page,
+        cursor=request.args.get("cursor"),
+    )
+
+
+@candidates_bp.route("/candidates/json")
+@login_required
+def candidates_json():
+    """Та же выборка, что /candidates, постранично в JSON (?cursor= из next_cursor)."""
+    q, _current = _candidates_query()
+    page = keyset_page(q, Candidate.created_at, Candidate.id, request.args.get("cursor"), CANDIDATES_PAGE_SIZE)
+    return jsonify(
+        {
+            "items": [
+                {
+                    "id": c.id,
+                    "full_name": c.full_name,
+                    "status": c.status,
+                    "created_at": c.created_at.isoformat(),
+                    "job_id": c.job_id,
+                    "job_title": job_title,
+                    "submitter_id": c.submitter_id,
+                    "submitter_name": submitter_name,
+                    "partner_fee_base": partner_fee_base,
+                    "partner_fee_offer": partner_fee_offer,
+                }
+                for c, job_title, submitter_name, _note, partner_fee_base, partner_fee_offer, _blocked in page.rows
+            ],
+            "next_cursor": page.next_cursor,
+        }
+    )
+
+
+# Форматы выгрузки: формат -> (генератор, MIME-тип)
+EXPORT_FORMATS = {
+    "csv": (csv_stream, "text/csv; charset=utf-8"),
+    "xlsx": (xlsx_stream, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+}
+
+
+@candidates_bp.route("/candidates/export")
+@login_required
+@roles_required("recruiter","coordinator")
+def candidates_export():
+    """Выгрузка отфильтрованного списка (те же фильтры, что /candidates) в CSV/XLSX, ?format=csv|xlsx.
+
+    Файл отдаётся потоком по мере чтения строк из базы (см. export.py).
+    """
+    fmt = request.args.get("format", "csv")
+    if fmt not in EXPORT_FORMATS:
+        abort(400)
+    writer, mimetype = EXPORT_FORMATS[fmt]
+    q, _current = _candidates_query()
+    filename = f"candidates-{date.today():%Y%m%d}.{fmt}"
+    return Response(
+        stream_with_context(writer(EXPORT_HEADERS, export_rows(q))),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@candidates_bp.route("/candidates/import", methods=["GET","POST"])
+@login_required
+def candidates_import():
+    """Загрузка кандидатов списком из CSV / XLSX (см. importer.py).
+
+    Партнёр подаёт от своего имени; рекрутёр и координатор выбирают партнёра.
+    """
+    if g.user.role == "partner" and g.user.is_blocked:
+        flash("Ваш аккаунт помечен как ограниченный: подача кандидатов недоступна. Обратитесь к администратору.", "danger")
+        return redirect(url_for("main.index"))
+    staff = g.user.role in ("recruiter", "coordinator", "director")
+    if not staff and g.user.role != "partner":
+        abort(403)
+    partners = refcache.get("active_partners") if staff else []
+    result = None
+    job_id = request.values.get("job_id", type=int)
+    partner_id = request.form.get("partner_id", type=int) if staff else g.user.id
+
+    if request.method == "POST":
+        upload = request.files.get("file")
+        if not upload or not upload.filename:
+            flash("Выберите файл.", "danger")
+        elif staff and partner_id not in {p.id for p in partners}:
+            flash("Выберите партнёра.", "danger")
+        else:
+            try:
+                result = import_candidates(read_rows(upload.stream, upload.filename), partner_id, job_id,
+                                           actor_id=g.user.id)
+            except ImportFileError as exc:
+                db.session.rollback()
+                flash(str(exc), "danger")
+            else:
+                db.session.commit()
+                flash(f"Загружено кандидатов: {result.imported}, пропущено строк: {result.skipped}.",
+                      "success" if result.imported else "warning")
+
+    return render_template(
+        "candidate_import.html",
+        jobs=refcache.get("active_jobs"),
+        partners=partners,
+        job_id=job_id,
+        partner_id=partner_id,
+        result=result,
+        columns=COLUMN_ALIASES,
+        max_rows=MAX_ROWS,
+    )
+
+
+@candidates_bp.route("/candidates/search")
+@login_required
+def candidates_search():
+    """Поиск кандидатов по релевантности (FTS5): ?q=...&limit=..., JSON."""
+    limit = min(max(request.args.get("limit", 20, type=int), 1), 100)
+    if g.user.role == "partner":
+        results = ranked_search(request.args.get("q"), PARTNER_COLUMNS, submitter_id=g.user.id, limit=limit)
+    else:
+        results = ranked_search(request.args.get("q"), limit=limit)
+    return jsonify(
+        {
+            "items": [
+                {
+                    "id": row["id"],
+                    "full_name": row["full_name"],
+                    "status": row["status"],
+                    "job_id": row["job_id"],
+                    "created_at": str(row["created_at"]),
+                    "rank": row["rank"],
+                    "snippet": row["snippet"],
+                    "url": url_for("candidates.candidate_view", cand_id=row["id"]),
+                }
+                for row in results
+            ]
+        }
     )
 
 
@@ -152,64 +349,23 @@ def candidate_view(cand_id):
         .order_by(CandidateDoc.uploaded_at.desc())
         .all()
     )
-    comments = (
-        db.session.query(CandidateComment, User.name.label("author_name"))
-        .join(User, User.id == CandidateComment.author_id)
-        .filter(CandidateComment.candidate_id == cand_id)
-        .order_by(CandidateComment.created_at.desc())
-        .all()
-    )
+    # Первая страница ленты; более старые записи страница догружает через /timeline
+    timeline = candidate_timeline(cand_id)
 
-    status_reasons = (
-        db.session.query(CandidateStatusReason)
-        .filter(CandidateStatusReason.is_active == True)
-        .order_by(CandidateStatusReason.sort_order, CandidateStatusReason.id)
-        .all()
-    )
+    # Справочник из кэша воркера; базовый набор причин создаёт init_db
+    status_reasons = refcache.get("status_reasons")
 
-    # Автоматический фолбэк: если причин ещё нет в БД (новая база),
-    # создаём базовый набор причин и перечитываем.
-    if not status_reasons:
-        base_reasons = [
-            dict(code="no_show_first_day",       title_ru="Не вышел в первый день",                         applies_to_status="Не вышел",    sort_order=10),
-            dict(code="no_show_after_training",  title_ru="Не вышел после обучения / инструктажа",          applies_to_status="Не вышел",    sort_order=20),
-            dict(code="refused_conditions",      title_ru="Отказался из-за условий работы",                 applies_to_status="Не вышел",    sort_order=30),
-            dict(code="refused_salary",          title_ru="Отказался из-за зарплаты",                       applies_to_status="Не вышел",    sort_order=40),
-            dict(code="personal_reasons",        title_ru="Личные обстоятельства (семья, здоровье)",        applies_to_status="Не вышел",    sort_order=50),
-            dict(code="moved_to_another_job",    title_ru="Ушёл на другую работу",                          applies_to_status="Не отработал", sort_order=60),
-            dict(code="low_performance",         title_ru="Низкая производительность / жалобы клиента",     applies_to_status="Не отработал", sort_order=70),
-            dict(code="discipline_issues",       title_ru="Проблемы с дисциплиной (опоздания, прогулы)",    applies_to_status="Не отработал", sort_order=80),
-            dict(code="housing_issues",          title_ru="Проблемы с жильём (условия, соседи)",            applies_to_status="Не вышел",    sort_order=90),
-            dict(code="unknown_reason",          title_ru="Причина не уточнена",                            applies_to_status="",            sort_order=100),
-        ]
-        for idx, r in enumerate(base_reasons, start=1):
-            db.session.add(
-                CandidateStatusReason(
-                    code=r["code"],
-                    title_ru=r["title_ru"],
-                    title_uk="",
-                    applies_to_status=r.get("applies_to_status", ""),
-                    sort_order=r.get("sort_order", idx * 10),
-                    is_active=True,
-                )
-            )
-        db.session.commit()
-        status_reasons = (
-            db.session.query(CandidateStatusReason)
-            .filter(CandidateStatusReason.is_active == True)
-            .order_by(CandidateStatusReason.sort_order, CandidateStatusReason.id)
-            .all()
-        )
+    # Возможные дубли видит только персонал: у партнёра это чужие подачи
+    duplicates = []
+    if g.user.role != "partner":
+        duplicates = find_duplicates(c.Candidate.phone, c.Candidate.full_name, exclude_id=cand_id)
 
     if g.user:
-        seen = db.session.query(CandidateCommentSeen).filter_by(candidate_id=cand_id, user_id=g.user.id).first()
-        now = datetime.utcnow()
-        if not seen:
-            seen = CandidateCommentSeen(candidate_id=cand_id, user_id=g.user.id, last_seen_at=now)
-            db.session.add(seen)
-        else:
-            seen.last_seen_at = now
-        db.session.commit()
+        # Без записи, если новых комментариев нет; иначе отметка уходит в буфер (см. comment_seen.py)
+        latest_comment_at = db.session.execute(
+            select(func.max(CandidateComment.created_at)).where(CandidateComment.candidate_id == cand_id)
+        ).scalar()
+        mark_seen(g.user.id, cand_id, latest_comment_at)
 
     return render_template(
         "candidate_view.html",
@@ -217,11 +373,60 @@ def candidate_view(cand_id):
         placement=p,
         profile=profile,
         cand_docs=cand_docs,
-        comments=comments,
+        timeline=timeline,
+        log_labels=LOG_ACTION_LABELS,
         pipeline=PIPELINE,
         status_reasons=status_reasons,
+        duplicates=duplicates,
     )
 
+
+@candidates_bp.route("/candidates/<int:cand_id>/timeline")
+@login_required
+def candidate_timeline_json(cand_id):
+    """Лента кандидата (комментарии и журнал) постранично в JSON: ?cursor= из next_cursor, ?limit=."""
+    c = db.session.get(Candidate, cand_id)
+    if not c or (g.user.role == "partner" and c.submitter_id != g.user.id):
+        abort(404)
+    page = candidate_timeline(cand_id, request.args.get("cursor"), request.args.get("limit", TIMELINE_PAGE_SIZE, type=int))
+    return jsonify(
+        {
+            "items": [
+                {
+                    "kind": row["kind"],
+                    "id": row["id"],
+                    "created_at": row["created_at"].isoformat(),
+                    "created_at_display": row["created_at"].strftime("%Y-%m-%d %H:%M"),
+                    "author_id": row["author_id"],
+                    "author_name": row["author_name"],
+                    "text": row["text"],
+                    "action": row["action"],
+                    "action_label": LOG_ACTION_LABELS.get(row["action"], row["action"]),
+                }
+                for row in page.rows
+            ],
+            "next_cursor": page.next_cursor,
+        }
+    )
+
+def _status_change_text(old_status, new_status, reason, reason_comment) -> str:
+    """Системный комментарий / запись лога о смене статуса."""
+    sys_text = f"Статус изменён с '{old_status}' на '{new_status}'"
+    if reason:
+        sys_text += f" | Причина: {reason.title_ru}"
+    if reason_comment:
+        sys_text += f" | Комментарий: {reason_comment}"
+    return sys_text
+
+
+def _safe_next(default_endpoint: str) -> str:
+    """Куда вернуться после POST: только относительный путь внутри приложения."""
+    next_url = request.form.get("next") or ""
+    if next_url.startswith("/") and not next_url.startswith("//"):
+        return next_url
+    return url_for(default_endpoint)
+
+
 @candidates_bp.route("/candidates/<int:cand_id>/status", methods=["POST"])
 @login_required
 @roles_required("recruiter","coordinator")
@@ -248,7 +453,11 @@ def candidate_status(cand_id):
 
     old_status = c.status
     if old_status != new_status:
+        placement = db.session.query(Placement).filter_by(candidate_id=c.id).first()
+        kpi_before = kpi_snapshot(c, placement)
         c.status = new_status
+        inbox_status_changed(old_status, new_status)
+        kpi_apply(kpi_before, kpi_snapshot(c, placement))
 
         if reason:
             c.status_reason_id = reason.id
@@ -256,11 +465,7 @@ def candidate_status(cand_id):
             c.status_reason_id = None
         c.status_reason_comment = reason_comment
 
-        sys_text = f"Статус изменён с '{old_status}' на '{new_status}'"
-        if reason:
-            sys_text += f" | Причина: {reason.title_ru}"
-        if reason_comment:
-            sys_text += f" | Комментарий: {reason_comment}"
+        sys_text = _status_change_text(old_status, new_status, reason, reason_comment)
 
         db.session.add(
             CandidateComment(
@@ -282,7 +487,6 @@ def candidate_status(cand_id):
         recipients = set()
         if c.submitter_id and c.submitter_id != g.user.id:
             recipients.add(c.submitter_id)
-        placement = db.session.query(Placement).filter_by(candidate_id=c.id).first()
         if placement and placement.recruiter_id and placement.recruiter_id != g.user.id:
             recipients.add(placement.recruiter_id)
         if recipients:
@@ -295,6 +499,83 @@ def candidate_status(cand_id):
     return redirect(url_for("candidates.candidate_view", cand_id=cand_id))
 
 
+@candidates_bp.route("/candidates/bulk-status", methods=["POST"])
+@login_required
+@roles_required("recruiter","coordinator")
+def candidates_bulk_status():
+    """Один статус и причина для пачки кандидатов (например, весь автобус «Не вышел») одной транзакцией.
+
+    Комментарии и логи вставляются пачкой, каждый затронутый партнёр и рекрутёр
+    получает одно сводное уведомление вместо уведомления на каждого кандидата.
+    """
+    new_status = request.form.get("status")
+    if new_status not in PIPELINE:
+        abort(400)
+    ids = sorted({int(v) for v in request.form.getlist("candidate_ids") if v.isdigit()})
+    if not ids:
+        flash("Не выбрано ни одного кандидата.", "warning")
+        return redirect(_safe_next("candidates.candidates"))
+    if len(ids) > BULK_STATUS_MAX:
+        flash(f"За один раз можно изменить не больше {BULK_STATUS_MAX} кандидатов.", "danger")
+        return redirect(_safe_next("candidates.candidates"))
+
+    reason = None
+    reason_id = request.form.get("status_reason_id", type=int)
+    if reason_id:
+        reason = db.session.get(CandidateStatusReason, reason_id)
+    reason_comment = (request.form.get("status_reason_comment") or "").strip()
+
+    # Кандидаты и их трудоустройства одним запросом
+    rows = (
+        db.session.query(Candidate, Placement)
+        .outerjoin(Placement, Placement.candidate_id == Candidate.id)
+        .filter(Candidate.id.in_(ids), Candidate.status != "Удалён", Candidate.status != new_status)
+        .all()
+    )
+    if not rows:
+        flash("У выбранных кандидатов уже этот статус.", "info")
+        return redirect(_safe_next("candidates.candidates"))
+
+    kpi_before = kpi_snapshot_many(rows)
+    now = datetime.utcnow()
+    status_changes, comments, logs = [], [], []
+    # получатель -> имена кандидатов для сводного уведомления
+    notify: dict[int, list[str]] = {}
+    for c, placement in rows:
+        old_status = c.status
+        c.status = new_status
+        c.status_reason_id = reason.id if reason else None
+        c.status_reason_comment = reason_comment
+        status_changes.append((old_status, new_status))
+
+        sys_text = _status_change_text(old_status, new_status, reason, reason_comment)
+        comments.append({"candidate_id": c.id, "author_id": g.user.id, "text": sys_text, "created_at": now})
+        logs.append({"candidate_id": c.id, "user_id": g.user.id, "action": "status_change",
+                     "details": sys_text, "created_at": now})
+
+        for uid in (c.submitter_id, placement.recruiter_id if placement else None):
+            if uid and uid != g.user.id:
+                notify.setdefault(uid, []).append(c.full_name)
+
+    inbox_statuses_changed(status_changes)
+    kpi_apply(kpi_before, kpi_snapshot_many(rows))
+    db.session.execute(insert(CandidateComment), comments)
+    db.session.execute(insert(CandidateLog), logs)
+
+    for uid, names in notify.items():
+        if len(names) == 1:
+            message = f"Статус кандидата {names[0]} изменён на '{new_status}'"
+        else:
+            listed = ", ".join(names[:BULK_NOTIFY_NAMES])
+            if len(names) > BULK_NOTIFY_NAMES:
+                listed += f" и ещё {len(names) - BULK_NOTIFY_NAMES}"
+            message = f"Статус {len(names)} кандидатов изменён на '{new_status}': {listed}"
+        create_notification_for_users([uid], message[:255])
+    db.session.commit()
+    flash(f"Статус «{new_status}» установлен у {len(rows)} кандидатов.", "success")
+    return redirect(_safe_next("candidates.candidates"))
+
+
 @candidates_bp.route("/candidates/<int:cand_id>/comment", methods=["POST"])
 @login_required
 def candidate_comment_add(cand_id):
@@ -345,7 +626,11 @@ def candidate_comment_add(cand_id):
 def candidate_start(cand_id):
     c = db.session.get(Candidate, cand_id)
     if not c: abort(404)
-    start_date = request.form.get("start_date")
+    try:
+        start_date = date.fromisoformat((request.form.get("start_date") or "").strip())
+    except ValueError:
+        flash("Укажите корректную дату выхода на работу.", "danger")
+        return redirect(url_for("candidates.candidate_view", cand_id=cand_id))
     pc = float(request.form.get("partner_commission") or 0)
     rc = float(request.form.get("recruiter_commission") or 0)
     p = db.session.query(Placement).filter(Placement.candidate_id==cand_id).first()
@@ -354,16 +639,23 @@ def candidate_start(cand_id):
         .filter(CandidateDoc.candidate_id==cand_id)
         .order_by(CandidateDoc.uploaded_at.desc())
         .all())
+    kpi_before = kpi_snapshot(c, p)
     if not p:
         p = Placement(candidate_id=c.id, job_id=c.job_id, recruiter_id=g.user.id,
                       start_date=start_date, partner_commission=pc, recruiter_commission=rc, status="Вышел на работу")
         db.session.add(p)
+        old_payable_from = None
     else:
+        old_payable_from = p.payable_from
         p.start_date = start_date
         p.partner_commission = pc
         p.recruiter_commission = rc
         p.recruiter_id = g.user.id
+    apply_placement_terms(p, db.session.get(Job, p.job_id))
+    unpaid_placement_changed(old_payable_from, p.partner_paid, p.payable_from, p.partner_paid)
+    inbox_status_changed(c.status, "Вышел на работу")
     c.status = "Вышел на работу"
+    kpi_apply(kpi_before, kpi_snapshot(c, p))
 
     # Уведомления о выходе кандидата на работу
     recipients = set()
@@ -393,8 +685,12 @@ def candidate_delete(cand_id):
         abort(404)
 
     # Мягкое удаление: помечаем кандидата как удалённого и пишем лог
+    placement = db.session.query(Placement).filter_by(candidate_id=c.id).first()
+    kpi_before = kpi_snapshot(c, placement)
     old_status = c.status
     c.status = "Удалён"
+    inbox_status_changed(old_status, c.status)
+    kpi_apply(kpi_before, kpi_snapshot(c, placement))
     db.session.add(CandidateLog(candidate_id=c.id, user_id=g.user.id,
                                action="candidate_deleted",
                                details=f"Удалён кандидатором со статусом '{old_status}'"))
@@ -403,7 +699,6 @@ def candidate_delete(cand_id):
     recipients = set()
     if c.submitter_id and c.submitter_id != g.user.id:
         recipients.add(c.submitter_id)
-    placement = db.session.query(Placement).filter_by(candidate_id=c.id).first()
     if placement and placement.recruiter_id and placement.recruiter_id != g.user.id:
         recipients.add(placement.recruiter_id)
     if recipients:
@@ -434,42 +729,8 @@ def candidate_doc(doc_id):
     elif g.user.role not in ("recruiter", "coordinator", "director", "finance"):
         abort(403)
 
-    # Базовая папка для документов кандидатов
-    upload_root = os.path.join(os.path.dirname(__file__), "uploads", "candidate_docs")
-
-    # Возможные варианты расположения файла:
-    #  1) как сейчас сохраняется: "<candidate_id>/<file>"
-    #  2) только имя файла внутри папки кандидата
-    candidates = []
-
-    # Вариант 1: как записано в базе (может уже содержать подкаталог)
-    if d.filename:
-        candidates.append(os.path.join(upload_root, d.filename))
-
-    # Вариант 2: файл лежит в подпапке с id кандидата,
-    # а в базе хранится только имя файла.
-    if d.filename and os.sep not in d.filename and "/" not in d.filename:
-        candidates.append(os.path.join(upload_root, str(d.candidate_id), d.filename))
-
-    # Вариант 3: если путь не найден, но в папке кандидата ровно один файл — пробуем его.
-    cand_dir = os.path.join(upload_root, str(d.candidate_id))
-    try:
-        if os.path.isdir(cand_dir):
-            files = [f for f in os.listdir(cand_dir) if os.path.isfile(os.path.join(cand_dir, f))]
-            if len(files) == 1:
-                candidates.append(os.path.join(cand_dir, files[0]))
-    except OSError:
-        pass
-
-    final_path = None
-    for path in candidates:
-        if path and os.path.exists(path):
-            final_path = path
-            break
-
-    if not final_path:
+    rel_path = d.storage_path or storage.resolve(d.filename, storage.CANDIDATE_DOCS, d.candidate_id)
+    if not rel_path:
         flash("Файл документа не найден на сервере.", "danger")
         return redirect(url_for("candidates.candidate_view", cand_id=c.id))
-
-    directory, filename = os.path.split(final_path)
-    return send_from_directory(directory, filename)
\ No newline at end of file
+    return storage.send_stored(rel_path, download_name=storage.display_name(d.filename))
\ No newline at end of file
@@ -6,7 +6,6 @@ from flask import (
     Blueprint, render_template, request, redirect,
     url_for, g, abort, flash, send_from_directory
 )
-from werkzeug.utils import secure_filename
 from sqlalchemy import func, text
 from sqlalchemy.orm import aliased
 
@@ -28,6 +27,9 @@ from models import (
 
 )
 from auth_utils import login_required, roles_required
+from counters import unpaid_placement_changed
+from periods import day_range_bounds, in_month, normalize_ym
+import storage
 
 
 finance_bp = Blueprint("finance", __name__)
@@ -40,7 +42,7 @@ finance_bp = Blueprint("finance", __name__)
 @login_required
 @roles_required("recruiter", "coordinator")
 def reports():
-    ym = request.args.get("month") or date.today().strftime("%Y-%m")
+    ym = normalize_ym(request.args.get("month"))
 
     rows = (
         db.session.query(
@@ -57,7 +59,7 @@ def reports():
         .join(Candidate, Candidate.id == Placement.candidate_id)
         .join(Job, Job.id == Placement.job_id)
         .join(User, User.id == Placement.recruiter_id)
-        .filter(func.strftime("%Y-%m", Placement.start_date) == ym)
+        .filter(in_month(Placement.start_date, ym))
         .order_by(Placement.start_date.asc())
         .all()
     )
@@ -106,17 +108,9 @@ def finance_partners():
             """
             SELECT c.submitter_id AS pid,
                    COUNT(p.id) AS starts,
-                   COALESCE(SUM(
-                     CASE 
-                       WHEN p.partner_commission IS NOT NULL AND p.partner_commission > 0 
-                       THEN p.partner_commission
-                       WHEN j.partner_fee_amount IS NOT NULL AND j.partner_fee_amount > 0 
-                       THEN j.partner_fee_amount * COALESCE(j.promo_multiplier, 1)
-                       ELSE 0 END
-                   ),0) AS total
+                   COALESCE(SUM(p.amount_effective), 0) AS total
             FROM placements p
             JOIN candidates c ON c.id = p.candidate_id
-            JOIN jobs j ON j.id = p.job_id
             GROUP BY c.submitter_id
             """
         )
@@ -148,16 +142,9 @@ def finance_partner_view(pid):
             SELECT 
               strftime('%Y-%m', p.start_date) AS ym,
               COUNT(p.id) AS starts,
-              COALESCE(SUM(
-                CASE 
-                  WHEN p.partner_commission IS NOT NULL AND p.partner_commission > 0 THEN p.partner_commission
-                  WHEN j.partner_fee_amount IS NOT NULL AND j.partner_fee_amount > 0 
-                  THEN j.partner_fee_amount * COALESCE(j.promo_multiplier, 1)
-                  ELSE 0 END
-              ),0) AS total
+              COALESCE(SUM(p.amount_effective), 0) AS total
             FROM placements p
             JOIN candidates c ON c.id = p.candidate_id
-            JOIN jobs j ON j.id = p.job_id
             WHERE c.submitter_id = :pid
             GROUP BY ym
             ORDER BY ym DESC
@@ -189,6 +176,11 @@ def finance_payments():
     as_of = request.args.get("as_of") or date.today().strftime("%Y-%m-%d")
     show_all = request.args.get("show_all") == "1"
 
+    try:
+        as_of_date = date.fromisoformat(as_of)
+    except:
+        as_of_date = date.today()
+
     rows = db.session.execute(
         text(
             """
@@ -203,34 +195,23 @@ def finance_payments():
               u.id AS partner_id,
               u.bank_account AS bank_account,
               u.settlement_day AS settlement_day,
-              CASE 
-                WHEN p.partner_commission IS NOT NULL AND p.partner_commission > 0 
-                THEN p.partner_commission
-                WHEN j.partner_fee_amount IS NOT NULL AND j.partner_fee_amount > 0 
-                THEN j.partner_fee_amount * COALESCE(j.promo_multiplier, 1)
-                ELSE 0 END AS amount,
+              COALESCE(p.amount_effective, 0) AS amount,
               CAST(julianday(:as_of) - julianday(p.start_date) AS INTEGER) AS days_worked
             FROM placements p
             JOIN candidates c ON c.id = p.candidate_id
             JOIN jobs j ON j.id = p.job_id
             JOIN users u ON u.id = c.submitter_id
-            WHERE p.start_date IS NOT NULL
-              AND CAST(julianday(:as_of) - julianday(p.start_date) AS INTEGER) >= 30
-              AND (p.partner_paid IS NULL OR p.partner_paid = 0)
+            WHERE p.partner_paid = 0
+              AND p.payable_from <= :as_of
             ORDER BY u.name ASC, p.start_date ASC
             """
         ),
-        {"as_of": as_of},
+        {"as_of": as_of_date.isoformat()},
     ).mappings().all()
     # Конвертируем RowMapping в обычные dict, чтобы можно было
     # добавлять служебные поля (next_pay_date, days_until_pay).
     rows = [dict(r) for r in rows]
 
-    try:
-        as_of_date = date.fromisoformat(as_of)
-    except:
-        as_of_date = date.today()
-
     per_partner = {}
     due_today_total = 0
     due_week_total = 0
@@ -390,7 +371,9 @@ def finance_partner_payment(partner_id):
         as_of_date = date.fromisoformat(as_of)
     except Exception:
         as_of_date = date.today()
-        as_of = as_of_date.strftime("%Y-%m-%d")
+    # fromisoformat принимает и «20261017»: дальше as_of сравнивается с датами
+    # в базе как строка, поэтому приводим к 'YYYY-MM-DD'
+    as_of = as_of_date.isoformat()
 
     partner = db.session.get(User, partner_id)
     if not partner or partner.role != "partner":
@@ -411,20 +394,14 @@ def finance_partner_payment(partner_id):
               u.id AS partner_id,
               u.bank_account AS bank_account,
               u.settlement_day AS settlement_day,
-              CASE 
-                WHEN p.partner_commission IS NOT NULL AND p.partner_commission > 0 
-                THEN p.partner_commission
-                WHEN j.partner_fee_amount IS NOT NULL AND j.partner_fee_amount > 0 
-                THEN j.partner_fee_amount * COALESCE(j.promo_multiplier, 1)
-                ELSE 0 END AS amount,
+              COALESCE(p.amount_effective, 0) AS amount,
               CAST(julianday(:as_of) - julianday(p.start_date) AS INTEGER) AS days_worked
             FROM placements p
             JOIN candidates c ON c.id = p.candidate_id
             JOIN jobs j ON j.id = p.job_id
             JOIN users u ON u.id = c.submitter_id
-            WHERE p.start_date IS NOT NULL
-              AND CAST(julianday(:as_of) - julianday(p.start_date) AS INTEGER) >= 30
-              AND (p.partner_paid IS NULL OR p.partner_paid = 0)
+            WHERE p.partner_paid = 0
+              AND p.payable_from <= :as_of
               AND u.id = :partner_id
             ORDER BY p.start_date ASC
             """
@@ -448,15 +425,8 @@ def finance_partner_payment(partner_id):
     period_label = as_of_date.strftime("%m.%Y")
 
     if request.method == "POST" and candidates_to_pay:
-        file = request.files.get("payment_file")
-        filename = None
-        if file and file.filename:
-            pay_dir = os.path.join(os.path.dirname(__file__), "uploads", "payments")
-            os.makedirs(pay_dir, exist_ok=True)
-            safe_name = secure_filename(file.filename)
-            path = os.path.join(pay_dir, f"partner_{partner_id}_{as_of}_{safe_name}")
-            file.save(path)
-            filename = os.path.basename(path)
+        stored = storage.save_upload(request.files.get("payment_file"))
+        filename = stored.path if stored else None
 
         placement_ids = [r["placement_id"] for r in candidates_to_pay]
         now = datetime.utcnow()
@@ -468,6 +438,7 @@ def finance_partner_payment(partner_id):
         )
 
         for pl in placements:
+            unpaid_placement_changed(pl.payable_from, pl.partner_paid, pl.payable_from, True)
             pl.partner_paid = True
             pl.partner_paid_at = now
             if filename:
@@ -513,17 +484,10 @@ def finance_payment_detail(placement_id):
     partner = db.session.get(User, cand.submitter_id)
 
     if request.method == "POST":
-        file = request.files.get("payment_file")
-        filename = pl.partner_payment_file or ""
-
-        if file and file.filename:
-            pay_dir = os.path.join(os.path.dirname(__file__), "uploads", "payments")
-            os.makedirs(pay_dir, exist_ok=True)
-            safe_name = secure_filename(file.filename)
-            path = os.path.join(pay_dir, f"pl_{placement_id}_{safe_name}")
-            file.save(path)
-            filename = os.path.basename(path)
+        stored = storage.save_upload(request.files.get("payment_file"))
+        filename = stored.path if stored else (pl.partner_payment_file or "")
 
+        unpaid_placement_changed(pl.payable_from, pl.partner_paid, pl.payable_from, True)
         pl.partner_paid = True
         pl.partner_paid_at = datetime.utcnow()
         pl.partner_payment_file = filename
@@ -547,11 +511,7 @@ def finance_payment_detail(placement_id):
         flash("Выплата отмечена.", "success")
         return redirect(url_for("finance.finance_payments"))
 
-    amount = (
-        job.partner_fee_amount
-        if job.partner_fee_amount and job.partner_fee_amount > 0
-        else pl.partner_commission or 0.0
-    )
+    amount = pl.amount_effective or 0.0
 
     return render_template(
         "finance_payment_detail.html",
@@ -586,13 +546,10 @@ def finance_payment_file(placement_id):
     elif g.user.role not in ("coordinator", "finance", "director", "admin", "recruiter"):
         abort(403)
 
-    upload_root = os.path.join(os.path.dirname(__file__), "uploads", "payments")
-    final_path = os.path.join(upload_root, pl.partner_payment_file)
-    if not os.path.exists(final_path):
+    rel_path = storage.resolve(pl.partner_payment_file, storage.PAYMENTS)
+    if not rel_path:
         abort(404)
-
-    directory, filename = os.path.split(final_path)
-    return send_from_directory(directory, filename)
+    return storage.send_stored(rel_path)
 
 
 # ================================================================
@@ -679,8 +636,16 @@ def finance_history():
     to_date = request.args.get("to_date") or default_to
     partner_id = request.args.get("partner_id", type=int)
 
+    # Включительный интервал дат -> полуинтервал по самой колонке (работает индекс)
+    try:
+        range_start, range_end = day_range_bounds(
+            date.fromisoformat(from_date), date.fromisoformat(to_date)
+        )
+    except ValueError:
+        range_start, range_end = day_range_bounds(today.replace(day=1), today)
+
     where_extra = ""
-    params = {"from_date": from_date, "to_date": to_date}
+    params = {"from_date": range_start.isoformat(), "to_before": range_end.isoformat()}
     if partner_id:
         where_extra = " AND u.id = :partner_id"
         params["partner_id"] = partner_id
@@ -694,20 +659,15 @@ def finance_history():
           j.title AS job_title,
           u.id AS partner_id,
           u.name AS partner_name,
-          CASE 
-            WHEN p.partner_commission IS NOT NULL AND p.partner_commission > 0 THEN p.partner_commission
-            WHEN j.partner_fee_amount IS NOT NULL AND j.partner_fee_amount > 0 THEN 
-              j.partner_fee_amount * COALESCE(j.promo_multiplier, 1)
-            ELSE 0 
-          END AS amount
+          COALESCE(p.amount_effective, 0) AS amount
         FROM placements p
         JOIN candidates c ON c.id = p.candidate_id
         JOIN jobs j ON j.id = p.job_id
         JOIN users u ON u.id = c.submitter_id
         WHERE p.partner_paid = 1
           AND p.partner_paid_at IS NOT NULL
-          AND DATE(p.partner_paid_at) >= :from_date
-          AND DATE(p.partner_paid_at) <= :to_date
+          AND p.partner_paid_at >= :from_date
+          AND p.partner_paid_at < :to_before
           {where_extra}
         ORDER BY paid_at DESC, partner_name ASC
     """
@@ -2,7 +2,6 @@ from datetime import date, datetime
 
 from flask import Blueprint, render_template, request, redirect, url_for, session, g, abort, flash, send_from_directory
 from werkzeug.security import check_password_hash, generate_password_hash
-from werkzeug.utils import secure_filename
 from sqlalchemy import func, text, case
 from sqlalchemy.orm import aliased
 
@@ -27,8 +26,13 @@ from models import (
     JobHousingPhoto,
     RegistrationRequest,
 )
-from constants import PIPELINE
+from constants import CANDIDATE_DOC_TYPES, PIPELINE
 from auth_utils import login_required, roles_required
+from counters import inbox_status_changed
+from billing import refresh_job_amounts, submission_fee
+from kpi import kpi_apply, kpi_snapshot
+from duplicates import cluster_root, find_duplicates, name_key, phone_key
+import storage
 
 import os
 
@@ -79,6 +83,17 @@ def job_pin(job_id):
     return redirect(url_for("jobs.jobs"))
 
 
+def _save_job_uploads(j) -> None:
+    """Обложка (thumbnail_image) и фотографии проживания из формы вакансии — в хранилище (storage.py)."""
+    thumb = storage.save_upload(request.files.get("thumbnail_image"))
+    if thumb:
+        j.thumbnail_image = thumb.path
+    for f in request.files.getlist("housing_photos"):
+        stored = storage.save_upload(f)
+        if stored:
+            db.session.add(JobHousingPhoto(job_id=j.id, filename=stored.path, label=""))
+
+
 @jobs_bp.route("/jobs/new", methods=["GET","POST"])
 @login_required
 @roles_required("coordinator", "recruiter")
@@ -138,53 +153,8 @@ def job_new():
         db.session.add(j)
         db.session.flush()
 
-        # Обложка вакансии (картинка в списке)
-        file = request.files.get("thumbnail_image")
-        if file and file.filename:
-            upload_root = os.path.join(os.path.dirname(__file__), "uploads", "job_thumbs")
-            os.makedirs(upload_root, exist_ok=True)
-            job_dir = os.path.join(upload_root, str(j.id))
-            os.makedirs(job_dir, exist_ok=True)
-            safe_name = secure_filename(file.filename)
-            if safe_name:
-                # проверяем коллизии
-                base, ext = os.path.splitext(safe_name)
-                rel_name = os.path.join(str(j.id), safe_name)
-                save_path = os.path.join(upload_root, rel_name)
-                counter = 1
-                while os.path.exists(save_path) and counter < 1000:
-                    cand = f"{base}_{counter}{ext}"
-                    rel_name = os.path.join(str(j.id), cand)
-                    save_path = os.path.join(upload_root, rel_name)
-                    counter += 1
-                file.save(save_path)
-                j.thumbnail_image = rel_name
-
-        # Фотографии проживания
-        files = request.files.getlist("housing_photos")
-        if files:
-            upload_root = os.path.join(os.path.dirname(__file__), "uploads", "job_housing")
-            os.makedirs(upload_root, exist_ok=True)
-            job_dir = os.path.join(upload_root, str(j.id))
-            os.makedirs(job_dir, exist_ok=True)
-            for f in files:
-                if not f or not f.filename:
-                    continue
-                safe_name = secure_filename(f.filename)
-                if not safe_name:
-                    continue
-                base, ext = os.path.splitext(safe_name)
-                rel_name = os.path.join(str(j.id), safe_name)
-                save_path = os.path.join(upload_root, rel_name)
-                counter = 1
-                while os.path.exists(save_path) and counter < 1000:
-                    cand = f"{base}_{counter}{ext}"
-                    rel_name = os.path.join(str(j.id), cand)
-                    save_path = os.path.join(upload_root, rel_name)
-                    counter += 1
-                f.save(save_path)
-                ph = JobHousingPhoto(job_id=j.id, filename=rel_name, label="")
-                db.session.add(ph)
+        # Обложка вакансии (картинка в списке) и фотографии проживания
+        _save_job_uploads(j)
 
         db.session.commit()
 
@@ -198,6 +168,7 @@ def job_new():
                 recipients,
                 f"Новая вакансия: {j.title} ({j.location})"
             )
+            db.session.commit()
 
         flash("Вакансия создана", "success")
         return redirect(url_for("jobs.jobs"))
@@ -207,62 +178,36 @@ def job_new():
 @jobs_bp.route("/job-thumb/<int:job_id>")
 @login_required
 def job_thumb(job_id):
+    # Версионированный URL из списка вакансий: повторный запрос подтверждается без базы
+    cached = storage.not_modified()
+    if cached is not None:
+        return cached
     j = db.session.get(Job, job_id)
     if not j or j.status == "deleted":
         abort(404)
     if not j.thumbnail_image:
         abort(404)
 
-    upload_root = os.path.join(os.path.dirname(__file__), "uploads", "job_thumbs")
-    rel_name = j.thumbnail_image
-    candidates = []
-    candidates.append(os.path.join(upload_root, rel_name))
-
-    # fallback: если в базе только имя файла без подкаталога
-    if rel_name and os.sep not in rel_name and "/" not in rel_name:
-        candidates.append(os.path.join(upload_root, str(job_id), rel_name))
-
-    final_path = None
-    for path in candidates:
-        if path and os.path.exists(path):
-            final_path = path
-            break
-
-    if not final_path:
+    rel_path = storage.resolve(j.thumbnail_image, storage.JOB_THUMBS, job_id)
+    if not rel_path:
         abort(404)
-
-    directory, filename = os.path.split(final_path)
-    return send_from_directory(directory, filename)
+    return storage.send_stored(rel_path)
 
 
 @jobs_bp.route("/jobs/<int:job_id>/housing-photo/<int:photo_id>")
 @login_required
 def job_housing_photo(job_id, photo_id):
+    cached = storage.not_modified()
+    if cached is not None:
+        return cached
     ph = db.session.get(JobHousingPhoto, photo_id)
     if not ph or ph.job_id != job_id:
         abort(404)
 
-    upload_root = os.path.join(os.path.dirname(__file__), "uploads", "job_housing")
-    rel_name = ph.filename
-
-    candidates = []
-    if rel_name:
-        candidates.append(os.path.join(upload_root, rel_name))
-        # на случай, если файл лежит прямо в папке job_id
-        if os.sep not in rel_name and "/" not in rel_name:
-            candidates.append(os.path.join(upload_root, str(job_id), rel_name))
-
-    final_path = None
-    for path in candidates:
-        if path and os.path.exists(path):
-            final_path = path
-            break
-
-    if not final_path:
+    rel_path = storage.resolve(ph.filename, storage.JOB_HOUSING, job_id)
+    if not rel_path:
         abort(404)
-
-    directory, filename = os.path.split(final_path)
-    return send_from_directory(directory, filename)
+    return storage.send_stored(rel_path)
 
 
 @jobs_bp.route("/jobs/<int:job_id>")
@@ -284,6 +229,7 @@ def job_promo_update(job_id):
         abort(404)
     j.promo_multiplier = float(request.form.get("promo_multiplier") or 1.0)
     j.promo_label = (request.form.get("promo_label") or "").strip()
+    refresh_job_amounts(j)
     db.session.commit()
     flash("Акция по вакансии обновлена", "success")
     return redirect(url_for("jobs.job_view", job_id=job_id))
@@ -356,6 +302,7 @@ def job_edit(job_id):
         j.recruiter_fee_amount = float(request.form.get("recruiter_fee_amount") or 0)
         j.promo_multiplier = float(request.form.get("promo_multiplier") or 1.0)
         j.promo_label = (request.form.get("promo_label") or "").strip()
+        refresh_job_amounts(j)
 
         # Надбавка для кандидатов-мужчин
         j.male_bonus_enabled = bool(request.form.get("male_bonus_enabled"))
@@ -364,55 +311,8 @@ def job_edit(job_id):
         except ValueError:
             j.male_bonus_percent = 0.0
 
-        # Обложка вакансии (картинка в списке)
-        file = request.files.get("thumbnail_image")
-        if file and file.filename:
-            upload_root = os.path.join(os.path.dirname(__file__), "uploads", "job_thumbs")
-            os.makedirs(upload_root, exist_ok=True)
-            job_dir = os.path.join(upload_root, str(j.id))
-            os.makedirs(job_dir, exist_ok=True)
-            safe_name = secure_filename(file.filename)
-            if safe_name:
-                rel_name = os.path.join(str(j.id), safe_name)
-                save_path = os.path.join(upload_root, rel_name)
-                # если файл уже существует, слегка изменяем имя
-                if os.path.exists(save_path):
-                    base, ext = os.path.splitext(safe_name)
-                    counter = 1
-                    while True:
-                        candidate_name = f"{base}_{counter}{ext}"
-                        rel_name = os.path.join(str(j.id), candidate_name)
-                        save_path = os.path.join(upload_root, rel_name)
-                        if not os.path.exists(save_path):
-                            break
-                        counter += 1
-                file.save(save_path)
-                j.thumbnail_image = rel_name
-        # Фотографии проживания
-        files = request.files.getlist("housing_photos")
-        if files:
-            upload_root = os.path.join(os.path.dirname(__file__), "uploads", "job_housing")
-            os.makedirs(upload_root, exist_ok=True)
-            job_dir = os.path.join(upload_root, str(j.id))
-            os.makedirs(job_dir, exist_ok=True)
-            for f in files:
-                if not f or not f.filename:
-                    continue
-                safe_name = secure_filename(f.filename)
-                if not safe_name:
-                    continue
-                base, ext = os.path.splitext(safe_name)
-                rel_name = os.path.join(str(j.id), safe_name)
-                save_path = os.path.join(upload_root, rel_name)
-                counter = 1
-                while os.path.exists(save_path) and counter < 1000:
-                    cand = f"{base}_{counter}{ext}"
-                    rel_name = os.path.join(str(j.id), cand)
-                    save_path = os.path.join(upload_root, rel_name)
-                    counter += 1
-                f.save(save_path)
-                ph = JobHousingPhoto(job_id=j.id, filename=rel_name, label="")
-                db.session.add(ph)
+        # Обложка вакансии (картинка в списке) и фотографии проживания
+        _save_job_uploads(j)
 
         status = (request.form.get("status") or "active").strip()
         if status not in ("active", "inactive"):
@@ -431,6 +331,7 @@ def job_edit(job_id):
                 recipients,
                 f"Вакансия обновлена: {j.title} ({j.location})"
             )
+            db.session.commit()
 
         flash("Вакансия обновлена", "success")
         return redirect(url_for("jobs.job_view", job_id=j.id))
@@ -470,21 +371,18 @@ def job_submit(job_id):
                 planned_arrival = None
         citizenship = (request.form.get("citizenship") or "").strip()
 
-        # Фиксируем комиссию на момент подачи (с учётом текущего бустера и мужского бонуса)
-        base_partner_offer = (j.partner_fee_amount or 0.0) * (j.promo_multiplier or 1.0)
-
         # Пол кандидата
         candidate_gender = (request.form.get("candidate_gender") or "").strip()
         if candidate_gender not in ("male", "female"):
             candidate_gender = ""
 
-        # Если включён мужской бонус и кандидат — мужчина, увеличиваем комиссию
-        if candidate_gender == "male" and getattr(j, "male_bonus_enabled", False) and (getattr(j, "male_bonus_percent", 0) or 0) > 0:
-            base_partner_offer = base_partner_offer * (1 + (getattr(j, "male_bonus_percent", 0) or 0) / 100.0)
-
-        partner_offer = base_partner_offer
+        # Фиксируем комиссию на момент подачи (с учётом текущего бустера и мужского бонуса)
+        partner_offer = submission_fee(j, candidate_gender)
         recruiter_offer = j.recruiter_fee_amount or 0.0
 
+        # Возможные дубли ищем до вставки: два поиска по индексу (см. duplicates.py)
+        duplicates = find_duplicates(phone, full_name)
+
         c = Candidate(
             job_id = j.id,
             submitter_id = g.user.id,
@@ -497,10 +395,15 @@ def job_submit(job_id):
             gender = candidate_gender,
             partner_fee_offer = partner_offer,
             recruiter_fee_offer = recruiter_offer,
-            created_at = datetime.utcnow()
+            created_at = datetime.utcnow(),
+            phone_key = phone_key(phone),
+            name_key = name_key(full_name),
+            duplicate_of_id = cluster_root(duplicates),
         )
         db.session.add(c)
         db.session.flush()
+        inbox_status_changed(None, c.status)
+        kpi_apply({}, kpi_snapshot(c, None))
 
         profile = CandidateProfile(
             candidate_id=c.id,
@@ -515,21 +418,26 @@ def job_submit(job_id):
 
         doc_type = (request.form.get("doc_type") or "").strip()
         if doc_type:
-            doc_type_map = {
-                "visa": "Виза",
-                "residence_card": "Карта побыта",
-                "visa_free": "Безвиз",
-                "other": "Другое",
-            }
-            doc_label = doc_type_map.get(doc_type, doc_type)
+            doc_label = CANDIDATE_DOC_TYPES.get(doc_type, doc_type)
             prefix = f"Тип документа: {doc_label}"
             if c.notes:
                 c.notes = prefix + " | " + c.notes
             else:
                 c.notes = prefix
 
+        if duplicates:
+            by_phone = any(m["match"].startswith("phone") for m in duplicates)
+            reason = "телефон" if by_phone else "ФИО"
+            if g.user.role == "partner" and g.user.assigned_recruiter_id:
+                create_notification_for_users(
+                    [g.user.assigned_recruiter_id],
+                    f"Возможный дубль: «{c.full_name}» (#{c.id}) — совпадает {reason} с #{duplicates[0]['id']}",
+                )
+
         db.session.commit()
         flash(f"Кандидат «{c.full_name}» отправлен на вакансию «{j.title}».", "success")
+        if duplicates:
+            flash(f"Похоже, этот кандидат уже есть в базе (совпадает {reason}). Рекрутёр проверит подачу.", "warning")
         if g.user.role in ("recruiter","coordinator","director"):
             return redirect(url_for("main.inbox"))
         return redirect(url_for("main.index"))
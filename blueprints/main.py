@@ -1,6 +1,6 @@
 from datetime import date, datetime
 
-from flask import Blueprint, render_template, request, redirect, url_for, session, g, abort, flash, send_from_directory
+from flask import Blueprint, render_template, request, redirect, url_for, session, g, abort, flash, send_from_directory, jsonify
 from werkzeug.security import check_password_hash, generate_password_hash
 from werkzeug.utils import secure_filename
 from sqlalchemy import func, text, case
@@ -29,17 +29,79 @@ from models import (
 )
 from constants import PIPELINE
 from auth_utils import login_required, roles_required
+from periods import current_ym, in_month, normalize_ym
+from partner_health import partner_health, score_partners
+from pagination import keyset_page
+from search import PARTNER_COLUMNS, matching_ids
+import refcache
 
 import os
 
 
 main_bp = Blueprint('main', __name__)
 
+# Размеры страниц для keyset-пагинации (см. pagination.py)
+SUBMISSIONS_PAGE_SIZE = 50
+INBOX_PAGE_SIZE = 100
+
+
+# Активность партнёров на дашборде рекрутёра/координатора. kpi_monthly
+# присоединяется по партнёру (индекс partner_id, ym), а не агрегируется
+# целиком в подзапросе: читаются только строки партнёров из users.
+# План проверяет query_plans.py.
+PARTNER_ACTIVITY_SQL = """
+    SELECT
+      p.id as id,
+      p.name as partner_name,
+      r.name as recruiter_name,
+      COALESCE(SUM(k.submissions), 0) as submissions_total,
+      COALESCE(SUM(CASE WHEN k.ym = :ym THEN k.submissions END), 0) as submissions_month,
+      COALESCE(SUM(k.starts), 0) as starts_total,
+      COALESCE(SUM(CASE WHEN k.ym = :ym THEN k.starts END), 0) as starts_month,
+      MAX(k.last_submission_at) as last_submission_at
+    FROM users p
+    LEFT JOIN users r ON r.id = p.assigned_recruiter_id
+    LEFT JOIN kpi_monthly k ON k.partner_id = p.id
+    WHERE p.role = 'partner'
+    GROUP BY p.id
+    ORDER BY submissions_month DESC, submissions_total DESC
+    LIMIT 100
+"""
+
+
+def _partner_submissions_query(u):
+    """«Мои подачи» партнёра с фильтрами из request.args: (query, текущие фильтры)."""
+    sub_job_id = request.args.get("job_id", type=int)
+    sub_status = request.args.get("status")
+    sub_q = (request.args.get("q") or "").strip()
+
+    q_sub = (db.session.query(Candidate, case((Job.status=="active", Job.title), else_=None).label("job_title"))
+             .join(Job, Candidate.job_id==Job.id)
+             .filter(Candidate.submitter_id==u.id,
+                     Candidate.status != "Удалён"))
+    if sub_job_id:
+        q_sub = q_sub.filter(Candidate.job_id==sub_job_id)
+    if sub_status:
+        q_sub = q_sub.filter(Candidate.status==sub_status)
+    if sub_q:
+        ids = matching_ids(sub_q, PARTNER_COLUMNS)
+        if ids is not None:
+            q_sub = q_sub.filter(Candidate.id.in_(ids))
+    return q_sub, {"job_id": sub_job_id, "status": sub_status, "q": sub_q}
+
+
+def _inbox_query():
+    return (db.session.query(Candidate, case((Job.status=="active", Job.title), else_=None).label("job_title"), User.name.label("submitter_name"), User.note.label("submitter_note"))
+            .join(Job, Candidate.job_id==Job.id)
+            .join(User, User.id==Candidate.submitter_id)
+            .filter(Candidate.status=="Подан"))
+
+
 @main_bp.route("/")
 @login_required
 def index():
     u = g.user
-    ym = date.today().strftime("%Y-%m")
+    ym = current_ym()
     if u.role == "partner":
         # Показываем партнёру только несколько верхних вакансий на дашборде,
         # чтобы блок "Мои подачи" всегда был под рукой.
@@ -55,40 +117,28 @@ def index():
                 .limit(4)
                 .all())
 
-        # Фильтры для блока «Мои подачи»
-        sub_job_id = request.args.get("job_id", type=int)
-        sub_status = request.args.get("status")
-        sub_q = (request.args.get("q") or "").strip()
-
-        q_sub = (db.session.query(Candidate, case((Job.status=="active", Job.title), else_=None).label("job_title"))
-                 .join(Job, Candidate.job_id==Job.id)
-                 .filter(Candidate.submitter_id==u.id,
-                         Candidate.status != "Удалён"))
-        if sub_job_id:
-            q_sub = q_sub.filter(Candidate.job_id==sub_job_id)
-        if sub_status:
-            q_sub = q_sub.filter(Candidate.status==sub_status)
-        if sub_q:
-            like_val = f"%{sub_q}%"
-            q_sub = q_sub.filter(Candidate.full_name.ilike(like_val))
-        submissions = q_sub.order_by(Candidate.created_at.desc()).limit(200).all()
+        # Блок «Мои подачи»: фильтры и постраничный вывод
+        q_sub, sub_filters = _partner_submissions_query(u)
+        sub_page = keyset_page(q_sub, Candidate.created_at, Candidate.id,
+                               request.args.get("cursor"), SUBMISSIONS_PAGE_SIZE)
+        submissions = sub_page.rows
 
         # Метрики: подачи/старты/заработок
         my_submissions = db.session.query(func.count(Candidate.id)).filter(
             Candidate.submitter_id==u.id,
-            func.strftime("%Y-%m", Candidate.created_at)==ym,
+            in_month(Candidate.created_at, ym),
             Candidate.status != "Удалён").scalar() or 0
 
         my_starts = (db.session.query(func.count(Placement.id))
                      .join(Candidate, Candidate.id==Placement.candidate_id)
                      .filter(Candidate.submitter_id==u.id,
-                             func.strftime("%Y-%m", Placement.start_date)==ym).scalar() or 0)
+                             in_month(Placement.start_date, ym)).scalar() or 0)
 
         # Начислено за месяц
         my_month_accrued = (db.session.query(func.coalesce(func.sum(Placement.partner_commission), 0.0))
                              .join(Candidate, Candidate.id==Placement.candidate_id)
                              .filter(Candidate.submitter_id==u.id,
-                                     func.strftime("%Y-%m", Placement.start_date)==ym).scalar() or 0.0)
+                                     in_month(Placement.start_date, ym)).scalar() or 0.0)
 
         # Выплачено за месяц
         my_month_paid = (db.session.query(func.coalesce(func.sum(Placement.partner_commission), 0.0))
@@ -96,7 +146,7 @@ def index():
                           .filter(Candidate.submitter_id==u.id,
                                   Placement.partner_paid == True,
                                   Placement.partner_paid_at.is_not(None),
-                                  func.strftime("%Y-%m", Placement.partner_paid_at)==ym).scalar() or 0.0)
+                                  in_month(Placement.partner_paid_at, ym)).scalar() or 0.0)
 
         # Общий баланс: начислено минус выплачено (за всё время)
         total_accrued = (db.session.query(func.coalesce(func.sum(Placement.partner_commission), 0.0))
@@ -115,7 +165,9 @@ def index():
             submissions=submissions,
             partner_note=partner_note,
             pipeline=PIPELINE,
-            current_filters={"job_id": sub_job_id, "status": sub_status, "q": sub_q},
+            current_filters=sub_filters,
+            submissions_page=sub_page,
+            cursor=request.args.get("cursor"),
             kpi={
                 "my_submissions": my_submissions,
                 "my_starts": my_starts,
@@ -142,16 +194,29 @@ def index():
                        .join(User, User.id==Placement.recruiter_id)
                        .order_by(Placement.created_at.desc()).limit(50).all())
 
-        month_starts = db.session.query(func.count(Placement.id)).filter(
-            func.strftime("%Y-%m", Placement.start_date)==ym).scalar() or 0
-        month_submissions = db.session.query(func.count(Candidate.id)).filter(
-            func.strftime("%Y-%m", Candidate.created_at)==ym).scalar() or 0
-        partner_sum = db.session.query(func.coalesce(func.sum(Placement.partner_commission),0.0)).filter(
-            func.strftime("%Y-%m", Placement.start_date)==ym).scalar() or 0.0
-        recruiter_sum = db.session.query(func.coalesce(func.sum(Placement.recruiter_commission),0.0)).filter(
-            func.strftime("%Y-%m", Placement.start_date)==ym).scalar() or 0.0
-
-        # Персональные метрики рекрутёра (если текущий пользователь — рекрутёр)
+        # Месячные показатели дашборда читаются только из роллапов kpi_monthly (см. kpi.py)
+        kpi_params = {"ym": ym, "uid": u.id if u.role == "recruiter" else 0}
+        totals = db.session.execute(text("""
+            SELECT
+              COALESCE(SUM(submissions), 0) AS submissions,
+              COALESCE(SUM(starts), 0) AS starts,
+              COALESCE(SUM(partner_commission), 0) AS partner_sum,
+              COALESCE(SUM(recruiter_commission), 0) AS recruiter_sum,
+              COALESCE(SUM(CASE WHEN recruiter_id = :uid THEN submissions END), 0) AS my_submissions,
+              COALESCE(SUM(CASE WHEN recruiter_id = :uid THEN starts END), 0) AS my_starts,
+              COALESCE(SUM(CASE WHEN recruiter_id = :uid THEN partner_commission END), 0) AS my_partner_sum,
+              COALESCE(SUM(CASE WHEN recruiter_id = :uid THEN recruiter_commission END), 0) AS my_recruiter_sum
+            FROM kpi_monthly
+            WHERE ym = :ym
+        """), kpi_params).mappings().one()
+
+        month_starts = totals["starts"]
+        month_submissions = totals["submissions"]
+        partner_sum = totals["partner_sum"]
+        recruiter_sum = totals["recruiter_sum"]
+
+        # Персональные метрики рекрутёра (если текущий пользователь — рекрутёр):
+        # подачи кандидатов с его трудоустройствами, его старты и суммы за месяц
         my_submissions = 0
         my_starts = 0
         my_partner_sum = 0.0
@@ -159,48 +224,10 @@ def index():
         my_status_counts = {}
 
         if u.role == "recruiter":
-            # Подачи этого рекрутёра (кандидаты с его трудоустройствами, созданные в этом месяце)
-            my_submissions = (
-                db.session.query(func.count(Candidate.id))
-                .join(Placement, Placement.candidate_id == Candidate.id)
-                .filter(
-                    Placement.recruiter_id == u.id,
-                    func.strftime("%Y-%m", Candidate.created_at) == ym,
-                )
-                .scalar()
-                or 0
-            )
-
-            # Старты этого рекрутёра за месяц
-            my_starts = (
-                db.session.query(func.count(Placement.id))
-                .filter(
-                    Placement.recruiter_id == u.id,
-                    func.strftime("%Y-%m", Placement.start_date) == ym,
-                )
-                .scalar()
-                or 0
-            )
-
-            # Суммы по этому рекрутёру за месяц
-            my_partner_sum = (
-                db.session.query(func.coalesce(func.sum(Placement.partner_commission), 0.0))
-                .filter(
-                    Placement.recruiter_id == u.id,
-                    func.strftime("%Y-%m", Placement.start_date) == ym,
-                )
-                .scalar()
-                or 0.0
-            )
-            my_recruiter_sum = (
-                db.session.query(func.coalesce(func.sum(Placement.recruiter_commission), 0.0))
-                .filter(
-                    Placement.recruiter_id == u.id,
-                    func.strftime("%Y-%m", Placement.start_date) == ym,
-                )
-                .scalar()
-                or 0.0
-            )
+            my_submissions = totals["my_submissions"]
+            my_starts = totals["my_starts"]
+            my_partner_sum = totals["my_partner_sum"]
+            my_recruiter_sum = totals["my_recruiter_sum"]
 
             # Воронка по статусам для кандидатов этого рекрутёра (за всё время)
             status_rows_my = (
@@ -215,116 +242,36 @@ def index():
         my_conversion = round(my_starts / my_submissions * 100.0, 1) if my_submissions else 0.0
 
         top_rec = db.session.execute(text("""
-            SELECT u.name as name, COUNT(p.id) as starts, COALESCE(SUM(p.recruiter_commission),0) as recruiter_sum
-            FROM placements p
-            JOIN users u ON u.id = p.recruiter_id
-            WHERE strftime('%Y-%m', p.start_date) = :ym
-            GROUP BY u.id ORDER BY starts DESC LIMIT 10
+            SELECT u.name as name, SUM(k.starts) as starts, COALESCE(SUM(k.recruiter_commission),0) as recruiter_sum
+            FROM kpi_monthly k
+            JOIN users u ON u.id = k.recruiter_id
+            WHERE k.ym = :ym
+            GROUP BY u.id HAVING SUM(k.starts) > 0
+            ORDER BY starts DESC LIMIT 10
         """), {"ym": ym}).mappings().all()
 
         top_par = db.session.execute(text("""
-            SELECT u.name as name, COUNT(p.id) as starts, COALESCE(SUM(p.partner_commission),0) as partner_sum
-            FROM placements p
-            JOIN candidates c ON c.id = p.candidate_id
-            JOIN users u ON u.id = c.submitter_id
-            WHERE strftime('%Y-%m', p.start_date) = :ym
-            GROUP BY u.id ORDER BY starts DESC LIMIT 10
+            SELECT u.name as name, SUM(k.starts) as starts, COALESCE(SUM(k.partner_commission),0) as partner_sum
+            FROM kpi_monthly k
+            JOIN users u ON u.id = k.partner_id
+            WHERE k.ym = :ym
+            GROUP BY u.id HAVING SUM(k.starts) > 0
+            ORDER BY starts DESC LIMIT 10
         """), {"ym": ym}).mappings().all()
 
-        partner_activity = db.session.execute(text("""
-            SELECT
-              p.id as id,
-              p.name as partner_name,
-              r.name as recruiter_name,
-              COUNT(c.id) as submissions_total,
-              SUM(CASE WHEN c.id IS NOT NULL AND strftime('%Y-%m', c.created_at) = :ym THEN 1 ELSE 0 END) as submissions_month,
-              COUNT(pl.id) as starts_total,
-              SUM(CASE WHEN pl.id IS NOT NULL AND pl.start_date IS NOT NULL AND strftime('%Y-%m', pl.start_date) = :ym THEN 1 ELSE 0 END) as starts_month,
-              MAX(c.created_at) as last_submission_at
-            FROM users p
-            LEFT JOIN users r ON r.id = p.assigned_recruiter_id
-            LEFT JOIN candidates c ON c.submitter_id = p.id
-            LEFT JOIN placements pl ON pl.candidate_id = c.id
-            WHERE p.role = 'partner'
-            GROUP BY p.id
-            ORDER BY submissions_month DESC, submissions_total DESC
-            LIMIT 100
-        """), {"ym": ym}).mappings().all()
+        partner_activity = db.session.execute(text(PARTNER_ACTIVITY_SQL), {"ym": ym}).mappings().all()
 
 
         # Рассчитываем "здоровье" партнёров
-        partner_health = []
-        today = date.today()
-        soft_gap = 30
-        hard_gap = 60
-
-        for row in partner_activity:
-            row = dict(row)
-            last_raw = row.get("last_submission_at")
-            last_date = None
-            days_since_last = None
-            if last_raw:
-                try:
-                    last_dt = datetime.fromisoformat(str(last_raw))
-                    last_date = last_dt.date()
-                except ValueError:
-                    try:
-                        last_date = datetime.strptime(str(last_raw).split(" ")[0], "%Y-%m-%d").date()
-                    except ValueError:
-                        last_date = None
-                if last_date:
-                    days_since_last = (today - last_date).days
-
-            submissions_month = row.get("submissions_month") or 0
-            starts_month = row.get("starts_month") or 0
-
-            if submissions_month > 0 or starts_month > 0:
-                health_status = "green"
-                health_status_label = "Активный"
-            else:
-                if days_since_last is None:
-                    health_status = "red"
-                    health_status_label = "Спит"
-                elif days_since_last <= soft_gap:
-                    health_status = "yellow"
-                    health_status_label = "Затухает"
-                elif days_since_last <= hard_gap:
-                    health_status = "yellow"
-                    health_status_label = "Затухает"
-                else:
-                    health_status = "red"
-                    health_status_label = "Спит"
-
-            base_score = submissions_month + 2 * starts_month
-            if days_since_last is None:
-                recency_factor = 0.2
-            elif days_since_last <= 7:
-                recency_factor = 1.0
-            elif days_since_last <= 30:
-                recency_factor = 0.7
-            elif days_since_last <= 60:
-                recency_factor = 0.4
-            else:
-                recency_factor = 0.1
-
-            health_score = int(min(100, base_score * 10 * recency_factor))
-
-            row["health_status"] = health_status
-            row["health_status_label"] = health_status_label
-            row["health_score"] = health_score
-            row["days_since_last"] = days_since_last
-
-            partner_health.append(row)
-
-        partner_activity = partner_health
+        partner_activity = score_partners(partner_activity)
 
         partner_top_healthy = sorted(
-            [r for r in partner_health if r.get("health_score", 0) > 0],
+            [r for r in partner_activity if r.get("health_score", 0) > 0],
             key=lambda r: r.get("health_score", 0),
             reverse=True
         )[:10]
 
-        sleepy_candidates = [r for r in partner_health if r.get("health_status") in ("yellow", "red")]
+        sleepy_candidates = [r for r in partner_activity if r.get("health_status") in ("yellow", "red")]
         partner_sleepy = sorted(
             sleepy_candidates,
             key=lambda r: r.get("days_since_last") if r.get("days_since_last") is not None else 9999,
@@ -335,14 +282,18 @@ def index():
             SELECT
               r.id as id,
               r.name as recruiter_name,
-              COUNT(DISTINCT p.id) as partners_total,
-              COUNT(DISTINCT CASE WHEN c.id IS NOT NULL AND strftime('%Y-%m', c.created_at) = :ym THEN p.id END) as active_partners_month,
-              SUM(CASE WHEN c.id IS NOT NULL AND strftime('%Y-%m', c.created_at) = :ym THEN 1 ELSE 0 END) as submissions_month,
-              SUM(CASE WHEN pl.id IS NOT NULL AND pl.start_date IS NOT NULL AND strftime('%Y-%m', pl.start_date) = :ym THEN 1 ELSE 0 END) as starts_month
+              COUNT(p.id) as partners_total,
+              COUNT(CASE WHEN k.submissions > 0 THEN p.id END) as active_partners_month,
+              COALESCE(SUM(k.submissions), 0) as submissions_month,
+              COALESCE(SUM(k.starts), 0) as starts_month
             FROM users r
             LEFT JOIN users p ON p.assigned_recruiter_id = r.id AND p.role = 'partner'
-            LEFT JOIN candidates c ON c.submitter_id = p.id
-            LEFT JOIN placements pl ON pl.candidate_id = c.id
+            LEFT JOIN (
+              SELECT partner_id, SUM(submissions) as submissions, SUM(starts) as starts
+              FROM kpi_monthly
+              WHERE ym = :ym
+              GROUP BY partner_id
+            ) k ON k.partner_id = p.id
             WHERE r.role = 'recruiter'
             GROUP BY r.id
             ORDER BY partners_total DESC
@@ -393,7 +344,7 @@ def my_partners():
     if g.user.role in ("coordinator", "director"):
         recruiter_filter_id = request.args.get("recruiter_id", type=int)
 
-    ym = date.today().strftime("%Y-%m")
+    ym = current_ym()
 
     # Партнёры (созданные пользователи)
     partner_query = db.session.query(User).filter(User.role == "partner")
@@ -405,99 +356,21 @@ def my_partners():
 
     partners_total = len(partners)
 
-    # Здоровье партнёров для текущего списка
-    soft_gap = 30
-    hard_gap = 60
-    today = date.today()
-    sleepy_30 = []
-
+    # Здоровье партнёров для текущего списка: один запрос на весь набор.
+    # Напоминания о «заснувших» партнёрах шлёт фоновая задача sleepy_partners (scheduler.py).
+    health = partner_health([u.id for u in partners], ym)
     for u in partners:
-        stats = db.session.execute(text("""
-            SELECT
-              COUNT(c.id) as submissions_total,
-              SUM(CASE WHEN c.id IS NOT NULL AND strftime('%Y-%m', c.created_at) = :ym THEN 1 ELSE 0 END) as submissions_month,
-              COUNT(pl.id) as starts_total,
-              SUM(CASE WHEN pl.id IS NOT NULL AND strftime('%Y-%m', pl.start_date) = :ym THEN 1 ELSE 0 END) as starts_month,
-              MAX(c.created_at) as last_submission_at
-            FROM candidates c
-            LEFT JOIN placements pl ON pl.candidate_id = c.id
-            WHERE c.submitter_id = :pid
-        """), {"ym": ym, "pid": u.id}).mappings().first()
-
-        last_raw = stats["last_submission_at"] if stats else None
-        last_date = None
-        days_since_last = None
-        if last_raw:
-            try:
-                last_dt = datetime.fromisoformat(str(last_raw))
-                last_date = last_dt.date()
-            except ValueError:
-                try:
-                    last_date = datetime.strptime(str(last_raw).split(" ")[0], "%Y-%m-%d").date()
-                except ValueError:
-                    last_date = None
-            if last_date:
-                days_since_last = (today - last_date).days
-
-        submissions_month = (stats["submissions_month"] if stats else 0) or 0
-        starts_month = (stats["starts_month"] if stats else 0) or 0
-
-        if submissions_month > 0 or starts_month > 0:
-            health_status = "green"
-            health_status_label = "Активный"
-        else:
-            if days_since_last is None:
-                health_status = "red"
-                health_status_label = "Спит"
-            elif days_since_last <= soft_gap:
-                health_status = "yellow"
-                health_status_label = "Затухает"
-            elif days_since_last <= hard_gap:
-                health_status = "yellow"
-                health_status_label = "Затухает"
-            else:
-                health_status = "red"
-                health_status_label = "Спит"
-
-        base_score = submissions_month + 2 * starts_month
-        if days_since_last is None:
-            recency_factor = 0.2
-        elif days_since_last <= 7:
-            recency_factor = 1.0
-        elif days_since_last <= 30:
-            recency_factor = 0.7
-        elif days_since_last <= 60:
-            recency_factor = 0.4
-        else:
-            recency_factor = 0.1
-
-        health_score = int(min(100, base_score * 10 * recency_factor))
-
-        u.health_status = health_status
-        u.health_status_label = health_status_label
-        u.health_score = health_score
-        u.days_since_last = days_since_last
-
-        if days_since_last is not None and days_since_last >= 30:
-            sleepy_30.append(u)
-
-    # Уведомление рекрутёру о "заснувших" партнёрах (без подач >= 30 дней)
-    if g.user.role == "recruiter" and sleepy_30:
-        msg = f"У тебя {len(sleepy_30)} партнёров без подач больше 30 дней."
-        existing_note = (
-            db.session.query(Notification)
-            .filter(Notification.user_id == g.user.id, Notification.message == msg, Notification.is_read == False)
-            .first()
-        )
-        if not existing_note:
-            create_notification_for_users([g.user.id], msg)
-            db.session.commit()
+        row = health[u.id]
+        u.health_status = row["health_status"]
+        u.health_status_label = row["health_status_label"]
+        u.health_score = row["health_score"]
+        u.days_since_last = row["days_since_last"]
 
     # Новые партнёры в этом месяце (по одобренным заявкам)
     new_partners_q = db.session.query(func.count(RegistrationRequest.id)).filter(
         RegistrationRequest.role == "partner",
         RegistrationRequest.status == "approved",
-        func.strftime("%Y-%m", RegistrationRequest.created_at) == ym,
+        in_month(RegistrationRequest.created_at, ym),
     )
     if g.user.role == "recruiter":
         new_partners_q = new_partners_q.filter(RegistrationRequest.assigned_recruiter_id == g.user.id)
@@ -518,12 +391,7 @@ def my_partners():
 
     recruiters = []
     if g.user.role in ("coordinator", "director"):
-        recruiters = (
-            db.session.query(User)
-            .filter(User.role == "recruiter", User.is_active == True)
-            .order_by(User.name.asc())
-            .all()
-        )
+        recruiters = refcache.get("active_recruiters")
 
     return render_template(
         "my_partners.html",
@@ -544,12 +412,60 @@ def my_partners():
 def inbox():
     if g.user.role not in ("recruiter","coordinator","director"):
         return redirect(url_for("main.index"))
-    rows = (db.session.query(Candidate, case((Job.status=="active", Job.title), else_=None).label("job_title"), User.name.label("submitter_name"), User.note.label("submitter_note"))
-            .join(Job, Candidate.job_id==Job.id)
-            .join(User, User.id==Candidate.submitter_id)
-            .filter(Candidate.status=="Подан")
-            .order_by(Candidate.created_at.desc()).limit(300).all())
-    return render_template("inbox.html", rows=rows)
+    page = keyset_page(_inbox_query(), Candidate.created_at, Candidate.id,
+                       request.args.get("cursor"), INBOX_PAGE_SIZE)
+    return render_template("inbox.html", rows=page.rows, page=page, cursor=request.args.get("cursor"),
+                           pipeline=PIPELINE, status_reasons=refcache.get("status_reasons"))
+
+
+@main_bp.route("/inbox/json")
+@login_required
+def inbox_json():
+    """«Входящие» постранично в JSON (?cursor= из next_cursor)."""
+    if g.user.role not in ("recruiter","coordinator","director"):
+        abort(403)
+    page = keyset_page(_inbox_query(), Candidate.created_at, Candidate.id,
+                       request.args.get("cursor"), INBOX_PAGE_SIZE)
+    return jsonify({
+        "items": [
+            {
+                "id": c.id,
+                "full_name": c.full_name,
+                "created_at": c.created_at.isoformat(),
+                "job_id": c.job_id,
+                "job_title": job_title,
+                "submitter_id": c.submitter_id,
+                "submitter_name": submitter_name,
+            }
+            for c, job_title, submitter_name, _note in page.rows
+        ],
+        "next_cursor": page.next_cursor,
+    })
+
+
+@main_bp.route("/my-submissions/json")
+@login_required
+def my_submissions_json():
+    """Блок «Мои подачи» партнёра постранично в JSON, с теми же фильтрами (job_id, status, q)."""
+    if g.user.role != "partner":
+        abort(403)
+    q_sub, _filters = _partner_submissions_query(g.user)
+    page = keyset_page(q_sub, Candidate.created_at, Candidate.id,
+                       request.args.get("cursor"), SUBMISSIONS_PAGE_SIZE)
+    return jsonify({
+        "items": [
+            {
+                "id": c.id,
+                "full_name": c.full_name,
+                "status": c.status,
+                "created_at": c.created_at.isoformat(),
+                "job_id": c.job_id,
+                "job_title": job_title,
+            }
+            for c, job_title in page.rows
+        ],
+        "next_cursor": page.next_cursor,
+    })
 
 
 @main_bp.route("/analytics")
@@ -557,13 +473,13 @@ def inbox():
 @roles_required("coordinator")
 def analytics():
     """Аналитика с фильтрами по месяцу, рекрутёру, партнёру и вакансии."""
-    ym = request.args.get("ym") or date.today().strftime("%Y-%m")
+    ym = normalize_ym(request.args.get("ym"))
     recruiter_id = request.args.get("recruiter_id", type=int)
     partner_id = request.args.get("partner_id", type=int)
     job_id = request.args.get("job_id", type=int)
 
     # Базовый фильтр по месяцу (по дате старта)
-    filters = [func.strftime("%Y-%m", Placement.start_date) == ym]
+    filters = [in_month(Placement.start_date, ym)]
 
     if recruiter_id:
         filters.append(Placement.recruiter_id == recruiter_id)
@@ -646,20 +562,10 @@ def analytics():
         .all()
     )
 
-    # Справочники для фильтров
-    recruiters = (
-        db.session.query(User)
-        .filter(User.role == "recruiter", User.is_active == True)
-        .order_by(User.name.asc())
-        .all()
-    )
-    partners = (
-        db.session.query(User)
-        .filter(User.role == "partner", User.is_active == True)
-        .order_by(User.name.asc())
-        .all()
-    )
-    jobs = db.session.query(Job).order_by(Job.title.asc()).all()
+    # Справочники для фильтров (кэш воркера, см. refcache.py)
+    recruiters = refcache.get("active_recruiters")
+    partners = refcache.get("active_partners")
+    jobs = refcache.get("jobs")
 
     current_filters = {
         "ym": ym,
@@ -27,6 +27,7 @@ from models import (
 )
 from constants import PIPELINE
 from auth_utils import login_required, roles_required
+from counters import bump_user_counter
 
 import os
 
@@ -53,5 +54,6 @@ def news_mark_read(news_id):
     existing = db.session.query(NewsRead).filter_by(news_id=news_id, user_id=g.user.id).first()
     if not existing:
         db.session.add(NewsRead(news_id=news_id, user_id=g.user.id))
+        bump_user_counter([g.user.id], "news_unread", -1)
         db.session.commit()
     return redirect(url_for("news.news_list"))
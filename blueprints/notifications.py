@@ -1,6 +1,7 @@
 from flask import Blueprint, render_template, jsonify, g, redirect, url_for, request, flash, abort
 from models import db, Notification
 from auth_utils import login_required
+from counters import bump_user_counter, reset_user_counter
 
 
 notifications_bp = Blueprint("notifications", __name__, url_prefix="/notifications")
@@ -52,6 +53,7 @@ def mark_one_read(note_id: int):
         abort(404)
     if not note.is_read:
         note.is_read = True
+        bump_user_counter([user.id], "notifications_unread", -1)
         db.session.commit()
     return redirect(url_for("notifications.notifications_page"))
 
@@ -66,6 +68,7 @@ def mark_all_read():
         .filter_by(user_id=user.id, is_read=False)
         .update({Notification.is_read: True}, synchronize_session=False)
     )
+    reset_user_counter(user.id, "notifications_unread", 0)
     db.session.commit()
     flash("Все уведомления отмечены как прочитанные.", "success")
     return redirect(url_for("notifications.notifications_page"))
@@ -2,7 +2,6 @@ from datetime import date, datetime
 
 from flask import Blueprint, render_template, request, redirect, url_for, session, g, abort, flash, send_from_directory
 from werkzeug.security import check_password_hash, generate_password_hash
-from werkzeug.utils import secure_filename
 from sqlalchemy import func, text, case
 from sqlalchemy.orm import aliased
 
@@ -28,7 +27,9 @@ from models import (
     RegistrationRequest,
 )
 from constants import PIPELINE
-from auth_utils import login_required, roles_required
+from auth_utils import login_required, roles_required, invalidate_principal
+from periods import day_range_bounds, in_range
+import storage
 
 import os
 
@@ -76,6 +77,7 @@ def partner_profile():
             flash("Пароль успешно изменён.", "success")
 
         db.session.commit()
+        invalidate_principal(u.id)
 
         # Проверяем чек-лист онбординга и уведомляем рекрутёра при полном завершении
         profile_filled = bool(u.bank_account and u.bank_name and u.company_name and u.tax_id and u.address)
@@ -102,16 +104,10 @@ def partner_profile():
 
         file = request.files.get("doc_file")
         doc_label = (request.form.get("doc_label") or "").strip()
-        if file and file.filename:
-            upload_root = os.path.join(os.path.dirname(__file__), "uploads", "partner_docs")
-            os.makedirs(upload_root, exist_ok=True)
-            safe_name = secure_filename(file.filename)
-            partner_dir = os.path.join(upload_root, str(u.id))
-            os.makedirs(partner_dir, exist_ok=True)
-            save_path = os.path.join(partner_dir, safe_name)
-            file.save(save_path)
-            rel_name = f"{u.id}/{safe_name}"
-            doc = PartnerDoc(partner_id=u.id, filename=rel_name, label=doc_label)
+        stored = storage.save_upload(file)
+        if stored:
+            doc = PartnerDoc(partner_id=u.id, filename=storage.display_name(file.filename),
+                             storage_path=stored.path, label=doc_label)
             db.session.add(doc)
             db.session.commit()
             flash("Документ загружен", "success")
@@ -189,8 +185,10 @@ def partner_doc(doc_id):
     elif g.user.role not in ("coordinator", "director", "finance"):
         abort(403)
 
-    upload_root = os.path.join(os.path.dirname(__file__), "uploads", "partner_docs")
-    return send_from_directory(upload_root, d.filename)
+    rel_path = d.storage_path or storage.resolve(d.filename, storage.PARTNER_DOCS, d.partner_id)
+    if not rel_path:
+        abort(404)
+    return storage.send_stored(rel_path, download_name=storage.display_name(d.filename))
 
 
 
@@ -208,15 +206,9 @@ def partner_earnings():
             SELECT 
               strftime('%Y-%m', p.start_date) AS ym,
               COUNT(p.id) AS starts,
-              COALESCE(SUM(
-                CASE 
-                  WHEN p.partner_commission IS NOT NULL AND p.partner_commission > 0 THEN p.partner_commission
-                  WHEN j.partner_fee_amount IS NOT NULL AND j.partner_fee_amount > 0 THEN j.partner_fee_amount * COALESCE(j.promo_multiplier, 1)
-                  ELSE 0 END
-              ),0) AS total
+              COALESCE(SUM(p.amount_effective), 0) AS total
             FROM placements p
             JOIN candidates c ON c.id = p.candidate_id
-            JOIN jobs j ON j.id = p.job_id
             WHERE c.submitter_id = :pid
             GROUP BY ym
             ORDER BY ym DESC
@@ -244,17 +236,9 @@ def partner_earnings():
         if not pl.start_date:
             continue
 
-        # start_date хранится как строка YYYY-MM-DD, поэтому аккуратно получаем YYYY-MM
-        if isinstance(pl.start_date, str):
-            ym = pl.start_date[:7]
-        else:
-            ym = pl.start_date.strftime("%Y-%m")
+        ym = pl.start_date.strftime("%Y-%m")
 
-        amount = pl.partner_commission or 0.0
-        if not amount:
-            if job.partner_fee_amount and job.partner_fee_amount > 0:
-                promo = job.promo_multiplier or 1.0
-                amount = (job.partner_fee_amount or 0.0) * promo
+        amount = pl.amount_effective or 0.0
 
         details_by_month.setdefault(ym, []).append(
             {
@@ -321,12 +305,7 @@ def partner_payouts():
 
         payout = key_map[key]
 
-        # Сумма по кандидату такая же логика, как в других отчётах
-        amount = pl.partner_commission or 0.0
-        if not amount:
-            if job.partner_fee_amount:
-                promo = job.promo_multiplier or 1.0
-                amount = (job.partner_fee_amount or 0.0) * promo
+        amount = pl.amount_effective or 0.0
 
         payout["candidates"].append(
             {
@@ -378,15 +357,16 @@ def partner_reports():
     start_str = start.isoformat() if start else None
     end_str = today.isoformat()
 
+    # Период включает сегодняшний день: [start, завтра)
+    if start:
+        range_start, range_end = day_range_bounds(start, today)
+
     # Базовый запрос по кандидатам этого партнёра
     from sqlalchemy import func
 
     cand_query = db.session.query(Candidate).filter(Candidate.submitter_id == u.id)
-    if start_str:
-        cand_query = cand_query.filter(
-            func.date(Candidate.created_at) >= start_str,
-            func.date(Candidate.created_at) <= end_str,
-        )
+    if start:
+        cand_query = cand_query.filter(in_range(Candidate.created_at, range_start, range_end))
 
     candidates_all = cand_query.subquery()
 
@@ -414,11 +394,8 @@ def partner_reports():
         .join(Candidate, Candidate.id == Placement.candidate_id)
         .filter(Candidate.submitter_id == u.id)
     )
-    if start_str:
-        place_query = place_query.filter(
-            Placement.start_date >= start_str,
-            Placement.start_date <= end_str,
-        )
+    if start:
+        place_query = place_query.filter(in_range(Placement.start_date, range_start, range_end))
 
     placements = place_query.all()
     placements_count = len(placements)
@@ -435,11 +412,8 @@ def partner_reports():
             Placement.partner_paid_at.isnot(None),
         )
     )
-    if start_str:
-        paid_query = paid_query.filter(
-            func.date(Placement.partner_paid_at) >= start_str,
-            func.date(Placement.partner_paid_at) <= end_str,
-        )
+    if start:
+        paid_query = paid_query.filter(in_range(Placement.partner_paid_at, range_start, range_end))
 
     paid_placements = paid_query.all()
     paid_sum = sum(p.partner_commission or 0.0 for p in paid_placements)
@@ -0,0 +1,84 @@
+"""CLI-команды обслуживания: `flask --app app <команда>`."""
+import click
+
+from models import db
+
+
+def register_commands(app):
+    @app.cli.command("rebuild-kpi")
+    def rebuild_kpi_command():
+        """Пересобрать месячные KPI-роллапы (kpi_monthly) с нуля."""
+        from kpi import rebuild_kpi
+
+        rows = rebuild_kpi()
+        db.session.commit()
+        click.echo(f"kpi_monthly: {rows} строк")
+
+    @app.cli.command("rebuild-search")
+    def rebuild_search_command():
+        """Пересобрать полнотекстовый индекс кандидатов (candidate_search)."""
+        from search import rebuild_search
+
+        rows = rebuild_search()
+        db.session.commit()
+        click.echo(f"candidate_search: {rows} строк")
+
+    @app.cli.command("run-jobs")
+    @click.option("--loop", is_flag=True, help="Проверять задачи в цикле, а не один раз.")
+    @click.option("--poll", default=60.0, show_default=True, help="Пауза между проверками в режиме --loop, сек.")
+    @click.option("--force", multiple=True, help="Выполнить задачу сейчас, даже если её время не пришло.")
+    def run_jobs_command(loop, poll, force):
+        """Выполнить периодические задачи, которым пора (см. scheduler.py)."""
+        from scheduler import JOBS, run_due, run_forever
+
+        unknown = sorted(set(force) - set(JOBS))
+        if unknown:
+            raise click.BadParameter(f"нет такой задачи: {', '.join(unknown)}", param_hint="--force")
+        if loop:
+            run_forever(app, poll)
+            return
+        results = run_due(force=force)
+        if not results:
+            click.echo("Нет задач к запуску")
+        for name, summary in results.items():
+            click.echo(f"{name}: {summary}")
+
+    @app.cli.command("import-candidates")
+    @click.argument("path", type=click.Path(exists=True, dir_okay=False))
+    @click.option("--partner", "partner_id", type=int, required=True, help="ID партнёра, от имени которого подаются кандидаты.")
+    @click.option("--job", "job_id", type=int, default=None, help="Вакансия для строк без колонки job_id.")
+    @click.option("--dry-run", is_flag=True, help="Проверить файл и показать отчёт, ничего не сохраняя.")
+    def import_candidates_command(path, partner_id, job_id, dry_run):
+        """Загрузить кандидатов из CSV / XLSX (см. importer.py)."""
+        from importer import ImportFileError, import_candidates, read_rows
+        from models import User
+
+        partner = db.session.get(User, partner_id)
+        if partner is None or partner.role != "partner":
+            raise click.BadParameter(f"нет партнёра #{partner_id}", param_hint="--partner")
+        try:
+            with open(path, "rb") as f:
+                result = import_candidates(read_rows(f, path), partner.id, job_id)
+        except ImportFileError as exc:
+            db.session.rollback()
+            raise click.ClickException(str(exc))
+        for row_num, message in result.errors:
+            click.echo(f"строка {row_num}: {message}", err=True)
+        for row_num, message in result.warnings:
+            click.echo(f"строка {row_num}: {message}")
+        if dry_run:
+            db.session.rollback()
+        else:
+            db.session.commit()
+        click.echo(f"{'Проверено' if dry_run else 'Загружено'}: {result.imported}, пропущено: {result.skipped}, "
+                   f"дублей по телефону: {result.duplicates}")
+
+    @app.cli.command("migrate-uploads")
+    def migrate_uploads_command():
+        """Перенести загруженные файлы старой раскладки в хранилище по содержимому (см. storage.py)."""
+        from storage import migrate_legacy
+
+        stats = migrate_legacy()
+        db.session.commit()
+        for section, (moved, missing) in stats.items():
+            click.echo(f"{section}: перенесено {moved}, файлов не найдено {missing}")
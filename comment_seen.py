@@ -0,0 +1,121 @@
+"""Отметки «комментарии прочитаны» без записи на каждый просмотр кандидата.
+
+Карточка кандидата раньше делала SELECT + INSERT/UPDATE candidate_comment_seen
+и commit() на каждый GET, превращая чтение в запись и борясь за блокировку
+записи SQLite. Теперь:
+
+* если с last_seen_at не появилось новых комментариев (или их нет вовсе),
+  ничего не пишется;
+* остальные отметки копятся в буфере воркера и пишутся пачкой одной
+  транзакцией не чаще раза в COMMENT_SEEN_FLUSH_SECONDS (после запроса, при
+  следующей отметке или при остановке процесса);
+* пока отметка в буфере, подсчёт непрочитанных учитывает её (pending_seen),
+  поэтому пользователь сразу видит свои комментарии прочитанными.
+
+Отметка только сдвигает last_seen_at вперёд (MAX), так что порядок сброса
+буферов разных воркеров не важен.
+"""
+import atexit
+import logging
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import DateTime, bindparam, func, select, text
+
+from config import Config
+from models import CandidateCommentSeen, db
+
+log = logging.getLogger(__name__)
+
+# (user_id, candidate_id) -> last_seen_at, ещё не записанные в базу
+_pending: dict[tuple[int, int], datetime] = {}
+_lock = threading.Lock()
+_last_flush = time.monotonic()
+_engine = None
+
+_UPDATE_SQL = text(
+    "UPDATE candidate_comment_seen SET last_seen_at = MAX(last_seen_at, :ts) "
+    "WHERE candidate_id = :cid AND user_id = :uid"
+).bindparams(bindparam("ts", type_=DateTime))
+
+_INSERT_SQL = text(
+    "INSERT INTO candidate_comment_seen (candidate_id, user_id, last_seen_at) "
+    "SELECT :cid, :uid, :ts WHERE NOT EXISTS ("
+    "  SELECT 1 FROM candidate_comment_seen WHERE candidate_id = :cid AND user_id = :uid)"
+).bindparams(bindparam("ts", type_=DateTime))
+
+
+def mark_seen(user_id: int, candidate_id: int, latest_comment_at: datetime | None,
+              now: datetime | None = None) -> bool:
+    """Отметить, что пользователь видел комментарии кандидата. True — отметка поставлена в буфер.
+
+    latest_comment_at — время самого нового комментария (None, если комментариев нет).
+    """
+    if latest_comment_at is None:
+        return False
+    key = (user_id, candidate_id)
+    with _lock:
+        pending = _pending.get(key)
+    if pending is not None and pending >= latest_comment_at:
+        return False
+    stored = db.session.execute(
+        select(func.max(CandidateCommentSeen.last_seen_at)).where(
+            CandidateCommentSeen.candidate_id == candidate_id, CandidateCommentSeen.user_id == user_id
+        )
+    ).scalar()
+    if stored is not None and stored >= latest_comment_at:
+        return False
+    now = now or datetime.utcnow()
+    with _lock:
+        if _pending.get(key) is None or _pending[key] < now:
+            _pending[key] = now
+    return True
+
+
+def pending_seen(user_id: int, candidate_ids) -> dict[int, datetime]:
+    """Отметки пользователя из буфера воркера: {candidate_id: last_seen_at}."""
+    wanted = set(candidate_ids)
+    with _lock:
+        return {cid: ts for (uid, cid), ts in _pending.items() if uid == user_id and cid in wanted}
+
+
+def flush(force: bool = False) -> int:
+    """Записать буфер одной транзакцией, если прошёл интервал (или force). Возвращает число отметок."""
+    global _last_flush
+    with _lock:
+        if not _pending:
+            return 0
+        if not force and time.monotonic() - _last_flush < Config.COMMENT_SEEN_FLUSH_SECONDS:
+            return 0
+        batch = dict(_pending)
+        _pending.clear()
+        _last_flush = time.monotonic()
+
+    params = [{"uid": uid, "cid": cid, "ts": ts} for (uid, cid), ts in batch.items()]
+    engine = _engine or db.session.get_bind()
+    try:
+        # Отдельное соединение: сессия запроса остаётся только читающей
+        with engine.begin() as conn:
+            conn.execute(_UPDATE_SQL, params)
+            conn.execute(_INSERT_SQL, params)
+    except Exception:
+        log.exception("Comment seen flush failed, %d marks kept for retry", len(batch))
+        with _lock:
+            for key, ts in batch.items():
+                if _pending.get(key) is None or _pending[key] < ts:
+                    _pending[key] = ts
+        return 0
+    return len(batch)
+
+
+def init_comment_seen(app, engine) -> None:
+    """Сбрасывать буфер после запросов и при остановке воркера."""
+    global _engine
+    _engine = engine
+
+    @app.teardown_appcontext
+    def _flush_comment_seen(exc=None):
+        flush()
+
+    atexit.register(flush, True)
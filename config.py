@@ -19,6 +19,34 @@ class Config:
     # Универсальная строка подключения, которую будет использовать Alembic
     SQLALCHEMY_DATABASE_URI = os.environ.get("DATABASE_URL") or f"sqlite:///{DB_PATH}"
 
+    # Сколько секунд воркер держит в памяти данные текущего пользователя (g.user)
+    PRINCIPAL_CACHE_TTL = float(os.environ.get("PRINCIPAL_CACHE_TTL", "30"))
+
+    # Корень загруженных файлов (хранилище по содержимому, см. storage.py).
+    # По умолчанию — прежняя папка blueprints/uploads, где лежат файлы старой раскладки
+    UPLOAD_ROOT = os.environ.get("UPLOAD_ROOT") or str(BASE_DIR / "blueprints" / "uploads")
+
+    # Кто передаёт байты файла клиенту (см. storage.send_stored):
+    #   python     — сам воркер (по умолчанию, работает без прокси);
+    #   x-accel    — nginx по заголовку X-Accel-Redirect, URI = FILE_ACCEL_PREFIX + путь в UPLOAD_ROOT;
+    #   x-sendfile — Apache (mod_xsendfile) / lighttpd по заголовку X-Sendfile с абсолютным путём.
+    # Права проверяет Flask в любом режиме; прокси отдаёт только то, что разрешил ответ приложения
+    FILE_DELIVERY = os.environ.get("FILE_DELIVERY", "python").strip().lower()
+    FILE_ACCEL_PREFIX = os.environ.get("FILE_ACCEL_PREFIX", "/_protected_uploads/")
+
+    # Общий файл метрик для всех воркеров gunicorn и токен для /metrics
+    # (Authorization: Bearer <токен>). Без токена /metrics отвечает 404
+    METRICS_DB_PATH = os.environ.get("METRICS_DB_PATH") or str(BASE_DIR / "metrics.db")
+    METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+
+    # Периодические задачи (scheduler.py) в фоновом потоке каждого воркера.
+    # Выключено по умолчанию: можно запускать `flask run-jobs` из cron.
+    SCHEDULER_ENABLED = os.environ.get("SCHEDULER_ENABLED", "0") == "1"
+    SCHEDULER_POLL_SECONDS = float(os.environ.get("SCHEDULER_POLL_SECONDS", "60"))
+
+    # Отметки «комментарии прочитаны» копятся в памяти воркера и пишутся пачкой не чаще раза в N секунд
+    COMMENT_SEEN_FLUSH_SECONDS = float(os.environ.get("COMMENT_SEEN_FLUSH_SECONDS", "10"))
+
     # Произвольные настройки приложения
     BRAND = os.environ.get("APP_BRAND", "TopHire Business CRM")
     LANG_CHOICES = os.environ.get("LANG_CHOICES", "ru,uk").split(",")
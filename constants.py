@@ -1,2 +1,24 @@
 # Shared constants for pipeline etc.
 PIPELINE = ["Подан","Вышел на работу","Не вышел","Отработал месяц","Не отработал"]
+
+# Базовый набор причин отказа / невыхода: создаётся init_db в пустой базе
+BASE_STATUS_REASONS = [
+    dict(code="no_show_first_day",       title_ru="Не вышел в первый день",                         applies_to_status="Не вышел",    sort_order=10),
+    dict(code="no_show_after_training",  title_ru="Не вышел после обучения / инструктажа",          applies_to_status="Не вышел",    sort_order=20),
+    dict(code="refused_conditions",      title_ru="Отказался из-за условий работы",                 applies_to_status="Не вышел",    sort_order=30),
+    dict(code="refused_salary",          title_ru="Отказался из-за зарплаты",                       applies_to_status="Не вышел",    sort_order=40),
+    dict(code="personal_reasons",        title_ru="Личные обстоятельства (семья, здоровье)",        applies_to_status="Не вышел",    sort_order=50),
+    dict(code="moved_to_another_job",    title_ru="Ушёл на другую работу",                          applies_to_status="Не отработал", sort_order=60),
+    dict(code="low_performance",         title_ru="Низкая производительность / жалобы клиента",     applies_to_status="Не отработал", sort_order=70),
+    dict(code="discipline_issues",       title_ru="Проблемы с дисциплиной (опоздания, прогулы)",    applies_to_status="Не отработал", sort_order=80),
+    dict(code="housing_issues",          title_ru="Проблемы с жильём (условия, соседи)",            applies_to_status="Не вышел",    sort_order=90),
+    dict(code="unknown_reason",          title_ru="Причина не уточнена",                            applies_to_status="",            sort_order=100),
+]
+
+# Тип документа кандидата при подаче: код формы -> подпись (пишется в notes)
+CANDIDATE_DOC_TYPES = {
+    "visa": "Виза",
+    "residence_card": "Карта побыта",
+    "visa_free": "Безвиз",
+    "other": "Другое",
+}
@@ -0,0 +1,265 @@
+"""Поддерживаемые счётчики: шапка («Входящие», новости, уведомления) и доменные метрики.
+
+Раньше на каждый запрос выполнялись три COUNT-запроса. Теперь значения хранятся
+в таблицах user_counters / app_counters и меняются в тех же транзакциях, что и
+сами данные. Если значения нет (или оно сброшено в NULL), оно пересчитывается
+одним атомарным INSERT ... SELECT при следующем чтении.
+"""
+from datetime import date
+
+from sqlalchemy import text
+
+from models import db
+
+INBOX_STATUS = "Подан"
+INBOX_KEY = "inbox"
+# Новые заявки на регистрацию (status = 'new')
+REGISTRATION_NEW_KEY = "registration_new"
+# Неоплаченные трудоустройства по дате, с которой они подлежат выплате (payable_from):
+# ключ "unpaid_due:YYYY-MM-DD", плюс маркер "unpaid_due" — набор уже посчитан.
+UNPAID_DUE_KEY = "unpaid_due"
+
+USER_COUNTER_FIELDS = ("news_unread", "notifications_unread")
+
+
+def bump_user_counter(user_ids, field: str, delta: int) -> None:
+    """Изменить счётчик пользователей на delta (без коммита).
+
+    Отсутствующие строки не создаются: они будут посчитаны при первом чтении.
+    """
+    if field not in USER_COUNTER_FIELDS:
+        raise ValueError(f"Unknown user counter: {field}")
+    ids = sorted({uid for uid in user_ids if uid})
+    if not ids or not delta:
+        return
+    params = {f"u{i}": uid for i, uid in enumerate(ids)}
+    placeholders = ", ".join(f":u{i}" for i in range(len(ids)))
+    params["delta"] = delta
+    db.session.execute(
+        text(
+            f"UPDATE user_counters SET {field} = MAX({field} + :delta, 0) "
+            f"WHERE user_id IN ({placeholders})"
+        ),
+        params,
+    )
+
+
+def reset_user_counter(user_id: int, field: str, value: int = 0) -> None:
+    """Выставить счётчик пользователя в известное значение (без коммита)."""
+    if field not in USER_COUNTER_FIELDS:
+        raise ValueError(f"Unknown user counter: {field}")
+    db.session.execute(
+        text(f"UPDATE user_counters SET {field} = :value WHERE user_id = :uid"),
+        {"value": value, "uid": user_id},
+    )
+
+
+def invalidate_user_counter(field: str) -> None:
+    """Сбросить счётчик у всех пользователей — пересчитается лениво (без коммита)."""
+    if field not in USER_COUNTER_FIELDS:
+        raise ValueError(f"Unknown user counter: {field}")
+    db.session.execute(text(f"UPDATE user_counters SET {field} = NULL"))
+
+
+def bump_app_counter(key: str, delta: int) -> None:
+    """Изменить глобальный счётчик на delta (без коммита)."""
+    if not delta:
+        return
+    db.session.execute(
+        text("UPDATE app_counters SET value = MAX(value + :delta, 0) WHERE key = :key"),
+        {"delta": delta, "key": key},
+    )
+
+
+def inbox_status_changed(old_status, new_status) -> None:
+    """Поправить размер «Входящих» при смене статуса кандидата."""
+    delta = int(new_status == INBOX_STATUS) - int(old_status == INBOX_STATUS)
+    bump_app_counter(INBOX_KEY, delta)
+
+
+def inbox_statuses_changed(changes) -> None:
+    """То же для пачки смен статуса [(old_status, new_status), ...] одним UPDATE."""
+    delta = sum(int(new == INBOX_STATUS) - int(old == INBOX_STATUS) for old, new in changes)
+    bump_app_counter(INBOX_KEY, delta)
+
+
+def registration_status_changed(old_status, new_status) -> None:
+    """Поправить число новых заявок на регистрацию."""
+    delta = int(new_status == "new") - int(old_status == "new")
+    bump_app_counter(REGISTRATION_NEW_KEY, delta)
+
+
+def _unpaid_due_key(payable_from):
+    return f"{UNPAID_DUE_KEY}:{payable_from.isoformat()}"
+
+
+def unpaid_placement_changed(old_payable_from, old_paid, new_payable_from, new_paid) -> None:
+    """Перенести трудоустройство между корзинами «неоплачено к дате» (без коммита).
+
+    old_* описывают состояние до изменения (old_payable_from=None — записи не было).
+    """
+    moves = []
+    if old_payable_from is not None and not old_paid:
+        moves.append((_unpaid_due_key(old_payable_from), -1))
+    if new_payable_from is not None and not new_paid:
+        moves.append((_unpaid_due_key(new_payable_from), 1))
+    for key, delta in moves:
+        db.session.execute(
+            text(
+                """
+                INSERT INTO app_counters (key, value) VALUES (:key, MAX(:delta, 0))
+                ON CONFLICT(key) DO UPDATE SET value = MAX(value + :delta, 0)
+                """
+            ),
+            {"key": key, "delta": delta},
+        )
+
+
+def _rebuild_user_row(user_id: int) -> None:
+    db.session.execute(
+        text(
+            """
+            INSERT INTO user_counters (user_id, news_unread, notifications_unread, updated_at)
+            VALUES (
+              :uid,
+              (SELECT COUNT(n.id) FROM news n
+                 LEFT JOIN news_read r ON r.news_id = n.id AND r.user_id = :uid
+                WHERE n.is_published = 1 AND r.id IS NULL),
+              (SELECT COUNT(id) FROM notifications WHERE user_id = :uid AND is_read = 0),
+              CURRENT_TIMESTAMP
+            )
+            ON CONFLICT(user_id) DO UPDATE SET
+              news_unread = excluded.news_unread,
+              notifications_unread = excluded.notifications_unread,
+              updated_at = excluded.updated_at
+            """
+        ),
+        {"uid": user_id},
+    )
+
+
+def _rebuild_inbox() -> None:
+    db.session.execute(
+        text(
+            """
+            INSERT INTO app_counters (key, value)
+            SELECT :key, COUNT(id) FROM candidates WHERE status = :status
+            ON CONFLICT(key) DO UPDATE SET value = excluded.value
+            """
+        ),
+        {"key": INBOX_KEY, "status": INBOX_STATUS},
+    )
+
+
+def _rebuild_registration_new() -> None:
+    db.session.execute(
+        text(
+            """
+            INSERT INTO app_counters (key, value)
+            SELECT :key, COUNT(id) FROM registration_requests WHERE status = 'new'
+            ON CONFLICT(key) DO UPDATE SET value = excluded.value
+            """
+        ),
+        {"key": REGISTRATION_NEW_KEY},
+    )
+
+
+def _rebuild_unpaid_due() -> None:
+    db.session.execute(
+        text("DELETE FROM app_counters WHERE key = :marker OR key LIKE :prefix"),
+        {"marker": UNPAID_DUE_KEY, "prefix": f"{UNPAID_DUE_KEY}:%"},
+    )
+    db.session.execute(
+        text(
+            """
+            INSERT INTO app_counters (key, value)
+            SELECT :prefix || payable_from, COUNT(id)
+            FROM placements
+            WHERE partner_paid = 0 AND payable_from IS NOT NULL
+            GROUP BY payable_from
+            """
+        ),
+        {"prefix": f"{UNPAID_DUE_KEY}:"},
+    )
+    db.session.execute(
+        text("INSERT INTO app_counters (key, value) VALUES (:marker, 1)"),
+        {"marker": UNPAID_DUE_KEY},
+    )
+
+
+def get_domain_gauges(as_of: date | None = None) -> dict:
+    """Доменные показатели для /metrics из поддерживаемых счётчиков.
+
+    Читается только маленькая таблица app_counters; при первом обращении
+    недостающие значения пересчитываются.
+    """
+    as_of = as_of or date.today()
+    row = db.session.execute(
+        text(
+            """
+            SELECT
+              (SELECT value FROM app_counters WHERE key = :inbox) AS inbox,
+              (SELECT value FROM app_counters WHERE key = :reg) AS registration_new,
+              (SELECT value FROM app_counters WHERE key = :marker) AS unpaid_ready
+            """
+        ),
+        {"inbox": INBOX_KEY, "reg": REGISTRATION_NEW_KEY, "marker": UNPAID_DUE_KEY},
+    ).mappings().first()
+
+    if row["inbox"] is None or row["registration_new"] is None or row["unpaid_ready"] is None:
+        if row["inbox"] is None:
+            _rebuild_inbox()
+        if row["registration_new"] is None:
+            _rebuild_registration_new()
+        if row["unpaid_ready"] is None:
+            _rebuild_unpaid_due()
+        db.session.commit()
+        return get_domain_gauges(as_of)
+
+    unpaid_due = db.session.execute(
+        text(
+            "SELECT COALESCE(SUM(value), 0) FROM app_counters "
+            "WHERE key >= :lo AND key <= :hi"
+        ),
+        {"lo": f"{UNPAID_DUE_KEY}:", "hi": f"{UNPAID_DUE_KEY}:{as_of.isoformat()}"},
+    ).scalar()
+
+    return {
+        "inbox": row["inbox"],
+        "registration_new": row["registration_new"],
+        "unpaid_due": unpaid_due or 0,
+    }
+
+
+def _read_header_row(user_id: int):
+    return db.session.execute(
+        text(
+            """
+            SELECT uc.news_unread AS news_unread,
+                   uc.notifications_unread AS notifications_unread,
+                   (SELECT value FROM app_counters WHERE key = :key) AS inbox
+            FROM (SELECT :uid AS user_id) me
+            LEFT JOIN user_counters uc ON uc.user_id = me.user_id
+            """
+        ),
+        {"uid": user_id, "key": INBOX_KEY},
+    ).mappings().first()
+
+
+def get_header_counters(user_id: int) -> dict:
+    """Счётчики для шапки одним запросом; устаревшие значения пересчитываются."""
+    row = _read_header_row(user_id)
+    stale_user = row["news_unread"] is None or row["notifications_unread"] is None
+    stale_inbox = row["inbox"] is None
+    if stale_user or stale_inbox:
+        if stale_user:
+            _rebuild_user_row(user_id)
+        if stale_inbox:
+            _rebuild_inbox()
+        db.session.commit()
+        row = _read_header_row(user_id)
+    return {
+        "inbox": row["inbox"] or 0,
+        "news_unread": row["news_unread"] or 0,
+        "notifications_unread": row["notifications_unread"] or 0,
+    }
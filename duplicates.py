@@ -0,0 +1,205 @@
+"""Поиск дублей кандидатов.
+
+У каждого кандидата хранятся нормализованные ключи:
+    phone_key — последние 9 цифр телефона («+48 600-100-200» -> «600100200»);
+    name_key  — ФИО в нижнем регистре, ё -> е, без знаков, слова по алфавиту
+                («Петров  Иван» и «иван петров» -> «иван петров»).
+Оба ключа проиндексированы, поэтому проверка при подаче — два поиска по
+индексу, её стоимость не зависит от размера базы.
+
+Совпадение телефона считается дублем: такие кандидаты объединяются в кластер
+(duplicate_of_id = id самого раннего неудалённого кандидата с этим телефоном).
+Совпадение только ФИО — «возможный дубль»: его показывают, но не склеивают.
+
+Пакетная задача candidate_duplicates (scheduler.py) пересчитывает ключи и
+кластеры для всей базы:
+    flask --app app run-jobs --force candidate_duplicates
+
+Бенчмарк проверки при подаче (временная база):
+    python duplicates.py             # 100 000 кандидатов
+    python duplicates.py 500000
+"""
+import re
+import sys
+import time
+
+from sqlalchemy import select, text, update
+
+from models import Candidate, db
+
+PHONE_KEY_DIGITS = 9
+# Короче — это не телефон, а мусор в поле
+PHONE_MIN_DIGITS = 7
+
+DELETED_STATUS = "Удалён"
+
+# Сколько совпадений показывать при подаче
+MATCH_LIMIT = 5
+
+BACKFILL_BATCH = 1000
+
+_NON_DIGITS_RE = re.compile(r"\D+")
+_NON_WORD_RE = re.compile(r"[\W_]+", re.UNICODE)
+
+
+def phone_key(phone: str | None) -> str | None:
+    digits = _NON_DIGITS_RE.sub("", phone or "")
+    if len(digits) < PHONE_MIN_DIGITS:
+        return None
+    return digits[-PHONE_KEY_DIGITS:]
+
+
+def name_key(full_name: str | None) -> str | None:
+    words = _NON_WORD_RE.sub(" ", (full_name or "").casefold().replace("ё", "е")).split()
+    if not words:
+        return None
+    return " ".join(sorted(words))[:200]
+
+
+_MATCH_COLUMNS = (Candidate.id, Candidate.full_name, Candidate.job_id, Candidate.submitter_id, Candidate.status,
+                  Candidate.created_at, Candidate.duplicate_of_id, Candidate.phone_key, Candidate.name_key)
+
+
+def match_query(key_column, key: str, exclude_ids=(), limit: int = MATCH_LIMIT):
+    """Первые limit неудалённых кандидатов с key_column == key по возрастанию id.
+
+    Индекс по ключу хранит и rowid, поэтому запрос читает индекс по порядку и
+    останавливается на limit-й строке — без сортировки и без полного списка тёзок.
+    """
+    query = (
+        select(*_MATCH_COLUMNS)
+        .where(key_column == key, Candidate.status != DELETED_STATUS)
+        .order_by(Candidate.id)
+        .limit(limit)
+    )
+    if exclude_ids:
+        query = query.where(Candidate.id.notin_(exclude_ids))
+    return query
+
+
+def find_duplicates(phone: str | None, full_name: str | None, exclude_id: int | None = None,
+                    limit: int = MATCH_LIMIT, session=None) -> list[dict]:
+    """Неудалённые кандидаты с тем же телефоном или ФИО, сначала совпадения по телефону.
+
+    Возвращает [{id, full_name, job_id, submitter_id, status, created_at, duplicate_of_id, match}],
+    где match — "phone", "name" или "phone+name". Не больше limit строк: два запроса
+    по индексам (телефон, затем ФИО), каждый с LIMIT.
+    """
+    pk, nk = phone_key(phone), name_key(full_name)
+    session = session or db.session
+    exclude = [exclude_id] if exclude_id is not None else []
+    matches = []
+    if pk:
+        for row in session.execute(match_query(Candidate.phone_key, pk, exclude, limit)).mappings():
+            row = dict(row)
+            row_nk = row.pop("name_key")
+            del row["phone_key"]
+            row["match"] = "phone+name" if nk is not None and row_nk == nk else "phone"
+            matches.append(row)
+    if nk and len(matches) < limit:
+        # Совпадения по телефону найдены все (их меньше limit) — остальные тёзки совпадают только по ФИО
+        exclude += [m["id"] for m in matches]
+        for row in session.execute(match_query(Candidate.name_key, nk, exclude, limit - len(matches))).mappings():
+            row = dict(row)
+            del row["phone_key"], row["name_key"]
+            row["match"] = "name"
+            matches.append(row)
+    return matches
+
+
+def cluster_root(matches: list[dict]) -> int | None:
+    """Кластер для нового кандидата: корень самого раннего совпадения по телефону."""
+    for m in matches:
+        if m["match"].startswith("phone"):
+            return m["duplicate_of_id"] or m["id"]
+    return None
+
+
+def backfill_keys(session=None) -> int:
+    """Пересчитать phone_key / name_key всех кандидатов пачками. Возвращает число изменённых строк."""
+    session = session or db.session
+    changed = 0
+    last_id = 0
+    while True:
+        rows = session.execute(
+            select(Candidate.id, Candidate.phone, Candidate.full_name, Candidate.phone_key, Candidate.name_key)
+            .where(Candidate.id > last_id)
+            .order_by(Candidate.id)
+            .limit(BACKFILL_BATCH)
+        ).all()
+        if not rows:
+            return changed
+        updates = []
+        for cid, phone, full_name, old_pk, old_nk in rows:
+            pk, nk = phone_key(phone), name_key(full_name)
+            if (pk, nk) != (old_pk, old_nk):
+                updates.append({"id": cid, "phone_key": pk, "name_key": nk})
+        if updates:
+            # ORM bulk UPDATE по первичному ключу: один executemany на пачку
+            session.execute(update(Candidate), updates)
+            changed += len(updates)
+        last_id = rows[-1][0]
+
+
+def cluster_duplicates(session=None) -> int:
+    """Пересчитать duplicate_of_id по совпадению phone_key. Возвращает число кандидатов-дублей."""
+    session = session or db.session
+    session.execute(
+        text(
+            "UPDATE candidates SET duplicate_of_id = NULLIF("
+            "  (SELECT MIN(c2.id) FROM candidates c2"
+            "   WHERE c2.phone_key = candidates.phone_key AND c2.status != :deleted), id) "
+            "WHERE phone_key IS NOT NULL AND status != :deleted"
+        ),
+        {"deleted": DELETED_STATUS},
+    )
+    session.execute(
+        text("UPDATE candidates SET duplicate_of_id = NULL "
+             "WHERE duplicate_of_id IS NOT NULL AND (phone_key IS NULL OR status = :deleted)"),
+        {"deleted": DELETED_STATUS},
+    )
+    return session.execute(text("SELECT COUNT(*) FROM candidates WHERE duplicate_of_id IS NOT NULL")).scalar() or 0
+
+
+# =====================
+#   BENCHMARK
+# =====================
+
+def benchmark(candidates: int = 100_000, repeat: int = 2000) -> None:
+    import random
+    from datetime import datetime
+
+    from sqlalchemy import create_engine, insert
+    from sqlalchemy.orm import Session
+
+    from models import Base
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = Session(engine)
+    rnd = random.Random(7)
+    first = ["Иван", "Пётр", "Олег", "Мария", "Ольга", "Taras", "Oksana", "Giorgi"]
+    last = ["Петров", "Коваленко", "Шевченко", "Мельник", "Kowalski", "Beridze", "Lysenko", "Kravets"]
+    rows = []
+    for cid in range(1, candidates + 1):
+        full_name = f"{rnd.choice(first)} {rnd.choice(last)} {rnd.randint(1, candidates)}"
+        phone = f"+48 {rnd.randint(500, 899)}-{rnd.randint(100, 999)}-{rnd.randint(100, 999)}"
+        rows.append({"id": cid, "job_id": 1, "submitter_id": 1, "full_name": full_name, "phone": phone,
+                     "created_at": datetime.utcnow()})
+    session.execute(insert(Candidate), rows)
+    started = time.perf_counter()
+    backfill_keys(session)
+    dupes = cluster_duplicates(session)
+    session.commit()
+    print(f"{candidates} кандидатов: ключи и кластеры {time.perf_counter() - started:.1f} с, дублей по телефону {dupes}")
+
+    probes = [rnd.choice(rows) for _ in range(repeat)]
+    started = time.perf_counter()
+    found = sum(bool(find_duplicates(p["phone"], p["full_name"], exclude_id=p["id"], session=session)) for p in probes)
+    per_check = (time.perf_counter() - started) / repeat * 1000
+    print(f"  проверка при подаче: {per_check:.3f} мс ({found}/{repeat} с совпадениями)")
+    session.close()
+
+
+if __name__ == "__main__":
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,551 @@
+"""Массовая загрузка кандидатов из CSV / XLSX.
+
+Файл читается потоково: CSV — построчно csv.reader, XLSX — iterparse листа
+прямо из zip (без сторонних библиотек). Каждая строка проверяется так же, как
+форма подачи (job_submit), и по вакансии: вакансия активна, пол подходит
+(gender_preference), возраст не больше age_to. Ошибочные строки пропускаются
+и попадают в отчёт с номером строки файла, остальные вставляются.
+
+Вставка идёт пачками по BATCH_SIZE: candidates и candidate_profiles — по
+одному executemany на пачку, дубли по телефону — один запрос по индексу
+phone_key на пачку. Комиссия фиксируется billing.submission_fee, счётчик
+«Входящих» и kpi_monthly сдвигаются один раз на всю загрузку,
+полнотекстовый индекс обновляют триггеры candidate_search. Закреплённый за
+партнёром рекрутёр получает одно сводное уведомление на загрузку (а не на
+каждую строку, как при подаче через форму).
+
+Коммит — на вызывающем: загрузка либо проходит целиком, либо не проходит.
+
+CLI:
+    flask --app app import-candidates partners.xlsx --partner 12 --job 3
+    flask --app app import-candidates partners.csv --partner 12 --dry-run
+
+Бенчмарк (временная база, 10 000 строк CSV и XLSX):
+    python importer.py
+    python importer.py 50000
+"""
+import codecs
+import csv
+import io
+import itertools
+import re
+import sys
+import time
+import xml.etree.ElementTree as ET
+import zipfile
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+
+from sqlalchemy import insert, select, update
+
+from billing import submission_fee
+from constants import CANDIDATE_DOC_TYPES
+from counters import inbox_statuses_changed
+from duplicates import DELETED_STATUS, name_key, phone_key
+from kpi import kpi_apply, kpi_snapshot_many
+from models import Candidate, CandidateProfile, Job, User, create_notification_for_users, db
+
+BATCH_SIZE = 500
+# Больше строк за одну загрузку не принимаем
+MAX_ROWS = 50_000
+# Сколько ошибок держать в отчёте (остальные только считаются)
+MAX_REPORTED = 1000
+
+NEW_STATUS = "Подан"
+
+AGE_MIN, AGE_MAX = 16, 80
+
+# Поле -> допустимые заголовки колонок (без учёта регистра); совпадают с выгрузкой export.py
+COLUMN_ALIASES = {
+    "job_id": ("job_id", "id вакансии", "вакансия id"),
+    "full_name": ("full_name", "фио", "кандидат", "имя", "піб"),
+    "phone": ("phone", "телефон"),
+    "gender": ("gender", "пол", "стать"),
+    "age": ("age", "возраст", "вік"),
+    "citizenship": ("citizenship", "гражданство", "громадянство"),
+    "has_driver_license": ("has_driver_license", "водительские права", "права"),
+    "has_work_shoes": ("has_work_shoes", "рабочая обувь"),
+    "work_experience": ("work_experience", "опыт работы", "опыт"),
+    "planned_arrival": ("planned_arrival", "планируемый приезд", "дата приезда"),
+    "doc_type": ("doc_type", "тип документа", "документ"),
+}
+REQUIRED_COLUMNS = ("full_name", "gender")
+
+GENDER_VALUES = {
+    "male": "male", "m": "male", "м": "male", "муж": "male", "мужчина": "male", "мужской": "male",
+    "ч": "male", "чоловік": "male",
+    "female": "female", "f": "female", "ж": "female", "жен": "female", "женщина": "female",
+    "женский": "female", "жінка": "female",
+}
+TRUE_VALUES = {"1", "yes", "y", "true", "да", "так", "+", "есть"}
+FALSE_VALUES = {"", "0", "no", "n", "false", "нет", "ні", "-"}
+
+_DATE_FORMATS = ("%Y-%m-%d", "%d.%m.%Y", "%d.%m.%y", "%Y-%m-%d %H:%M", "%Y-%m-%d %H:%M:%S", "%d/%m/%Y")
+# Нулевой день дат Excel (с учётом ошибки 1900 года)
+_EXCEL_EPOCH = datetime(1899, 12, 30)
+
+
+class ImportFileError(ValueError):
+    """Файл нельзя загрузить целиком: не тот формат, нет заголовков и т. п."""
+
+
+@dataclass
+class ImportResult:
+    imported: int = 0
+    skipped: int = 0
+    duplicates: int = 0
+    errors: list = field(default_factory=list)      # [(строка файла, текст)]
+    warnings: list = field(default_factory=list)    # [(строка файла, текст)]
+    candidate_ids: list = field(default_factory=list)
+
+    def error(self, row_num: int, message: str) -> None:
+        self.skipped += 1
+        if len(self.errors) < MAX_REPORTED:
+            self.errors.append((row_num, message))
+
+    def warn(self, row_num: int, message: str) -> None:
+        if len(self.warnings) < MAX_REPORTED:
+            self.warnings.append((row_num, message))
+
+
+# =====================
+#   ЧТЕНИЕ ФАЙЛОВ
+# =====================
+
+def _sniff_encoding(stream) -> str:
+    sample = stream.read(64 * 1024)
+    stream.seek(0)
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+        return "utf-8-sig"
+    except UnicodeDecodeError:
+        # Excel на русской Windows сохраняет CSV в cp1251
+        return "cp1251"
+
+
+def read_csv_rows(stream):
+    """(номер строки, [значения]) из бинарного потока CSV; разделитель , ; или табуляция."""
+    text = io.TextIOWrapper(stream, encoding=_sniff_encoding(stream), newline="")
+    first = text.readline()
+    if not first:
+        return
+    delimiter = max((",", ";", "\t"), key=first.count)
+    reader = csv.reader(itertools.chain([first], text), delimiter=delimiter)
+    for row_num, row in enumerate(reader, start=1):
+        yield row_num, row
+
+
+_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_REL_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_CELL_REF_RE = re.compile(r"([A-Z]+)")
+
+
+def _column_index(ref: str | None, fallback: int) -> int:
+    match = _CELL_REF_RE.match(ref or "")
+    if not match:
+        return fallback
+    index = 0
+    for ch in match.group(1):
+        index = index * 26 + ord(ch) - 64
+    return index - 1
+
+
+def _first_sheet_path(zf: zipfile.ZipFile) -> str:
+    try:
+        workbook = ET.fromstring(zf.read("xl/workbook.xml"))
+        rels = ET.fromstring(zf.read("xl/_rels/workbook.xml.rels"))
+    except KeyError:
+        raise ImportFileError("Файл не похож на книгу Excel (.xlsx)")
+    sheet = workbook.find(f"{_NS}sheets/{_NS}sheet")
+    if sheet is None:
+        raise ImportFileError("В книге нет листов")
+    rel_id = sheet.get(f"{_REL_NS}id")
+    for rel in rels:
+        if rel.get("Id") == rel_id:
+            target = rel.get("Target").lstrip("/")
+            return target if target.startswith("xl/") else f"xl/{target}"
+    raise ImportFileError("Не найден первый лист книги")
+
+
+def _shared_strings(zf: zipfile.ZipFile) -> list[str]:
+    if "xl/sharedStrings.xml" not in zf.namelist():
+        return []
+    strings = []
+    with zf.open("xl/sharedStrings.xml") as f:
+        for _event, el in ET.iterparse(f):
+            if el.tag == f"{_NS}si":
+                strings.append("".join(t.text or "" for t in el.iter(f"{_NS}t")))
+                el.clear()
+    return strings
+
+
+def read_xlsx_rows(stream):
+    """(номер строки, [значения]) первого листа XLSX; лист разбирается потоково."""
+    try:
+        zf = zipfile.ZipFile(stream)
+    except zipfile.BadZipFile:
+        raise ImportFileError("Файл не похож на книгу Excel (.xlsx)")
+    with zf:
+        strings = _shared_strings(zf)
+        with zf.open(_first_sheet_path(zf)) as sheet:
+            row_num = 0
+            for _event, el in ET.iterparse(sheet):
+                if el.tag != f"{_NS}row":
+                    continue
+                row_num = int(el.get("r") or row_num + 1)
+                values = []
+                for pos, cell in enumerate(el.iter(f"{_NS}c")):
+                    col = _column_index(cell.get("r"), pos)
+                    kind = cell.get("t")
+                    if kind == "inlineStr":
+                        value = "".join(t.text or "" for t in cell.iter(f"{_NS}t"))
+                    else:
+                        raw = cell.findtext(f"{_NS}v")
+                        if raw is None:
+                            continue
+                        if kind == "s":
+                            value = strings[int(raw)]
+                        elif kind == "b":
+                            value = raw == "1"
+                        elif kind in ("str", "e"):
+                            value = raw
+                        else:
+                            value = float(raw)
+                    values.extend([""] * (col + 1 - len(values)))
+                    values[col] = value
+                el.clear()
+                yield row_num, values
+
+
+def read_rows(stream, filename: str):
+    """Строки файла по расширению имени: .csv или .xlsx."""
+    name = (filename or "").lower()
+    if name.endswith(".xlsx"):
+        return read_xlsx_rows(stream)
+    if name.endswith(".csv") or name.endswith(".txt"):
+        return read_csv_rows(stream)
+    raise ImportFileError("Поддерживаются файлы .csv и .xlsx")
+
+
+# =====================
+#   РАЗБОР СТРОК
+# =====================
+
+def _header_map(header) -> dict[str, int]:
+    lookup = {alias: name for name, aliases in COLUMN_ALIASES.items() for alias in aliases}
+    columns = {}
+    for index, title in enumerate(header):
+        name = lookup.get(_text(title).casefold())
+        if name and name not in columns:
+            columns[name] = index
+    return columns
+
+
+def _text(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def _int(value) -> int | None:
+    value = _text(value)
+    if not value:
+        return None
+    try:
+        return int(float(value.replace(",", ".")))
+    except ValueError:
+        raise ValueError(f"не число: «{value}»")
+
+
+def _bool(value) -> bool:
+    if isinstance(value, bool):
+        return value
+    value = _text(value).casefold()
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    raise ValueError(f"ожидается да/нет: «{value}»")
+
+
+def _date(value) -> datetime | None:
+    if isinstance(value, float):
+        return _EXCEL_EPOCH + timedelta(days=int(value))
+    value = _text(value)
+    if not value:
+        return None
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    raise ValueError(f"дата не распознана: «{value}» (нужно ГГГГ-ММ-ДД или ДД.ММ.ГГГГ)")
+
+
+def _doc_label(value) -> str:
+    value = _text(value)
+    return CANDIDATE_DOC_TYPES.get(value.casefold(), value)
+
+
+def _parse_row(values, columns, jobs, default_job_id) -> dict:
+    """Строка файла -> поля кандидата и анкеты; ValueError с понятным текстом при ошибке."""
+    def cell(name):
+        index = columns.get(name)
+        return values[index] if index is not None and index < len(values) else ""
+
+    full_name = _text(cell("full_name"))
+    if not full_name:
+        raise ValueError("не заполнено ФИО")
+    gender = GENDER_VALUES.get(_text(cell("gender")).casefold())
+    if gender is None:
+        raise ValueError(f"пол не распознан: «{_text(cell('gender'))}» (м/ж)")
+
+    job_id = _int(cell("job_id")) if "job_id" in columns and _text(cell("job_id")) else default_job_id
+    job = jobs.get(job_id)
+    if job is None:
+        raise ValueError(f"вакансия #{job_id} не найдена или закрыта" if job_id else "не указана вакансия")
+    if job.gender_preference in ("male", "female") and gender != job.gender_preference:
+        raise ValueError(f"вакансия «{job.title}» только для: "
+                         f"{'мужчин' if job.gender_preference == 'male' else 'женщин'}")
+
+    age = _int(cell("age"))
+    if age is not None:
+        if not AGE_MIN <= age <= AGE_MAX:
+            raise ValueError(f"возраст вне диапазона {AGE_MIN}–{AGE_MAX}: {age}")
+        if job.age_to and age > job.age_to:
+            raise ValueError(f"вакансия «{job.title}» до {job.age_to} лет, возраст {age}")
+
+    phone = _text(cell("phone"))
+    doc_label = _doc_label(cell("doc_type"))
+    return {
+        "job": job,
+        "candidate": {
+            "job_id": job.id,
+            "full_name": full_name[:200],
+            "phone": phone[:100],
+            "notes": f"Тип документа: {doc_label}" if doc_label else "",
+            "gender": gender,
+            "partner_fee_offer": submission_fee(job, gender),
+            "recruiter_fee_offer": job.recruiter_fee_amount or 0.0,
+            "phone_key": phone_key(phone),
+            "name_key": name_key(full_name),
+        },
+        "profile": {
+            "age": age,
+            "citizenship": _text(cell("citizenship"))[:200],
+            "has_driver_license": _bool(cell("has_driver_license")),
+            "has_work_shoes": _bool(cell("has_work_shoes")),
+            "work_experience": _text(cell("work_experience")),
+            "planned_arrival": _date(cell("planned_arrival")),
+        },
+    }
+
+
+# =====================
+#   ВСТАВКА
+# =====================
+
+class _Importer:
+    def __init__(self, submitter_id: int, result: ImportResult, actor_id: int | None = None):
+        self.submitter_id = submitter_id
+        self.actor_id = actor_id
+        self.result = result
+        # phone_key -> корень кластера дублей (из базы и уже загруженных строк файла)
+        self.roots: dict[str, int] = {}
+        self.names: set[str] = set()
+        self.kpi_rows: list = []
+
+    def _lookup(self, batch) -> None:
+        pks = {r["candidate"]["phone_key"] for _n, r in batch} - self.roots.keys() - {None}
+        if pks:
+            rows = db.session.execute(
+                select(Candidate.phone_key, Candidate.id, Candidate.duplicate_of_id)
+                .where(Candidate.phone_key.in_(pks), Candidate.status != DELETED_STATUS)
+                .order_by(Candidate.id)
+            )
+            for pk, cid, root in rows:
+                self.roots.setdefault(pk, root or cid)
+        nks = {r["candidate"]["name_key"] for _n, r in batch} - self.names - {None}
+        if nks:
+            self.names.update(db.session.execute(
+                select(Candidate.name_key).distinct()
+                .where(Candidate.name_key.in_(nks), Candidate.status != DELETED_STATUS)
+            ).scalars())
+
+    def insert(self, batch) -> None:
+        self._lookup(batch)
+        now = datetime.utcnow()
+        candidates = []
+        # Дубли внутри пачки: id ещё нет, поэтому phone_key -> позиция первой такой строки
+        first_in_batch: dict[str, int] = {}
+        names_in_batch: set[str] = set()
+        batch_roots = []
+        for pos, (row_num, row) in enumerate(batch):
+            cand = row["candidate"]
+            pk, nk = cand["phone_key"], cand["name_key"]
+            root = self.roots.get(pk) if pk else None
+            if root:
+                self.result.duplicates += 1
+                self.result.warn(row_num, f"возможный дубль: совпадает телефон с #{root}")
+            elif pk and pk in first_in_batch:
+                self.result.duplicates += 1
+                first_row_num = batch[first_in_batch[pk]][0]
+                self.result.warn(row_num, f"возможный дубль: совпадает телефон со строкой {first_row_num}")
+                batch_roots.append((pos, first_in_batch[pk]))
+            elif nk and (nk in self.names or nk in names_in_batch):
+                self.result.warn(row_num, "возможный дубль: совпадает ФИО")
+            if pk:
+                first_in_batch.setdefault(pk, pos)
+            if nk:
+                names_in_batch.add(nk)
+            candidates.append(cand | {
+                "submitter_id": self.submitter_id,
+                "status": NEW_STATUS,
+                "email": "",
+                "cv_url": "",
+                "created_at": now,
+                "duplicate_of_id": root,
+            })
+        ids = db.session.execute(
+            insert(Candidate).returning(Candidate.id, sort_by_parameter_order=True), candidates
+        ).scalars().all()
+        if batch_roots:
+            db.session.execute(
+                update(Candidate), [{"id": ids[pos], "duplicate_of_id": ids[first]} for pos, first in batch_roots]
+            )
+        db.session.execute(
+            insert(CandidateProfile),
+            [row["profile"] | {"candidate_id": cid} for (_n, row), cid in zip(batch, ids)],
+        )
+        for cand, cid in zip(candidates, ids):
+            if cand["phone_key"]:
+                self.roots.setdefault(cand["phone_key"], cid)
+            if cand["name_key"]:
+                self.names.add(cand["name_key"])
+            self.kpi_rows.append((SimpleNamespace(**cand), None))
+        self.result.imported += len(ids)
+        self.result.candidate_ids.extend(ids)
+
+    def finish(self) -> None:
+        if not self.result.imported:
+            return
+        inbox_statuses_changed([(None, NEW_STATUS)] * self.result.imported)
+        kpi_apply({}, kpi_snapshot_many(self.kpi_rows))
+        self._notify_recruiter()
+
+    def _notify_recruiter(self) -> None:
+        partner = db.session.get(User, self.submitter_id)
+        recruiter_id = partner.assigned_recruiter_id if partner else None
+        if not recruiter_id or recruiter_id == self.actor_id:
+            return
+        message = f"Партнёр {partner.name} загрузил списком кандидатов: {self.result.imported}"
+        if self.result.duplicates:
+            message += f", из них возможных дублей по телефону: {self.result.duplicates}"
+        create_notification_for_users([recruiter_id], message)
+
+
+def import_candidates(rows, submitter_id: int, default_job_id: int | None = None,
+                      actor_id: int | None = None) -> ImportResult:
+    """Загрузить кандидатов из строк read_rows() от имени партнёра submitter_id (без коммита).
+
+    default_job_id — вакансия для строк без колонки / значения job_id.
+    actor_id — кто загружает файл: рекрутёр партнёра не уведомляется о своей же загрузке.
+    Бросает ImportFileError, если файл нельзя разобрать целиком.
+    """
+    result = ImportResult()
+    jobs = {j.id: j for j in db.session.query(Job).filter(Job.status == "active")}
+    if default_job_id is not None and default_job_id not in jobs:
+        raise ImportFileError(f"Вакансия #{default_job_id} не найдена или закрыта")
+
+    rows = iter(rows)
+    header = next(rows, None)
+    if header is None:
+        raise ImportFileError("Файл пустой")
+    columns = _header_map(header[1])
+    missing = [name for name in REQUIRED_COLUMNS if name not in columns]
+    if default_job_id is None and "job_id" not in columns:
+        missing.append("job_id")
+    if missing:
+        raise ImportFileError(
+            "Нет колонок: " + ", ".join(f"{name} ({COLUMN_ALIASES[name][1]})" for name in missing)
+        )
+
+    importer = _Importer(submitter_id, result, actor_id)
+    batch = []
+    seen = 0
+    for row_num, values in rows:
+        if not any(_text(v) for v in values):
+            continue
+        seen += 1
+        if seen > MAX_ROWS:
+            raise ImportFileError(f"Больше {MAX_ROWS} строк за одну загрузку — разделите файл")
+        try:
+            batch.append((row_num, _parse_row(values, columns, jobs, default_job_id)))
+        except ValueError as exc:
+            result.error(row_num, str(exc))
+            continue
+        if len(batch) >= BATCH_SIZE:
+            importer.insert(batch)
+            batch = []
+    if batch:
+        importer.insert(batch)
+    importer.finish()
+    return result
+
+
+# =====================
+#   BENCHMARK
+# =====================
+
+def benchmark(rows: int = 10_000) -> None:
+    import os
+    import random
+    import tempfile
+
+    from sqlalchemy import create_engine, text
+
+    from export import xlsx_stream
+    from models import CANDIDATE_SEARCH_DDL, Base
+
+    rnd = random.Random(3)
+    first = ["Иван", "Пётр", "Олег", "Мария", "Ольга", "Taras", "Oksana", "Giorgi"]
+    last = ["Петров", "Коваленко", "Шевченко", "Мельник", "Kowalski", "Beridze", "Lysenko", "Kravets"]
+    header = ["ФИО", "Телефон", "Пол", "Возраст", "Гражданство", "Водительские права", "Планируемый приезд"]
+    lines = [header] + [
+        [f"{rnd.choice(first)} {rnd.choice(last)} {n}", f"+48 {rnd.randint(500, 899)} {n:06d}",
+         rnd.choice(["м", "ж"]), str(rnd.randint(18, 60) if n % 50 else 90), "UA", rnd.choice(["да", "нет"]),
+         (date.today() + timedelta(days=n % 30)).strftime("%d.%m.%Y")]
+        for n in range(rows)
+    ]
+    buf = io.StringIO()
+    csv.writer(buf, delimiter=";").writerows(lines)
+    csv_bytes = buf.getvalue().encode("utf-8")
+    xlsx_bytes = b"".join(xlsx_stream(lines[0], iter(lines[1:])))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(engine)
+        db.remove()
+        db.configure(bind=engine)
+        for stmt in CANDIDATE_SEARCH_DDL:
+            db.session.execute(text(stmt))
+        db.session.execute(text("INSERT INTO app_counters (key, value) VALUES ('inbox', 0)"))
+        db.session.execute(insert(User), [{"id": 1, "name": "Партнёр", "email": "p@bench", "password_hash": "",
+                                           "role": "partner"}])
+        db.session.execute(insert(Job), [{"id": 1, "title": "Склад", "age_to": 60, "partner_fee_amount": 500}])
+        db.session.commit()
+
+        for label, filename, payload in (("CSV", "bench.csv", csv_bytes), ("XLSX", "bench.xlsx", xlsx_bytes)):
+            started = time.perf_counter()
+            result = import_candidates(read_rows(io.BytesIO(payload), filename), 1, 1)
+            db.session.commit()
+            elapsed = time.perf_counter() - started
+            print(f"{label:<5} {rows} строк: {elapsed:5.2f} с, загружено {result.imported}, "
+                  f"ошибок {result.skipped}, дублей по телефону {result.duplicates}")
+
+
+if __name__ == "__main__":
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000)
@@ -0,0 +1,144 @@
+"""Месячные KPI-роллапы для дашборда руководства.
+
+Таблица kpi_monthly хранит готовые суммы по ключу (месяц, рекрутёр, партнёр,
+вакансия): подачи, выходы на работу и комиссии. Раньше дашборд на каждую
+загрузку агрегировал candidates × placements × users целиком.
+
+Обработчики, меняющие кандидатов и трудоустройства, снимают «вклад»
+кандидата в роллапы до и после изменения (kpi_snapshot) и записывают разницу
+в той же транзакции (kpi_apply). `flask rebuild-kpi` пересобирает таблицу
+целиком.
+
+Подачи считаются по месяцу created_at кандидата (удалённые не учитываются),
+выходы на работу — по месяцу start_date трудоустройства. У подач без
+трудоустройства recruiter_id = 0.
+"""
+from sqlalchemy import text
+
+from models import KPI_MONTHLY_REBUILD, db
+from periods import month_params
+
+DELETED_STATUS = "Удалён"
+NO_RECRUITER = 0
+
+KEY_FIELDS = ("ym", "recruiter_id", "partner_id", "job_id")
+SUM_FIELDS = ("submissions", "starts", "partner_commission", "recruiter_commission")
+
+# Формат, в котором SQLAlchemy хранит DateTime в SQLite (сравнивается как строка)
+_TS_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+
+def _add(rows: dict, key: tuple, **values) -> None:
+    row = rows.setdefault(key, dict.fromkeys(SUM_FIELDS, 0) | {"last_submission_at": None})
+    last = values.pop("last_submission_at", None)
+    if last and (row["last_submission_at"] is None or last > row["last_submission_at"]):
+        row["last_submission_at"] = last
+    for field, value in values.items():
+        row[field] += value
+
+
+def kpi_snapshot(candidate, placement) -> dict:
+    """Вклад кандидата и его трудоустройства (или None) в kpi_monthly.
+
+    Возвращает {(ym, recruiter_id, partner_id, job_id): {поле: значение}}.
+    Снимать нужно до и после изменения — разницу записывает kpi_apply.
+    """
+    rows: dict = {}
+    recruiter_id = (placement.recruiter_id if placement is not None else None) or NO_RECRUITER
+
+    if candidate.created_at and candidate.status != DELETED_STATUS:
+        key = (candidate.created_at.strftime("%Y-%m"), recruiter_id, candidate.submitter_id, candidate.job_id)
+        _add(rows, key, submissions=1, last_submission_at=candidate.created_at.strftime(_TS_FORMAT))
+
+    if placement is not None and placement.start_date:
+        key = (placement.start_date.strftime("%Y-%m"), recruiter_id, candidate.submitter_id, placement.job_id)
+        _add(
+            rows,
+            key,
+            starts=1,
+            partner_commission=placement.partner_commission or 0.0,
+            recruiter_commission=placement.recruiter_commission or 0.0,
+        )
+    return rows
+
+
+def kpi_snapshot_many(pairs) -> dict:
+    """Суммарный вклад пачки [(candidate, placement), ...] — для массовых изменений."""
+    rows: dict = {}
+    for candidate, placement in pairs:
+        for key, values in kpi_snapshot(candidate, placement).items():
+            _add(rows, key, **values)
+    return rows
+
+
+def kpi_apply(before: dict, after: dict) -> None:
+    """Записать в kpi_monthly разницу между двумя снимками (без коммита)."""
+    changes = []
+    for key in sorted(before.keys() | after.keys()):
+        old = before.get(key) or {}
+        new = after.get(key) or {}
+        delta = {field: new.get(field, 0) - old.get(field, 0) for field in SUM_FIELDS}
+        if not any(delta.values()):
+            continue
+        changes.append((dict(zip(KEY_FIELDS, key)), delta, new.get("last_submission_at")))
+    if not changes:
+        return
+
+    # Пересчёт last_submission_at ниже читает candidates — изменения сессии должны быть в базе
+    db.session.flush()
+    for params, delta, last in changes:
+        db.session.execute(
+            text(
+                """
+                INSERT INTO kpi_monthly (ym, recruiter_id, partner_id, job_id, submissions, starts,
+                                         partner_commission, recruiter_commission, last_submission_at)
+                VALUES (:ym, :recruiter_id, :partner_id, :job_id, MAX(:submissions, 0), MAX(:starts, 0),
+                        MAX(:partner_commission, 0), MAX(:recruiter_commission, 0), :last)
+                ON CONFLICT (ym, recruiter_id, partner_id, job_id) DO UPDATE SET
+                  submissions = MAX(kpi_monthly.submissions + :submissions, 0),
+                  starts = MAX(kpi_monthly.starts + :starts, 0),
+                  partner_commission = kpi_monthly.partner_commission + :partner_commission,
+                  recruiter_commission = kpi_monthly.recruiter_commission + :recruiter_commission,
+                  last_submission_at = CASE
+                    WHEN :last IS NULL THEN kpi_monthly.last_submission_at
+                    WHEN kpi_monthly.last_submission_at IS NULL OR :last > kpi_monthly.last_submission_at THEN :last
+                    ELSE kpi_monthly.last_submission_at END
+                """
+            ),
+            params | delta | {"last": last},
+        )
+        if delta["submissions"] < 0:
+            # Подача ушла из строки: последняя дата могла быть её — берём из candidates
+            db.session.execute(
+                text(
+                    """
+                    UPDATE kpi_monthly SET last_submission_at = (
+                      SELECT MAX(c.created_at)
+                      FROM candidates c
+                      LEFT JOIN placements p ON p.candidate_id = c.id
+                      WHERE c.submitter_id = :partner_id AND c.job_id = :job_id
+                        AND c.created_at >= :m_start AND c.created_at < :m_end
+                        AND COALESCE(c.status, '') != :deleted
+                        AND COALESCE(p.recruiter_id, 0) = :recruiter_id
+                    )
+                    WHERE ym = :ym AND recruiter_id = :recruiter_id AND partner_id = :partner_id AND job_id = :job_id
+                    """
+                ),
+                params | month_params(params["ym"]) | {"deleted": DELETED_STATUS},
+            )
+        if delta["submissions"] < 0 or delta["starts"] < 0:
+            db.session.execute(
+                text(
+                    "DELETE FROM kpi_monthly "
+                    "WHERE ym = :ym AND recruiter_id = :recruiter_id AND partner_id = :partner_id "
+                    "AND job_id = :job_id AND submissions = 0 AND starts = 0"
+                ),
+                params,
+            )
+
+
+def rebuild_kpi() -> int:
+    """Пересобрать kpi_monthly из candidates / placements (без коммита). Возвращает число строк."""
+    for stmt in KPI_MONTHLY_REBUILD:
+        db.session.execute(text(stmt))
+    return db.session.execute(text("SELECT COUNT(*) FROM kpi_monthly")).scalar() or 0
@@ -0,0 +1,270 @@
+"""Метрики в текстовом формате Prometheus (/metrics).
+
+Каждый воркер gunicorn копит приращения счётчиков и гистограмм в памяти и
+периодически сливает их в общий SQLite-файл (Config.METRICS_DB_PATH) через
+UPSERT "value = value + delta". Эндпоинт /metrics читает уже сложенные по всем
+воркерам значения. Доменные показатели (входящие, неоплаченные трудоустройства,
+новые заявки) берутся из поддерживаемых счётчиков app_counters, а не из
+тяжёлых запросов дашборда.
+
+Модуль не импортирует models на верхнем уровне: models использует TimedQueuePool.
+"""
+import atexit
+import re
+import sqlite3
+import threading
+import time
+
+from sqlalchemy.pool import QueuePool
+
+from config import Config
+
+# Имя -> (тип, описание)
+METRIC_FAMILIES = {
+    "crm_request_duration_seconds": ("histogram", "Request latency by endpoint."),
+    "crm_request_sql_queries_total": ("counter", "SQL queries executed, by endpoint."),
+    "crm_request_sql_seconds_total": ("counter", "Time spent in SQL, by endpoint."),
+    "crm_request_template_seconds_total": ("counter", "Time spent rendering templates, by endpoint."),
+    "crm_db_pool_wait_seconds": ("histogram", "Time spent waiting for a DB pool connection (count = checkouts)."),
+    "crm_sqlite_busy_total": ("counter", "SQLite 'database is locked/busy' errors."),
+    "crm_notification_fanout": ("histogram", "Recipients per notification broadcast."),
+    "crm_inbox_size": ("gauge", "Candidates in status 'Подан'."),
+    "crm_unpaid_placements_due": ("gauge", "Unpaid placements that reached the 30-day payout threshold."),
+    "crm_registration_requests_pending": ("gauge", "Registration requests with status 'new'."),
+}
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+POOL_WAIT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+FANOUT_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+# Как часто воркер сливает накопленное в общий файл
+FLUSH_INTERVAL = 5.0
+
+_pending: dict[tuple[str, str], float] = {}
+_pending_lock = threading.Lock()
+_last_flush = time.monotonic()
+
+
+def _format_labels(labels: dict) -> str:
+    parts = []
+    for key, value in labels.items():
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{key}="{value}"')
+    return ",".join(parts)
+
+
+def _add(name: str, labels: dict, delta: float) -> None:
+    key = (name, _format_labels(labels))
+    with _pending_lock:
+        _pending[key] = _pending.get(key, 0.0) + delta
+
+
+def inc(name: str, delta: float = 1.0, **labels) -> None:
+    """Увеличить счётчик."""
+    _add(name, labels, delta)
+
+
+def observe(name: str, value: float, buckets, **labels) -> None:
+    """Записать наблюдение в гистограмму (бакеты накопительные, как в Prometheus)."""
+    for le in buckets:
+        if value <= le:
+            _add(f"{name}_bucket", {**labels, "le": le}, 1)
+    _add(f"{name}_bucket", {**labels, "le": "+Inf"}, 1)
+    _add(f"{name}_sum", labels, value)
+    _add(f"{name}_count", labels, 1)
+
+
+# =====================
+#   SHARED STORE
+# =====================
+
+def _connect():
+    conn = sqlite3.connect(Config.METRICS_DB_PATH, timeout=5)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS metric_samples ("
+        " name TEXT NOT NULL, labels TEXT NOT NULL, value REAL NOT NULL DEFAULT 0,"
+        " PRIMARY KEY (name, labels))"
+    )
+    return conn
+
+
+def flush() -> None:
+    """Слить накопленные приращения воркера в общий файл."""
+    global _last_flush
+    with _pending_lock:
+        batch = list(_pending.items())
+        _pending.clear()
+        _last_flush = time.monotonic()
+    if not batch:
+        return
+    try:
+        conn = _connect()
+        try:
+            with conn:
+                conn.executemany(
+                    "INSERT INTO metric_samples (name, labels, value) VALUES (?, ?, ?) "
+                    "ON CONFLICT(name, labels) DO UPDATE SET value = value + excluded.value",
+                    [(name, labels, value) for (name, labels), value in batch],
+                )
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        # Не теряем данные: вернём приращения и попробуем при следующем сбросе
+        with _pending_lock:
+            for key, value in batch:
+                _pending[key] = _pending.get(key, 0.0) + value
+
+
+def maybe_flush() -> None:
+    if time.monotonic() - _last_flush >= FLUSH_INTERVAL:
+        flush()
+
+
+atexit.register(flush)
+
+
+_LABEL_RE = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+_ESCAPE_RE = re.compile(r"\\(.)")
+
+
+def _unescape(m) -> str:
+    return "\n" if m.group(1) == "n" else m.group(1)
+
+
+def parse_labels(labels: str) -> dict:
+    """Обратное к _format_labels: 'endpoint="x",le="0.5"' -> {"endpoint": "x", "le": "0.5"}."""
+    return {key: _ESCAPE_RE.sub(_unescape, value) for key, value in _LABEL_RE.findall(labels)}
+
+
+def read(prefix: str) -> list[tuple[str, dict, float]]:
+    """Сложенные по всем воркерам значения метрик с именем на prefix: [(имя, метки, значение)].
+
+    Приращения этого воркера сливаются сразу, остальных — не позже FLUSH_INTERVAL
+    после их последнего запроса.
+    """
+    flush()
+    conn = _connect()
+    try:
+        rows = conn.execute(
+            "SELECT name, labels, value FROM metric_samples WHERE name >= ? AND name < ?",
+            (prefix, prefix + "\uffff"),
+        ).fetchall()
+    finally:
+        conn.close()
+    return [(name, parse_labels(labels), value) for name, labels, value in rows]
+
+
+def reset(prefix: str) -> None:
+    """Обнулить метрики с именем на prefix во всех воркерах (для Prometheus — сброс счётчика)."""
+    flush()
+    conn = _connect()
+    try:
+        with conn:
+            conn.execute("DELETE FROM metric_samples WHERE name >= ? AND name < ?", (prefix, prefix + "\uffff"))
+    finally:
+        conn.close()
+
+
+# =====================
+#   COLLECTORS
+# =====================
+
+class TimedQueuePool(QueuePool):
+    """QueuePool, который замеряет ожидание соединения при каждом checkout."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            observe("crm_db_pool_wait_seconds", time.perf_counter() - started, POOL_WAIT_BUCKETS)
+
+
+def _on_db_error(context):
+    message = str(context.original_exception).lower()
+    if "database is locked" in message:
+        inc("crm_sqlite_busy_total", kind="locked")
+    elif "database is busy" in message or "database table is locked" in message:
+        inc("crm_sqlite_busy_total", kind="busy")
+
+
+def _on_request(endpoint, sample):
+    observe("crm_request_duration_seconds", sample["total"], LATENCY_BUCKETS, endpoint=endpoint)
+    inc("crm_request_sql_queries_total", sample["sql_count"], endpoint=endpoint)
+    inc("crm_request_sql_seconds_total", sample["sql_time"], endpoint=endpoint)
+    inc("crm_request_template_seconds_total", sample["tpl_time"], endpoint=endpoint)
+    maybe_flush()
+
+
+def observe_notification_fanout(recipients: int) -> None:
+    observe("crm_notification_fanout", recipients, FANOUT_BUCKETS)
+
+
+def init_metrics(app, engine) -> None:
+    """Подключить сборщики к приложению и движку."""
+    from sqlalchemy import event
+    import perf
+
+    event.listen(engine, "handle_error", _on_db_error)
+    perf.add_observer(_on_request)
+
+
+# =====================
+#   EXPOSITION
+# =====================
+
+def _family_of(name: str) -> str:
+    for suffix in ("_bucket", "_sum", "_count"):
+        if name.endswith(suffix) and name[: -len(suffix)] in METRIC_FAMILIES:
+            return name[: -len(suffix)]
+    return name
+
+
+def _sort_key(row):
+    name, labels, _ = row
+    le = None
+    rest = []
+    for part in labels.split(",") if labels else []:
+        if part.startswith("le="):
+            raw = part[4:-1]
+            le = float("inf") if raw == "+Inf" else float(raw)
+        else:
+            rest.append(part)
+    return (name, ",".join(rest), le if le is not None else 0.0)
+
+
+def render() -> str:
+    """Текст в формате Prometheus exposition 0.0.4."""
+    from counters import get_domain_gauges
+
+    flush()
+    conn = _connect()
+    try:
+        rows = conn.execute(
+            "SELECT name, labels, value FROM metric_samples"
+        ).fetchall()
+    finally:
+        conn.close()
+
+    gauges = get_domain_gauges()
+    rows += [
+        ("crm_inbox_size", "", gauges["inbox"]),
+        ("crm_unpaid_placements_due", "", gauges["unpaid_due"]),
+        ("crm_registration_requests_pending", "", gauges["registration_new"]),
+    ]
+
+    by_family: dict[str, list] = {}
+    for name, labels, value in sorted(rows, key=_sort_key):
+        by_family.setdefault(_family_of(name), []).append((name, labels, value))
+
+    lines = []
+    for family in sorted(by_family):
+        kind, help_text = METRIC_FAMILIES.get(family, ("untyped", ""))
+        lines.append(f"# HELP {family} {help_text}")
+        lines.append(f"# TYPE {family} {kind}")
+        for name, labels, value in by_family[family]:
+            label_part = f"{{{labels}}}" if labels else ""
+            value_str = repr(float(value)) if isinstance(value, float) else str(value)
+            lines.append(f"{name}{label_part} {value_str}")
+    return "\n".join(lines) + "\n"
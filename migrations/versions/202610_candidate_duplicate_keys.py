@@ -0,0 +1,66 @@
+"""candidates phone_key / name_key / duplicate_of_id for duplicate detection
+
+Keys of existing candidates are filled here, so the duplicate check on
+submission works right after the upgrade. The candidate_duplicates job
+keeps them up to date afterwards:
+    flask --app app run-jobs --force candidate_duplicates
+
+Revision ID: 202610_candidate_duplicate_keys
+Revises: 202610_candidate_search
+Create Date: 2026-10-17
+
+"""
+from alembic import context, op
+import sqlalchemy as sa
+
+from duplicates import cluster_duplicates, name_key, phone_key
+
+
+# revision identifiers, used by Alembic.
+revision = "202610_candidate_duplicate_keys"
+down_revision = "202610_candidate_search"
+branch_labels = None
+depends_on = None
+
+
+# Без batch_alter_table: пересоздание candidates удалило бы триггеры candidate_search
+def upgrade() -> None:
+    op.add_column("candidates", sa.Column("phone_key", sa.String(length=32), nullable=True))
+    op.add_column("candidates", sa.Column("name_key", sa.String(length=200), nullable=True))
+    op.add_column("candidates", sa.Column("duplicate_of_id", sa.Integer(), nullable=True))
+    op.create_index("ix_candidates_phone_key", "candidates", ["phone_key"], if_not_exists=True)
+    op.create_index("ix_candidates_name_key", "candidates", ["name_key"], if_not_exists=True)
+
+    if context.is_offline_mode():
+        # В SQL-скрипте ключи посчитать нельзя — их заполнит задача candidate_duplicates
+        return
+    backfill_keys(op.get_bind())
+    cluster_duplicates(op.get_bind())
+
+
+BACKFILL_BATCH = 2000
+
+
+def backfill_keys(conn) -> None:
+    """Ключи существующих кандидатов пачками по id (нормализация — та же, что в duplicates.py)."""
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            sa.text("SELECT id, phone, full_name FROM candidates WHERE id > :last ORDER BY id LIMIT :batch"),
+            {"last": last_id, "batch": BACKFILL_BATCH},
+        ).all()
+        if not rows:
+            return
+        conn.execute(
+            sa.text("UPDATE candidates SET phone_key = :pk, name_key = :nk WHERE id = :id"),
+            [{"id": cid, "pk": phone_key(phone), "nk": name_key(full_name)} for cid, phone, full_name in rows],
+        )
+        last_id = rows[-1][0]
+
+
+def downgrade() -> None:
+    op.drop_index("ix_candidates_name_key", table_name="candidates", if_exists=True)
+    op.drop_index("ix_candidates_phone_key", table_name="candidates", if_exists=True)
+    op.drop_column("candidates", "duplicate_of_id")
+    op.drop_column("candidates", "name_key")
+    op.drop_column("candidates", "phone_key")
@@ -0,0 +1,71 @@
+"""candidate_search FTS5 table and sync triggers
+
+Revision ID: 202610_candidate_search
+Revises: 202610_candidates_job_created
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "202610_candidate_search"
+down_revision = "202610_candidates_job_created"
+branch_labels = None
+depends_on = None
+
+
+# Та же схема, что models.CANDIDATE_SEARCH_DDL / CANDIDATE_SEARCH_REBUILD
+PHONE_DIGITS = (
+    "replace(replace(replace(replace(replace(replace(COALESCE(c.phone, ''),"
+    " ' ', ''), '-', ''), '+', ''), '(', ''), ')', ''), '.', '')"
+)
+
+ROW_SQL = (
+    "SELECT c.id, COALESCE(c.full_name, ''),"
+    " COALESCE(c.phone, '') || ' ' || " + PHONE_DIGITS + " || ' ' || substr(" + PHONE_DIGITS + ", -9),"
+    " COALESCE(c.notes, ''),"
+    " COALESCE((SELECT pr.citizenship FROM candidate_profiles pr WHERE pr.candidate_id = c.id), ''),"
+    " COALESCE((SELECT group_concat(cm.text, ' ') FROM candidate_comments cm WHERE cm.candidate_id = c.id), '')"
+    " FROM candidates c"
+)
+
+
+def _refresh(id_expr: str) -> str:
+    return (
+        f"DELETE FROM candidate_search WHERE rowid = {id_expr}; "
+        "INSERT INTO candidate_search (rowid, full_name, phone, notes, citizenship, comments) "
+        f"{ROW_SQL} WHERE c.id = {id_expr};"
+    )
+
+
+# (имя, событие, тело)
+TRIGGERS = (
+    ("candidate_search_ai", "AFTER INSERT ON candidates", _refresh("NEW.id")),
+    ("candidate_search_au", "AFTER UPDATE OF full_name, phone, notes ON candidates", _refresh("NEW.id")),
+    ("candidate_search_ad", "AFTER DELETE ON candidates", "DELETE FROM candidate_search WHERE rowid = OLD.id;"),
+    ("candidate_search_profile_ai", "AFTER INSERT ON candidate_profiles", _refresh("NEW.candidate_id")),
+    ("candidate_search_profile_au", "AFTER UPDATE OF citizenship ON candidate_profiles", _refresh("NEW.candidate_id")),
+    ("candidate_search_profile_ad", "AFTER DELETE ON candidate_profiles", _refresh("OLD.candidate_id")),
+    ("candidate_search_comment_ai", "AFTER INSERT ON candidate_comments", _refresh("NEW.candidate_id")),
+    ("candidate_search_comment_au", "AFTER UPDATE OF text ON candidate_comments", _refresh("NEW.candidate_id")),
+    ("candidate_search_comment_ad", "AFTER DELETE ON candidate_comments", _refresh("OLD.candidate_id")),
+)
+
+
+def upgrade() -> None:
+    op.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS candidate_search USING fts5("
+        "full_name, phone, notes, citizenship, comments,"
+        " tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+    )
+    for name, event, body in TRIGGERS:
+        op.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN {body} END")
+    op.execute("DELETE FROM candidate_search")
+    op.execute("INSERT INTO candidate_search (rowid, full_name, phone, notes, citizenship, comments) " + ROW_SQL)
+
+
+def downgrade() -> None:
+    for name, _event, _body in TRIGGERS:
+        op.execute(f"DROP TRIGGER IF EXISTS {name}")
+    op.execute("DROP TABLE IF EXISTS candidate_search")
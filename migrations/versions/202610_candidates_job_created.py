@@ -0,0 +1,25 @@
+"""candidates (job_id, created_at) index for keyset pagination
+
+Revision ID: 202610_candidates_job_created
+Revises: 202610_scheduled_jobs
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "202610_candidates_job_created"
+down_revision = "202610_scheduled_jobs"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_candidates_job_created", "candidates", ["job_id", "created_at"], if_not_exists=True)
+    op.drop_index("ix_candidates_job_id", table_name="candidates", if_exists=True)
+
+
+def downgrade() -> None:
+    op.create_index("ix_candidates_job_id", "candidates", ["job_id"], if_not_exists=True)
+    op.drop_index("ix_candidates_job_created", table_name="candidates", if_exists=True)
@@ -0,0 +1,58 @@
+"""Indexes for hot queries (candidates, placements, notifications, news, comments, users)
+
+Revision ID: 202610_hot_indexes
+Revises: 202502_add_assigned_recruiter
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "202610_hot_indexes"
+down_revision = "202502_add_assigned_recruiter"
+branch_labels = None
+depends_on = None
+
+
+# (имя, таблица, колонки, условие частичного индекса)
+INDEXES = [
+    ("ix_users_role_assigned_recruiter", "users", ["role", "assigned_recruiter_id"], None),
+    ("ix_users_assigned_recruiter", "users", ["assigned_recruiter_id"], None),
+    ("ix_registration_requests_status_created", "registration_requests", ["status", "created_at"], None),
+    ("ix_job_housing_photos_job_id", "job_housing_photos", ["job_id"], None),
+    ("ix_candidates_submitter_created", "candidates", ["submitter_id", "created_at"], None),
+    ("ix_candidates_job_id", "candidates", ["job_id"], None),
+    ("ix_candidates_status_created", "candidates", ["status", "created_at"], None),
+    ("ix_candidates_created_at", "candidates", ["created_at"], None),
+    ("ix_placements_job_id", "placements", ["job_id"], None),
+    ("ix_placements_recruiter_start", "placements", ["recruiter_id", "start_date"], None),
+    ("ix_placements_start_date", "placements", ["start_date"], None),
+    ("ix_placements_created_at", "placements", ["created_at"], None),
+    ("ix_placements_unpaid_start", "placements", ["start_date"], "partner_paid = 0"),
+    ("ix_placements_paid_at", "placements", ["partner_paid_at"], "partner_paid = 1"),
+    ("ix_candidate_docs_candidate_id", "candidate_docs", ["candidate_id"], None),
+    ("ix_news_published_created", "news", ["is_published", "created_at"], None),
+    ("ix_news_read_user_news", "news_read", ["user_id", "news_id"], None),
+    ("ix_news_read_news_id", "news_read", ["news_id"], None),
+    ("ix_candidate_comments_candidate_created", "candidate_comments", ["candidate_id", "created_at"], None),
+    ("ix_candidate_comment_seen_candidate_user", "candidate_comment_seen", ["candidate_id", "user_id"], None),
+    ("ix_candidate_logs_candidate_created", "candidate_logs", ["candidate_id", "created_at"], None),
+    ("ix_partner_docs_partner_id", "partner_docs", ["partner_id"], None),
+    ("ix_notifications_user_read_created", "notifications", ["user_id", "is_read", "created_at"], None),
+]
+
+
+def upgrade() -> None:
+    # Частичный индекс по неоплаченным требует partner_paid = 0 вместо NULL
+    op.execute("UPDATE placements SET partner_paid = 0 WHERE partner_paid IS NULL")
+
+    for name, table, columns, where in INDEXES:
+        kwargs = {"sqlite_where": sa.text(where)} if where else {}
+        op.create_index(name, table, columns, if_not_exists=True, **kwargs)
+
+
+def downgrade() -> None:
+    for name, table, _columns, _where in reversed(INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
@@ -0,0 +1,64 @@
+"""kpi_monthly rollups for the staff dashboard
+
+Revision ID: 202610_kpi_monthly
+Revises: 202610_placement_payable_from
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "202610_kpi_monthly"
+down_revision = "202610_placement_payable_from"
+branch_labels = None
+depends_on = None
+
+
+# Та же сборка, что models.KPI_MONTHLY_REBUILD
+BACKFILL = (
+    "INSERT INTO kpi_monthly (ym, recruiter_id, partner_id, job_id, submissions, starts,"
+    "  partner_commission, recruiter_commission, last_submission_at) "
+    "SELECT ym, recruiter_id, partner_id, job_id, SUM(submissions), SUM(starts),"
+    "  SUM(partner_commission), SUM(recruiter_commission), MAX(last_submission_at) "
+    "FROM ("
+    "  SELECT strftime('%Y-%m', c.created_at) AS ym, COALESCE(p.recruiter_id, 0) AS recruiter_id,"
+    "    c.submitter_id AS partner_id, c.job_id AS job_id, 1 AS submissions, 0 AS starts,"
+    "    0.0 AS partner_commission, 0.0 AS recruiter_commission, c.created_at AS last_submission_at"
+    "  FROM candidates c LEFT JOIN placements p ON p.candidate_id = c.id"
+    "  WHERE c.created_at IS NOT NULL AND COALESCE(c.status, '') != 'Удалён'"
+    "  UNION ALL"
+    "  SELECT strftime('%Y-%m', p.start_date), COALESCE(p.recruiter_id, 0), c.submitter_id, p.job_id, 0, 1,"
+    "    COALESCE(p.partner_commission, 0), COALESCE(p.recruiter_commission, 0), NULL"
+    "  FROM placements p JOIN candidates c ON c.id = p.candidate_id"
+    "  WHERE p.start_date IS NOT NULL"
+    ") GROUP BY ym, recruiter_id, partner_id, job_id",
+)
+
+
+def upgrade() -> None:
+    op.create_table(
+        "kpi_monthly",
+        sa.Column("ym", sa.String(length=7), nullable=False),
+        sa.Column("recruiter_id", sa.Integer(), nullable=False),
+        sa.Column("partner_id", sa.Integer(), nullable=False),
+        sa.Column("job_id", sa.Integer(), nullable=False),
+        sa.Column("submissions", sa.Integer(), nullable=False),
+        sa.Column("starts", sa.Integer(), nullable=False),
+        sa.Column("partner_commission", sa.Float(), nullable=False),
+        sa.Column("recruiter_commission", sa.Float(), nullable=False),
+        sa.Column("last_submission_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("ym", "recruiter_id", "partner_id", "job_id"),
+        if_not_exists=True,
+    )
+    op.create_index("ix_kpi_monthly_partner_ym", "kpi_monthly", ["partner_id", "ym"], if_not_exists=True)
+
+    op.execute("DELETE FROM kpi_monthly")
+    for stmt in BACKFILL:
+        op.execute(stmt)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_kpi_monthly_partner_ym", table_name="kpi_monthly", if_exists=True)
+    op.drop_table("kpi_monthly")
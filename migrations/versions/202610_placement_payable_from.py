@@ -0,0 +1,62 @@
+"""placements.payable_from / amount_effective and the unpaid payout index
+
+Revision ID: 202610_placement_payable_from
+Revises: 202610_placement_start_date
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "202610_placement_payable_from"
+down_revision = "202610_placement_start_date"
+branch_labels = None
+depends_on = None
+
+
+BACKFILL = (
+    "UPDATE placements SET payable_from = date(start_date, '+30 days') "
+    "WHERE payable_from IS NULL AND start_date IS NOT NULL",
+    "UPDATE placements SET amount_effective = COALESCE(("
+    "  SELECT CASE"
+    "    WHEN placements.partner_commission IS NOT NULL AND placements.partner_commission > 0"
+    "    THEN placements.partner_commission"
+    "    WHEN j.partner_fee_amount IS NOT NULL AND j.partner_fee_amount > 0"
+    "    THEN j.partner_fee_amount * COALESCE(j.promo_multiplier, 1)"
+    "    ELSE 0 END"
+    "  FROM jobs j WHERE j.id = placements.job_id), placements.partner_commission, 0) "
+    "WHERE amount_effective IS NULL",
+)
+
+
+def upgrade() -> None:
+    op.add_column("placements", sa.Column("payable_from", sa.Date(), nullable=True))
+    op.add_column("placements", sa.Column("amount_effective", sa.Float(), nullable=True))
+
+    for stmt in BACKFILL:
+        op.execute(stmt)
+
+    op.drop_index("ix_placements_unpaid_start", table_name="placements", if_exists=True)
+    op.create_index(
+        "ix_placements_unpaid_payable",
+        "placements",
+        ["payable_from"],
+        sqlite_where=sa.text("partner_paid = 0"),
+        if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_placements_unpaid_payable", table_name="placements", if_exists=True)
+    op.create_index(
+        "ix_placements_unpaid_start",
+        "placements",
+        ["start_date"],
+        sqlite_where=sa.text("partner_paid = 0"),
+        if_not_exists=True,
+    )
+    with op.batch_alter_table("placements") as batch:
+        batch.drop_column("amount_effective")
+        batch.drop_column("payable_from")
@@ -0,0 +1,54 @@
+"""Typed Date column for placements.start_date
+
+Revision ID: 202610_placement_start_date
+Revises: 202610_hot_indexes
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "202610_placement_start_date"
+down_revision = "202610_hot_indexes"
+branch_labels = None
+depends_on = None
+
+
+BACKFILL = (
+    # '2025-03-05 00:00:00', '2025-03-05T10:00' и т.п. -> '2025-03-05'
+    "UPDATE placements SET start_date = date(start_date) "
+    "WHERE start_date IS NOT NULL AND date(start_date) IS NOT NULL AND start_date != date(start_date)",
+    # '05.03.2025' -> '2025-03-05'
+    "UPDATE placements SET start_date = "
+    "substr(start_date, 7, 4) || '-' || substr(start_date, 4, 2) || '-' || substr(start_date, 1, 2) "
+    "WHERE start_date GLOB '[0-9][0-9].[0-9][0-9].[0-9][0-9][0-9][0-9]'",
+    # Пустые строки и всё, что не является датой: берём дату создания записи
+    "UPDATE placements SET start_date = date(created_at) "
+    "WHERE start_date IS NULL OR date(start_date) IS NULL",
+)
+
+
+def upgrade() -> None:
+    for stmt in BACKFILL:
+        op.execute(stmt)
+
+    # SQLite не умеет ALTER COLUMN: batch-режим пересоздаёт таблицу вместе с индексами.
+    # Тип задаём через reflect_args, а не alter_column(type_=...): иначе Alembic копирует
+    # данные через CAST(start_date AS DATE), и SQLite превращает '2025-03-05' в 2025.
+    with op.batch_alter_table(
+        "placements",
+        recreate="always",
+        reflect_args=[sa.Column("start_date", sa.Date(), nullable=False)],
+    ):
+        pass
+
+
+def downgrade() -> None:
+    with op.batch_alter_table(
+        "placements",
+        recreate="always",
+        reflect_args=[sa.Column("start_date", sa.String(length=10), nullable=False)],
+    ):
+        pass
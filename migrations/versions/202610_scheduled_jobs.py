@@ -0,0 +1,44 @@
+"""scheduled_jobs and notifications.dedupe_key for background jobs
+
+Revision ID: 202610_scheduled_jobs
+Revises: 202610_kpi_monthly
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "202610_scheduled_jobs"
+down_revision = "202610_kpi_monthly"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("notifications", sa.Column("dedupe_key", sa.String(length=128), nullable=True))
+    op.create_index(
+        "ix_notifications_user_dedupe",
+        "notifications",
+        ["user_id", "dedupe_key"],
+        unique=True,
+        if_not_exists=True,
+    )
+    op.create_table(
+        "scheduled_jobs",
+        sa.Column("name", sa.String(length=64), nullable=False),
+        sa.Column("last_started_at", sa.DateTime(), nullable=True),
+        sa.Column("last_finished_at", sa.DateTime(), nullable=True),
+        sa.Column("last_status", sa.String(length=32), nullable=False),
+        sa.Column("last_error", sa.Text(), nullable=False),
+        sa.PrimaryKeyConstraint("name"),
+        if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("scheduled_jobs")
+    op.drop_index("ix_notifications_user_dedupe", table_name="notifications", if_exists=True)
+    with op.batch_alter_table("notifications") as batch:
+        batch.drop_column("dedupe_key")
@@ -0,0 +1,31 @@
+"""candidate_docs / partner_docs storage_path for the content-addressed upload store
+
+Existing files are copied into the store by:
+    flask --app app migrate-uploads
+
+Revision ID: 202610_upload_storage_paths
+Revises: 202610_candidate_duplicate_keys
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "202610_upload_storage_paths"
+down_revision = "202610_candidate_duplicate_keys"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("candidate_docs", sa.Column("storage_path", sa.String(length=255), server_default="", nullable=True))
+    op.add_column("partner_docs", sa.Column("storage_path", sa.String(length=255), server_default="", nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("partner_docs") as batch:
+        batch.drop_column("storage_path")
+    with op.batch_alter_table("candidate_docs") as batch:
+        batch.drop_column("storage_path")
@@ -1,13 +1,16 @@
-from datetime import datetime
+from datetime import date, datetime
+import logging
 import os
 from sqlalchemy import (
-    String, Float, Text, Boolean, DateTime, ForeignKey,
-    Integer, create_engine, text
+    String, Float, Text, Boolean, Date, DateTime, ForeignKey,
+    Index, Integer, bindparam, create_engine, text
 )
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, sessionmaker, scoped_session
 
 DB_PATH = os.environ.get("DB_PATH", "database.db")
 
+log = logging.getLogger(__name__)
+
 
 class Base(DeclarativeBase):
     pass
@@ -48,6 +51,12 @@ class User(Base):
     settlement_day: Mapped[int] = mapped_column(Integer, default=10)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        # Списки партнёров по роли и по назначенному рекрутёру
+        Index("ix_users_role_assigned_recruiter", "role", "assigned_recruiter_id"),
+        Index("ix_users_assigned_recruiter", "assigned_recruiter_id"),
+    )
+
 
 
 
@@ -72,6 +81,10 @@ class RegistrationRequest(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     requested_password: Mapped[str] = mapped_column(String(255), default="")
 
+    __table_args__ = (
+        Index("ix_registration_requests_status_created", "status", "created_at"),
+    )
+
 
 # =====================
 #         JOBS
@@ -107,6 +120,7 @@ class Job(Base):
     male_bonus_enabled: Mapped[bool] = mapped_column(Boolean, default=False)
     male_bonus_percent: Mapped[float] = mapped_column(Float, default=0.0)
 
+    # Путь обложки в хранилище (storage.py); у старых записей — имя в uploads/job_thumbs
     thumbnail_image: Mapped[str] = mapped_column(String(255), default="")
 
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
@@ -187,7 +201,8 @@ class JobHousingPhoto(Base):
     __tablename__ = "job_housing_photos"
 
     id: Mapped[int] = mapped_column(primary_key=True)
-    job_id: Mapped[int] = mapped_column(ForeignKey("jobs.id"))
+    job_id: Mapped[int] = mapped_column(ForeignKey("jobs.id"), index=True)
+    # Путь в хранилище (storage.py); у старых записей — имя в uploads/job_housing
     filename: Mapped[str] = mapped_column(String(400))
     label: Mapped[str] = mapped_column(String(255), default="")
     uploaded_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
@@ -225,6 +240,30 @@ class Candidate(Base):
 
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
+    # Нормализованные ключи для поиска дублей (см. duplicates.py)
+    phone_key: Mapped[str | None] = mapped_column(String(32), nullable=True)
+    name_key: Mapped[str | None] = mapped_column(String(200), nullable=True)
+    # Самый ранний кандидат с тем же телефоном (корень кластера дублей); NULL — не дубль.
+    # Без FOREIGN KEY: колонку можно добавить и удалить в SQLite без пересоздания таблицы
+    # (пересоздание снесло бы триггеры candidate_search)
+    duplicate_of_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
+
+    # Списки идут keyset-пагинацией по (created_at, id) (см. pagination.py).
+    # В SQLite id (= rowid) неявно замыкает каждый индекс, поэтому индексы
+    # (..., created_at) уже упорядочены по (created_at, id).
+    __table_args__ = (
+        # Кандидаты партнёра (дашборд, список, статистика), новые сверху
+        Index("ix_candidates_submitter_created", "submitter_id", "created_at"),
+        # Фильтр по вакансии
+        Index("ix_candidates_job_created", "job_id", "created_at"),
+        # «Входящие» и фильтр по статусу
+        Index("ix_candidates_status_created", "status", "created_at"),
+        Index("ix_candidates_created_at", "created_at"),
+        # Проверка дублей при подаче
+        Index("ix_candidates_phone_key", "phone_key"),
+        Index("ix_candidates_name_key", "name_key"),
+    )
+
 
 class CandidateProfile(Base):
     __tablename__ = "candidate_profiles"
@@ -252,7 +291,10 @@ class Placement(Base):
     job_id: Mapped[int] = mapped_column(ForeignKey("jobs.id"))
     recruiter_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
 
-    start_date: Mapped[str] = mapped_column(String(10))
+    start_date: Mapped[date] = mapped_column(Date)
+    # С какой даты подлежит выплате и сколько платить партнёру (см. billing.apply_placement_terms)
+    payable_from: Mapped[date | None] = mapped_column(Date, nullable=True)
+    amount_effective: Mapped[float | None] = mapped_column(Float, nullable=True)
 
     partner_commission: Mapped[float] = mapped_column(Float, default=0.0)
     # DEPRECATED: комиссия рекрутёру больше не используется
@@ -266,10 +308,21 @@ class Placement(Base):
 
     partner_paid: Mapped[bool] = mapped_column(Boolean, default=False)
     partner_paid_at: Mapped[datetime | None] = mapped_column(DateTime, default=None)
+    # Подтверждение выплаты: путь в хранилище (storage.py); у старых записей — имя в uploads/payments
     partner_payment_file: Mapped[str] = mapped_column(String(255), default="")
 
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        Index("ix_placements_job_id", "job_id"),
+        Index("ix_placements_recruiter_start", "recruiter_id", "start_date"),
+        Index("ix_placements_start_date", "start_date"),
+        Index("ix_placements_created_at", "created_at"),
+        # Частичные индексы: к выплате (неоплаченные) и история выплат
+        Index("ix_placements_unpaid_payable", "payable_from", sqlite_where=text("partner_paid = 0")),
+        Index("ix_placements_paid_at", "partner_paid_at", sqlite_where=text("partner_paid = 1")),
+    )
+
 
 # =====================
 #   CANDIDATE DOCS
@@ -279,9 +332,12 @@ class CandidateDoc(Base):
     __tablename__ = "candidate_docs"
 
     id: Mapped[int] = mapped_column(primary_key=True)
-    candidate_id: Mapped[int] = mapped_column(ForeignKey("candidates.id"))
+    candidate_id: Mapped[int] = mapped_column(ForeignKey("candidates.id"), index=True)
 
+    # Имя файла для показа; сам файл — storage_path в хранилище (storage.py),
+    # пусто у старых записей до `flask migrate-uploads`
     filename: Mapped[str] = mapped_column(String(400))
+    storage_path: Mapped[str] = mapped_column(String(255), default="")
     label: Mapped[str] = mapped_column(String(255), default="")
     uploaded_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
@@ -300,6 +356,10 @@ class News(Base):
     author_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        Index("ix_news_published_created", "is_published", "created_at"),
+    )
+
 
 class NewsRead(Base):
     __tablename__ = "news_read"
@@ -309,6 +369,11 @@ class NewsRead(Base):
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
     read_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        Index("ix_news_read_user_news", "user_id", "news_id"),
+        Index("ix_news_read_news_id", "news_id"),
+    )
+
 
 # =====================
 #     RELAX HISTORY
@@ -338,6 +403,10 @@ class CandidateComment(Base):
     text: Mapped[str] = mapped_column(Text)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        Index("ix_candidate_comments_candidate_created", "candidate_id", "created_at"),
+    )
+
 
 class CandidateCommentSeen(Base):
     __tablename__ = "candidate_comment_seen"
@@ -347,6 +416,10 @@ class CandidateCommentSeen(Base):
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
     last_seen_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        Index("ix_candidate_comment_seen_candidate_user", "candidate_id", "user_id"),
+    )
+
 
 class CandidateLog(Base):
     __tablename__ = "candidate_logs"
@@ -360,6 +433,10 @@ class CandidateLog(Base):
 
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        Index("ix_candidate_logs_candidate_created", "candidate_id", "created_at"),
+    )
+
 
 # =====================
 #   BILLING PERIODS
@@ -404,8 +481,10 @@ class PartnerDoc(Base):
     __tablename__ = "partner_docs"
 
     id: Mapped[int] = mapped_column(primary_key=True)
-    partner_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
+    partner_id: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True)
+    # Как у CandidateDoc: имя для показа и путь в хранилище
     filename: Mapped[str] = mapped_column(String(400))
+    storage_path: Mapped[str] = mapped_column(String(255), default="")
     label: Mapped[str] = mapped_column(String(255), default="")
     uploaded_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
@@ -417,10 +496,13 @@ class PartnerDoc(Base):
 def get_engine(path=None):
     if path is None:
         path = DB_PATH
+    from metrics import TimedQueuePool
+
     return create_engine(
         f"sqlite:///{path}",
         connect_args={"check_same_thread": False},
-        pool_pre_ping=True
+        pool_pre_ping=True,
+        poolclass=TimedQueuePool,
     )
 
 
@@ -428,9 +510,126 @@ engine = get_engine()
 Session = scoped_session(sessionmaker(bind=engine))
 
 
+# Приведение placements.start_date к формату колонки Date (используется и в миграции Alembic)
+PLACEMENT_START_DATE_BACKFILL = (
+    # '2025-03-05 00:00:00', '2025-03-05T10:00' и т.п. -> '2025-03-05'
+    "UPDATE placements SET start_date = date(start_date) "
+    "WHERE start_date IS NOT NULL AND date(start_date) IS NOT NULL AND start_date != date(start_date)",
+    # '05.03.2025' -> '2025-03-05'
+    "UPDATE placements SET start_date = "
+    "substr(start_date, 7, 4) || '-' || substr(start_date, 4, 2) || '-' || substr(start_date, 1, 2) "
+    "WHERE start_date GLOB '[0-9][0-9].[0-9][0-9].[0-9][0-9][0-9][0-9]'",
+    # Пустые строки и всё, что не является датой: берём дату создания записи
+    "UPDATE placements SET start_date = date(created_at) "
+    "WHERE start_date IS NULL OR date(start_date) IS NULL",
+)
+
+# Заполнение placements.payable_from / amount_effective для старых записей
+# (те же правила, что в billing.py)
+PLACEMENT_TERMS_BACKFILL = (
+    "UPDATE placements SET payable_from = date(start_date, '+30 days') "
+    "WHERE payable_from IS NULL AND start_date IS NOT NULL",
+    "UPDATE placements SET amount_effective = COALESCE(("
+    "  SELECT CASE"
+    "    WHEN placements.partner_commission IS NOT NULL AND placements.partner_commission > 0"
+    "    THEN placements.partner_commission"
+    "    WHEN j.partner_fee_amount IS NOT NULL AND j.partner_fee_amount > 0"
+    "    THEN j.partner_fee_amount * COALESCE(j.promo_multiplier, 1)"
+    "    ELSE 0 END"
+    "  FROM jobs j WHERE j.id = placements.job_id), placements.partner_commission, 0) "
+    "WHERE amount_effective IS NULL",
+)
+
+# Полнотекстовый поиск по кандидатам (SQLite FTS5, см. search.py).
+# rowid = candidates.id. Строка собирается из кандидата, его анкеты и комментариев
+# и пересобирается триггерами при любом изменении этих таблиц.
+CANDIDATE_SEARCH_COLUMNS = ("full_name", "phone", "notes", "citizenship", "comments")
+
+# Телефон дополнительно индексируется одними цифрами и последними 9 цифрами (номер без кода страны):
+# «+48 600-100-200» ищется и как «48600100200», и как «600100200»
+_PHONE_DIGITS_SQL = (
+    "replace(replace(replace(replace(replace(replace(COALESCE(c.phone, ''),"
+    " ' ', ''), '-', ''), '+', ''), '(', ''), ')', ''), '.', '')"
+)
+
+_CANDIDATE_SEARCH_ROW_SQL = (
+    "SELECT c.id, COALESCE(c.full_name, ''),"
+    " COALESCE(c.phone, '') || ' ' || " + _PHONE_DIGITS_SQL + " || ' ' || substr(" + _PHONE_DIGITS_SQL + ", -9),"
+    " COALESCE(c.notes, ''),"
+    " COALESCE((SELECT pr.citizenship FROM candidate_profiles pr WHERE pr.candidate_id = c.id), ''),"
+    " COALESCE((SELECT group_concat(cm.text, ' ') FROM candidate_comments cm WHERE cm.candidate_id = c.id), '')"
+    " FROM candidates c"
+)
+
+
+def _candidate_search_refresh(id_expr: str) -> str:
+    return (
+        f"DELETE FROM candidate_search WHERE rowid = {id_expr}; "
+        "INSERT INTO candidate_search (rowid, full_name, phone, notes, citizenship, comments) "
+        f"{_CANDIDATE_SEARCH_ROW_SQL} WHERE c.id = {id_expr};"
+    )
+
+
+CANDIDATE_SEARCH_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS candidate_search USING fts5("
+    "full_name, phone, notes, citizenship, comments,"
+    " tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')",
+    # candidates
+    "CREATE TRIGGER IF NOT EXISTS candidate_search_ai AFTER INSERT ON candidates BEGIN "
+    + _candidate_search_refresh("NEW.id") + " END",
+    "CREATE TRIGGER IF NOT EXISTS candidate_search_au AFTER UPDATE OF full_name, phone, notes ON candidates BEGIN "
+    + _candidate_search_refresh("NEW.id") + " END",
+    "CREATE TRIGGER IF NOT EXISTS candidate_search_ad AFTER DELETE ON candidates BEGIN "
+    "DELETE FROM candidate_search WHERE rowid = OLD.id; END",
+    # candidate_profiles
+    "CREATE TRIGGER IF NOT EXISTS candidate_search_profile_ai AFTER INSERT ON candidate_profiles BEGIN "
+    + _candidate_search_refresh("NEW.candidate_id") + " END",
+    "CREATE TRIGGER IF NOT EXISTS candidate_search_profile_au AFTER UPDATE OF citizenship ON candidate_profiles BEGIN "
+    + _candidate_search_refresh("NEW.candidate_id") + " END",
+    "CREATE TRIGGER IF NOT EXISTS candidate_search_profile_ad AFTER DELETE ON candidate_profiles BEGIN "
+    + _candidate_search_refresh("OLD.candidate_id") + " END",
+    # candidate_comments
+    "CREATE TRIGGER IF NOT EXISTS candidate_search_comment_ai AFTER INSERT ON candidate_comments BEGIN "
+    + _candidate_search_refresh("NEW.candidate_id") + " END",
+    "CREATE TRIGGER IF NOT EXISTS candidate_search_comment_au AFTER UPDATE OF text ON candidate_comments BEGIN "
+    + _candidate_search_refresh("NEW.candidate_id") + " END",
+    "CREATE TRIGGER IF NOT EXISTS candidate_search_comment_ad AFTER DELETE ON candidate_comments BEGIN "
+    + _candidate_search_refresh("OLD.candidate_id") + " END",
+)
+
+CANDIDATE_SEARCH_REBUILD = (
+    "DELETE FROM candidate_search",
+    "INSERT INTO candidate_search (rowid, full_name, phone, notes, citizenship, comments) "
+    + _CANDIDATE_SEARCH_ROW_SQL,
+)
+
+# Полная пересборка kpi_monthly из candidates / placements (см. kpi.py).
+# Подачи — по месяцу created_at кандидата (без удалённых), выходы — по месяцу start_date.
+KPI_MONTHLY_REBUILD = (
+    "DELETE FROM kpi_monthly",
+    "INSERT INTO kpi_monthly (ym, recruiter_id, partner_id, job_id, submissions, starts,"
+    "  partner_commission, recruiter_commission, last_submission_at) "
+    "SELECT ym, recruiter_id, partner_id, job_id, SUM(submissions), SUM(starts),"
+    "  SUM(partner_commission), SUM(recruiter_commission), MAX(last_submission_at) "
+    "FROM ("
+    "  SELECT strftime('%Y-%m', c.created_at) AS ym, COALESCE(p.recruiter_id, 0) AS recruiter_id,"
+    "    c.submitter_id AS partner_id, c.job_id AS job_id, 1 AS submissions, 0 AS starts,"
+    "    0.0 AS partner_commission, 0.0 AS recruiter_commission, c.created_at AS last_submission_at"
+    "  FROM candidates c LEFT JOIN placements p ON p.candidate_id = c.id"
+    "  WHERE c.created_at IS NOT NULL AND COALESCE(c.status, '') != 'Удалён'"
+    "  UNION ALL"
+    "  SELECT strftime('%Y-%m', p.start_date), COALESCE(p.recruiter_id, 0), c.submitter_id, p.job_id, 0, 1,"
+    "    COALESCE(p.partner_commission, 0), COALESCE(p.recruiter_commission, 0), NULL"
+    "  FROM placements p JOIN candidates c ON c.id = p.candidate_id"
+    "  WHERE p.start_date IS NOT NULL"
+    ") GROUP BY ym, recruiter_id, partner_id, job_id",
+)
+
+
 def init_db():
     # Создаём таблицы, если их ещё нет
     Base.metadata.create_all(engine)
+    duplicate_keys_added = False
 
     # Лёгкая миграция для SQLite: добавляем недостающие колонки
     try:
@@ -465,14 +664,131 @@ def init_db():
                 conn.execute(text("ALTER TABLE candidates ADD COLUMN status_reason_id INTEGER"))
             if "status_reason_comment" not in cols:
                 conn.execute(text("ALTER TABLE candidates ADD COLUMN status_reason_comment TEXT DEFAULT ''"))
+            # candidates.phone_key / name_key / duplicate_of_id (заполняет задача candidate_duplicates)
+            if "phone_key" not in cols:
+                conn.execute(text("ALTER TABLE candidates ADD COLUMN phone_key VARCHAR(32)"))
+                duplicate_keys_added = True
+            if "name_key" not in cols:
+                conn.execute(text("ALTER TABLE candidates ADD COLUMN name_key VARCHAR(200)"))
+            if "duplicate_of_id" not in cols:
+                conn.execute(text("ALTER TABLE candidates ADD COLUMN duplicate_of_id INTEGER"))
 
             # billing_periods.status
             cols = {row[1] for row in conn.execute(text("PRAGMA table_info('billing_periods')"))}
             if "status" not in cols:
                 conn.execute(text("ALTER TABLE billing_periods ADD COLUMN status VARCHAR(32) DEFAULT 'draft'"))
+
+            # Заменён индексом ix_placements_unpaid_payable
+            conn.execute(text("DROP INDEX IF EXISTS ix_placements_unpaid_start"))
+            # Заменён индексом ix_candidates_job_created
+            conn.execute(text("DROP INDEX IF EXISTS ix_candidates_job_id"))
+
+            # candidate_docs.storage_path / partner_docs.storage_path (хранилище файлов, storage.py)
+            for table in ("candidate_docs", "partner_docs"):
+                cols = {row[1] for row in conn.execute(text(f"PRAGMA table_info('{table}')"))}
+                if "storage_path" not in cols:
+                    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN storage_path VARCHAR(255) DEFAULT ''"))
+
+            # notifications.dedupe_key
+            cols = {row[1] for row in conn.execute(text("PRAGMA table_info('notifications')"))}
+            if "dedupe_key" not in cols:
+                conn.execute(text("ALTER TABLE notifications ADD COLUMN dedupe_key VARCHAR(128)"))
     except Exception:
-        # На бою лучше логировать, здесь просто не падаем
-        pass
+        # Приложение стартует и без миграции, но причина должна остаться в логе
+        log.exception("init_db: миграция колонок не выполнена")
+
+    # Дальше каждый шаг — в своей транзакции, чтобы сбой одного не откатывал остальные
+
+    # placements.payable_from / amount_effective. Старые записи приводим один раз,
+    # когда добавляется колонка: новые приложение пишет уже в нужном виде (billing.py),
+    # а полные UPDATE по placements на каждом старте каждого воркера не нужны
+    try:
+        with engine.begin() as conn:
+            cols = {row[1] for row in conn.execute(text("PRAGMA table_info('placements')"))}
+            if "payable_from" not in cols:
+                # placements.start_date: раньше строка в свободном формате, теперь Date.
+                # Приводим значения к ISO 'YYYY-MM-DD', нераспознанные — к дате создания записи.
+                for stmt in PLACEMENT_START_DATE_BACKFILL:
+                    conn.execute(text(stmt))
+                # placements.partner_paid: NULL в старых записях = не оплачено (нужно для частичного индекса)
+                conn.execute(text("UPDATE placements SET partner_paid = 0 WHERE partner_paid IS NULL"))
+                conn.execute(text("ALTER TABLE placements ADD COLUMN payable_from DATE"))
+            if "amount_effective" not in cols:
+                conn.execute(text("ALTER TABLE placements ADD COLUMN amount_effective FLOAT"))
+            if "payable_from" not in cols or "amount_effective" not in cols:
+                for stmt in PLACEMENT_TERMS_BACKFILL:
+                    conn.execute(text(stmt))
+    except Exception:
+        log.exception("init_db: миграция placements не выполнена")
+
+    # kpi_monthly: новая таблица в базе с данными — собираем роллапы один раз
+    try:
+        with engine.begin() as conn:
+            has_kpi = conn.execute(text("SELECT 1 FROM kpi_monthly LIMIT 1")).first()
+            has_candidates = conn.execute(text("SELECT 1 FROM candidates LIMIT 1")).first()
+            if has_candidates and not has_kpi:
+                for stmt in KPI_MONTHLY_REBUILD:
+                    conn.execute(text(stmt))
+    except Exception:
+        log.exception("init_db: сборка kpi_monthly не выполнена")
+
+    # Индексы из моделей, которых ещё нет в существующей базе
+    try:
+        with engine.begin() as conn:
+            for table in Base.metadata.sorted_tables:
+                for index in table.indexes:
+                    index.create(conn, checkfirst=True)
+    except Exception:
+        log.exception("init_db: создание индексов не выполнено")
+
+    # Полнотекстовый поиск кандидатов: отдельно, чтобы сборка SQLite без FTS5 не мешала остальным миграциям
+    try:
+        with engine.begin() as conn:
+            is_new = not conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'candidate_search'")
+            ).first()
+            for stmt in CANDIDATE_SEARCH_DDL:
+                conn.execute(text(stmt))
+            if is_new:
+                for stmt in CANDIDATE_SEARCH_REBUILD:
+                    conn.execute(text(stmt))
+    except Exception:
+        log.exception("init_db: полнотекстовый поиск кандидатов не создан")
+
+    # Ключи дублей для кандидатов, поданных до их появления: один раз после добавления колонок
+    if duplicate_keys_added:
+        try:
+            from sqlalchemy.orm import Session
+            from duplicates import backfill_keys, cluster_duplicates
+
+            with Session(engine) as session:
+                backfill_keys(session)
+                cluster_duplicates(session)
+                session.commit()
+        except Exception:
+            log.exception("init_db: ключи дублей кандидатов не заполнены")
+
+    # Базовые причины статусов кандидата, если справочник пуст (раньше создавались при просмотре карточки)
+    try:
+        from sqlalchemy.orm import Session
+        from constants import BASE_STATUS_REASONS
+
+        with Session(engine) as session:
+            if not session.query(CandidateStatusReason.id).first():
+                for idx, r in enumerate(BASE_STATUS_REASONS, start=1):
+                    session.add(
+                        CandidateStatusReason(
+                            code=r["code"],
+                            title_ru=r["title_ru"],
+                            title_uk="",
+                            applies_to_status=r.get("applies_to_status", ""),
+                            sort_order=r.get("sort_order", idx * 10),
+                            is_active=True,
+                        )
+                    )
+                session.commit()
+    except Exception:
+        log.exception("init_db: справочник причин статусов не заполнен")
 
     # Базовое наполнение обучения: если ещё нет разделов, пробуем загрузить их из training_seed.json
     try:
@@ -550,7 +866,7 @@ def init_db():
 
     except Exception:
         # Если что-то пойдёт не так при загрузке обучающего контента — не ломаем приложение
-        pass
+        log.exception("init_db: обучающий контент не загружен")
 
 class _DBProxy:
     def __init__(self, scoped):
@@ -576,6 +892,15 @@ class Notification(Base):
     message: Mapped[str] = mapped_column(String(255))
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     is_read: Mapped[bool] = mapped_column(Boolean, default=False)
+    # Стабильный ключ для уведомлений от фоновых задач: не больше одного на пользователя и ключ
+    dedupe_key: Mapped[str | None] = mapped_column(String(128), nullable=True, default=None)
+
+    __table_args__ = (
+        # Непрочитанные уведомления пользователя и лента «новые сверху»
+        Index("ix_notifications_user_read_created", "user_id", "is_read", "created_at"),
+        # NULL в уникальном индексе SQLite не конфликтует: обычные уведомления не затронуты
+        Index("ix_notifications_user_dedupe", "user_id", "dedupe_key", unique=True),
+    )
 
 
 def create_notification_for_users(user_ids, message: str) -> None:
@@ -592,3 +917,96 @@ def create_notification_for_users(user_ids, message: str) -> None:
     for uid in unique_ids:
         note = Notification(user_id=uid, message=message)
         db.session.add(note)
+
+    from counters import bump_user_counter
+    from metrics import observe_notification_fanout
+    bump_user_counter(unique_ids, "notifications_unread", 1)
+    if unique_ids:
+        observe_notification_fanout(len(unique_ids))
+
+
+def create_notification_once(user_id: int, message: str, dedupe_key: str) -> bool:
+    """Создать уведомление, если у пользователя ещё нет уведомления с этим ключом (без коммита).
+
+    Возвращает True, если уведомление создано.
+    """
+    created = db.session.execute(
+        text(
+            "INSERT INTO notifications (user_id, message, created_at, is_read, dedupe_key) "
+            "VALUES (:user_id, :message, :created_at, 0, :dedupe_key) "
+            "ON CONFLICT (user_id, dedupe_key) DO NOTHING"
+        ).bindparams(bindparam("created_at", type_=DateTime)),
+        {"user_id": user_id, "message": message, "created_at": datetime.utcnow(), "dedupe_key": dedupe_key},
+    ).rowcount
+    if created:
+        from counters import bump_user_counter
+        bump_user_counter([user_id], "notifications_unread", 1)
+    return bool(created)
+
+
+# =====================
+#   COUNTERS (header badges)
+# =====================
+
+class UserCounter(Base):
+    """Готовые счётчики для шапки конкретного пользователя.
+
+    NULL в колонке означает «устарело, пересчитать при следующем чтении».
+    """
+    __tablename__ = "user_counters"
+
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), primary_key=True)
+    news_unread: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    notifications_unread: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class AppCounter(Base):
+    """Глобальные поддерживаемые счётчики (например, размер «Входящих»)."""
+    __tablename__ = "app_counters"
+
+    key: Mapped[str] = mapped_column(String(64), primary_key=True)
+    value: Mapped[int] = mapped_column(Integer, default=0)
+
+
+# =====================
+#   KPI ROLLUPS (staff dashboard)
+# =====================
+
+class KpiMonthly(Base):
+    """Месячные KPI по ключу (месяц, рекрутёр, партнёр, вакансия), см. kpi.py.
+
+    recruiter_id = 0 — подачи, по которым ещё нет трудоустройства.
+    """
+    __tablename__ = "kpi_monthly"
+
+    ym: Mapped[str] = mapped_column(String(7), primary_key=True)
+    recruiter_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    partner_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    job_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+
+    submissions: Mapped[int] = mapped_column(Integer, default=0)
+    starts: Mapped[int] = mapped_column(Integer, default=0)
+    partner_commission: Mapped[float] = mapped_column(Float, default=0.0)
+    recruiter_commission: Mapped[float] = mapped_column(Float, default=0.0)
+    # created_at последней подачи в этой строке (в формате хранения DateTime)
+    last_submission_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_kpi_monthly_partner_ym", "partner_id", "ym"),
+    )
+
+
+# =====================
+#   SCHEDULED JOBS
+# =====================
+
+class ScheduledJob(Base):
+    """Состояние периодической задачи (см. scheduler.py): когда запускалась и чем закончилась."""
+    __tablename__ = "scheduled_jobs"
+
+    name: Mapped[str] = mapped_column(String(64), primary_key=True)
+    last_started_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    last_finished_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    last_status: Mapped[str] = mapped_column(String(32), default="")
+    last_error: Mapped[str] = mapped_column(Text, default="")
@@ -0,0 +1,74 @@
+"""Keyset-пагинация списков по (created_at, id), «новые сверху».
+
+Следующая страница выбирается условием (created_at, id) < (курсор) по
+индексу, который уже упорядочен по created_at (в SQLite индекс содержит и
+rowid = id). Поэтому глубокая страница стоит столько же, сколько первая: не
+нужно ни OFFSET, ни сортировки всего отфильтрованного набора.
+
+Курсор — непрозрачная строка в параметре ?cursor=; фильтры передаются
+рядом как обычно и применяются к каждой странице одинаково.
+"""
+import base64
+from datetime import datetime
+from typing import NamedTuple
+
+from sqlalchemy import tuple_
+
+
+class Page(NamedTuple):
+    rows: list
+    next_cursor: str | None
+
+    @property
+    def has_more(self) -> bool:
+        return self.next_cursor is not None
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(value: str | None) -> tuple[datetime, int] | None:
+    """Курсор из запроса -> (created_at, id); мусор и пустое значение -> None (первая страница)."""
+    if not value:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(value + "=" * (-len(value) % 4)).decode()
+        created_raw, id_raw = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_raw), int(id_raw)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def keyset_query(query, created_col, id_col, after: tuple[datetime, int] | None, limit: int):
+    """Запрос страницы: строки после (created_at, id) = after, новые сверху, limit + 1 строк.
+
+    Отдельно от keyset_page, чтобы query_plans.py проверял план ровно того SQL,
+    который выполняют списки.
+    """
+    if after:
+        # Обычный кортеж справа: SQLAlchemy привяжет значения с типами колонок
+        query = query.filter(tuple_(created_col, id_col) < after)
+    return query.order_by(created_col.desc(), id_col.desc()).limit(limit + 1)
+
+
+def keyset_page(query, created_col, id_col, cursor: str | None, limit: int, key=None) -> Page:
+    """Страница query (новые сверху) после курсора.
+
+    key(row) -> (created_at, id) для строк, где модель не первая колонка;
+    по умолчанию берётся сама модель или первая колонка строки.
+    """
+    rows = keyset_query(query, created_col, id_col, decode_cursor(cursor), limit).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        if key is None:
+            last = rows[-1]
+            obj = last if hasattr(last, "created_at") else last[0]
+            created_at, row_id = obj.created_at, obj.id
+        else:
+            created_at, row_id = key(rows[-1])
+        next_cursor = encode_cursor(created_at, row_id)
+    return Page(rows, next_cursor)
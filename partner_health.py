@@ -0,0 +1,224 @@
+"""Здоровье партнёров: статистика подач и выходов на работу и оценка активности.
+
+Статистика для любого набора партнёров считается одним сгруппированным
+запросом по роллапам kpi_monthly (см. kpi.py), оценка — одним проходом по
+готовым строкам без обращений к базе. Используется дашбордом руководства и
+страницей «Мои партнёры».
+
+Бенчмарк (временная база в памяти, 1 000 и 10 000 партнёров):
+    python partner_health.py
+    python partner_health.py 500 5000
+"""
+import json
+import sys
+import time
+from datetime import date
+
+from sqlalchemy import text
+
+from models import db
+from periods import current_ym, month_params
+
+# Без подач в этом месяце: до HARD_GAP_DAYS дней с последней подачи — «Затухает», дальше — «Спит»
+HARD_GAP_DAYS = 60
+# «Заснувший» партнёр для напоминаний рекрутёру
+SLEEPY_DAYS = 30
+
+# Множитель давности последней подачи: (не больше дней, множитель)
+RECENCY_FACTORS = ((7, 1.0), (30, 0.7), (60, 0.4))
+RECENCY_OLD = 0.1
+RECENCY_NEVER = 0.2
+
+STATUS_LABELS = {"green": "Активный", "yellow": "Затухает", "red": "Спит"}
+
+STAT_FIELDS = ("submissions_total", "submissions_month", "starts_total", "starts_month", "last_submission_at")
+
+
+def partner_stats(partner_ids, ym: str | None = None, session=None) -> dict[int, dict]:
+    """Статистика партнёров за всё время и за месяц ym: {partner_id: {поле: значение}}.
+
+    Один запрос на любой набор партнёров: список id передаётся одним
+    JSON-параметром. Партнёры без подач получают нули.
+    """
+    ids = sorted({int(pid) for pid in partner_ids if pid})
+    stats = {pid: dict.fromkeys(STAT_FIELDS, 0) | {"last_submission_at": None} for pid in ids}
+    if not ids:
+        return stats
+    session = session or db.session
+    rows = session.execute(
+        text(
+            """
+            SELECT
+              partner_id,
+              SUM(submissions) AS submissions_total,
+              SUM(CASE WHEN ym = :ym THEN submissions ELSE 0 END) AS submissions_month,
+              SUM(starts) AS starts_total,
+              SUM(CASE WHEN ym = :ym THEN starts ELSE 0 END) AS starts_month,
+              MAX(last_submission_at) AS last_submission_at
+            FROM kpi_monthly
+            WHERE partner_id IN (SELECT value FROM json_each(:ids))
+            GROUP BY partner_id
+            """
+        ),
+        {"ym": ym or current_ym(), "ids": json.dumps(ids)},
+    ).mappings()
+    for row in rows:
+        stats[row["partner_id"]] = {field: row[field] for field in STAT_FIELDS}
+    return stats
+
+
+def _last_date(value) -> date | None:
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except ValueError:
+        return None
+
+
+def score_partners(rows, today: date | None = None) -> list[dict]:
+    """Добавить к строкам статистики health_status / health_status_label / health_score / days_since_last.
+
+    rows — словари (или mappings) с полями submissions_month, starts_month,
+    last_submission_at. Возвращает новые словари в том же порядке.
+    """
+    today_ord = (today or date.today()).toordinal()
+    scored = []
+    for row in rows:
+        row = dict(row)
+        last = _last_date(row.get("last_submission_at"))
+        days = today_ord - last.toordinal() if last else None
+        submissions_month = row.get("submissions_month") or 0
+        starts_month = row.get("starts_month") or 0
+
+        if submissions_month > 0 or starts_month > 0:
+            status = "green"
+        elif days is not None and days <= HARD_GAP_DAYS:
+            status = "yellow"
+        else:
+            status = "red"
+
+        if days is None:
+            recency = RECENCY_NEVER
+        else:
+            recency = next((factor for limit, factor in RECENCY_FACTORS if days <= limit), RECENCY_OLD)
+
+        row["health_status"] = status
+        row["health_status_label"] = STATUS_LABELS[status]
+        row["health_score"] = int(min(100, (submissions_month + 2 * starts_month) * 10 * recency))
+        row["days_since_last"] = days
+        scored.append(row)
+    return scored
+
+
+def partner_health(partner_ids, ym: str | None = None, today: date | None = None, session=None) -> dict[int, dict]:
+    """Статистика и оценка здоровья для набора партнёров: {partner_id: {...}}."""
+    stats = partner_stats(partner_ids, ym, session=session)
+    scored = score_partners(({"id": pid, **row} for pid, row in stats.items()), today)
+    return {row["id"]: row for row in scored}
+
+
+def sleepy_partners_by_recruiter(today: date | None = None, session=None) -> dict[int, list[int]]:
+    """Партнёры без подач SLEEPY_DAYS+ дней, сгруппированные по закреплённому рекрутёру.
+
+    Два запроса на всех рекрутёров сразу: список закреплённых партнёров и их статистика.
+    """
+    session = session or db.session
+    assigned = session.execute(
+        text(
+            "SELECT id, assigned_recruiter_id FROM users "
+            "WHERE role = 'partner' AND assigned_recruiter_id IS NOT NULL"
+        )
+    ).all()
+    health = partner_health([pid for pid, _ in assigned], today=today, session=session)
+    sleepy: dict[int, list[int]] = {}
+    for pid, recruiter_id in assigned:
+        days = health[pid]["days_since_last"]
+        if days is not None and days >= SLEEPY_DAYS:
+            sleepy.setdefault(recruiter_id, []).append(pid)
+    return sleepy
+
+
+# =====================
+#   BENCHMARK
+# =====================
+
+# Прежний вариант страницы «Мои партнёры»: отдельный запрос на каждого партнёра
+_PER_PARTNER_SQL = """
+    SELECT
+      COUNT(c.id) as submissions_total,
+      SUM(CASE WHEN c.id IS NOT NULL AND c.created_at >= :m_start AND c.created_at < :m_end THEN 1 ELSE 0 END) as submissions_month,
+      COUNT(pl.id) as starts_total,
+      SUM(CASE WHEN pl.id IS NOT NULL AND pl.start_date >= :m_start AND pl.start_date < :m_end THEN 1 ELSE 0 END) as starts_month,
+      MAX(c.created_at) as last_submission_at
+    FROM candidates c
+    LEFT JOIN placements pl ON pl.candidate_id = c.id
+    WHERE c.submitter_id = :pid
+"""
+
+
+def _bench_session(partners: int, candidates_per_partner: int = 5):
+    """Временная база в памяти: partners партнёров, по candidates_per_partner подач у каждого."""
+    from datetime import datetime, timedelta
+
+    from sqlalchemy import create_engine, insert
+    from sqlalchemy.orm import Session
+    from sqlalchemy.pool import StaticPool
+
+    from models import KPI_MONTHLY_REBUILD, Base, Candidate, Placement, User
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    session = Session(engine)
+    now = datetime.utcnow()
+    users, candidates, placements = [], [], []
+    cand_id = 0
+    for pid in range(1, partners + 1):
+        users.append({"id": pid, "name": f"Партнёр {pid}", "email": f"p{pid}@bench",
+                      "password_hash": "", "role": "partner"})
+        for n in range(candidates_per_partner):
+            cand_id += 1
+            created = now - timedelta(days=(pid * 7 + n * 13) % 120)
+            candidates.append({"id": cand_id, "job_id": 1, "submitter_id": pid,
+                               "full_name": f"Кандидат {cand_id}", "created_at": created})
+            if n % 3 == 0:
+                placements.append({"candidate_id": cand_id, "job_id": 1, "recruiter_id": 1,
+                                   "start_date": (created + timedelta(days=5)).date()})
+    # ORM bulk insert: значения по умолчанию колонок подставляет SQLAlchemy
+    session.execute(insert(User), users)
+    session.execute(insert(Candidate), candidates)
+    session.execute(insert(Placement), placements)
+    for stmt in KPI_MONTHLY_REBUILD:
+        session.execute(text(stmt))
+    session.commit()
+    return session
+
+
+def benchmark(sizes=(1_000, 10_000)) -> None:
+    ym = current_ym()
+    for partners in sizes:
+        session = _bench_session(partners)
+        ids = list(range(1, partners + 1))
+
+        started = time.perf_counter()
+        legacy = [
+            session.execute(text(_PER_PARTNER_SQL), {**month_params(ym), "pid": pid}).mappings().first()
+            for pid in ids
+        ]
+        score_partners(legacy)
+        per_partner = time.perf_counter() - started
+
+        started = time.perf_counter()
+        health = partner_health(ids, ym, session=session)
+        grouped = time.perf_counter() - started
+
+        assert len(health) == partners
+        print(
+            f"{partners:>6} партнёров: по запросу на партнёра {per_partner * 1000:8.1f} мс, "
+            f"один запрос {grouped * 1000:7.1f} мс (x{per_partner / grouped:.0f})"
+        )
+        session.close()
+
+
+if __name__ == "__main__":
+    benchmark([int(arg) for arg in sys.argv[1:]] or (1_000, 10_000))
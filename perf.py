@@ -0,0 +1,170 @@
+"""Замер производительности по эндпоинтам.
+
+Для каждого запроса считаем общее время, время рендера шаблонов, число
+SQL-запросов и их суммарное время. Результат уходит в заголовок Server-Timing
+и наблюдателям (metrics.py копит его в общем для всех воркеров gunicorn
+файле). Страница /admin/perf строится из этих общих данных: перцентили
+p50/p95/p99 оцениваются по бакетам гистограммы crm_request_duration_seconds,
+как histogram_quantile в Prometheus, — поэтому они описывают весь сервер, а
+не воркер, который обработал запрос страницы.
+"""
+import time
+from collections import defaultdict
+
+from flask import g, has_request_context, request, before_render_template, template_rendered
+from sqlalchemy import event
+
+# Общие метрики запросов (см. metrics._on_request)
+REQUEST_METRICS_PREFIX = "crm_request_"
+
+# Дополнительные получатели замеров (например, metrics): fn(endpoint, sample)
+_observers = []
+
+
+def add_observer(fn) -> None:
+    """Подписаться на замер каждого завершённого запроса."""
+    _observers.append(fn)
+
+
+def init_perf(app, engine) -> None:
+    """Подключить замеры к приложению и к движку SQLAlchemy."""
+    # Старт замера должен идти раньше остальных before_request (загрузка пользователя и т.п.)
+    app.before_request_funcs.setdefault(None, []).insert(0, _start_request)
+    app.after_request(_finish_request)
+
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_after_render, app)
+
+
+def _start_request():
+    g.perf = {
+        "start": time.perf_counter(),
+        "sql_count": 0,
+        "sql_time": 0.0,
+        "tpl_time": 0.0,
+        "tpl_start": [],
+    }
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("perf_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("perf_query_start")
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    if has_request_context():
+        perf = g.get("perf")
+        if perf is not None:
+            perf["sql_count"] += 1
+            perf["sql_time"] += elapsed
+
+
+def _before_render(sender, template, context, **extra):
+    perf = g.get("perf")
+    if perf is not None:
+        perf["tpl_start"].append(time.perf_counter())
+
+
+def _after_render(sender, template, context, **extra):
+    perf = g.get("perf")
+    if perf is not None and perf["tpl_start"]:
+        perf["tpl_time"] += time.perf_counter() - perf["tpl_start"].pop()
+
+
+def _finish_request(response):
+    perf = g.pop("perf", None)
+    if perf is None:
+        return response
+
+    total = time.perf_counter() - perf["start"]
+    endpoint = request.endpoint or "<unmatched>"
+    sample = {
+        "total": total,
+        "sql_count": perf["sql_count"],
+        "sql_time": perf["sql_time"],
+        "tpl_time": perf["tpl_time"],
+    }
+    for fn in _observers:
+        fn(endpoint, sample)
+
+    response.headers.add(
+        "Server-Timing",
+        f'db;dur={perf["sql_time"] * 1000:.1f};desc="{perf["sql_count"]} queries", '
+        f'tpl;dur={perf["tpl_time"] * 1000:.1f}, '
+        f"total;dur={total * 1000:.1f}",
+    )
+    return response
+
+
+def _quantile(q: float, buckets: list[tuple[float, float]]) -> float:
+    """Квантиль по накопительным бакетам [(le, count)] с линейной интерполяцией внутри бакета.
+
+    Как histogram_quantile: если квантиль попадает в бакет +Inf, возвращается
+    верхняя конечная граница.
+    """
+    buckets = sorted(buckets)
+    total = buckets[-1][1] if buckets else 0
+    if not total:
+        return 0.0
+    rank = q * total
+    lower, below = 0.0, 0.0
+    for le, count in buckets:
+        if count >= rank:
+            if le == float("inf"):
+                return lower
+            if count == below:
+                return le
+            return lower + (le - lower) * (rank - below) / (count - below)
+        lower, below = le, count
+    return lower
+
+
+def endpoint_stats() -> list[dict]:
+    """Сводка по эндпоинтам по всем воркерам, самые медленные (по p95) сверху."""
+    import metrics
+
+    buckets = defaultdict(list)
+    sums = defaultdict(dict)
+    for name, labels, value in metrics.read(REQUEST_METRICS_PREFIX):
+        endpoint = labels.get("endpoint")
+        if endpoint is None:
+            continue
+        if name == "crm_request_duration_seconds_bucket":
+            le = labels.get("le", "+Inf")
+            buckets[endpoint].append((float("inf") if le == "+Inf" else float(le), value))
+        else:
+            sums[endpoint][name] = value
+
+    stats = []
+    for endpoint, values in sums.items():
+        n = values.get("crm_request_duration_seconds_count", 0)
+        if not n:
+            continue
+        stats.append(
+            {
+                "endpoint": endpoint,
+                "count": int(n),
+                "p50_ms": round(_quantile(0.50, buckets[endpoint]) * 1000, 1),
+                "p95_ms": round(_quantile(0.95, buckets[endpoint]) * 1000, 1),
+                "p99_ms": round(_quantile(0.99, buckets[endpoint]) * 1000, 1),
+                "avg_ms": round(values.get("crm_request_duration_seconds_sum", 0) / n * 1000, 1),
+                "avg_sql_count": round(values.get("crm_request_sql_queries_total", 0) / n, 1),
+                "avg_sql_ms": round(values.get("crm_request_sql_seconds_total", 0) / n * 1000, 1),
+                "avg_tpl_ms": round(values.get("crm_request_template_seconds_total", 0) / n * 1000, 1),
+            }
+        )
+    stats.sort(key=lambda row: (row["p95_ms"], row["avg_ms"]), reverse=True)
+    return stats
+
+
+def reset_stats() -> None:
+    """Обнулить общие метрики запросов во всех воркерах."""
+    import metrics
+
+    metrics.reset(REQUEST_METRICS_PREFIX)
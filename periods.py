@@ -0,0 +1,70 @@
+"""Границы месяцев для фильтров по датам.
+
+Условие вида strftime('%Y-%m', col) = :ym не может использовать индекс —
+SQLite вычисляет функцию для каждой строки. Поэтому месяц превращаем в
+полуинтервал [начало месяца, начало следующего) и сравниваем саму колонку:
+такой фильтр становится range-сканом по индексу.
+
+Даты в SQLite хранятся текстом ('YYYY-MM-DD' или 'YYYY-MM-DD HH:MM:SS...'),
+поэтому границы в формате 'YYYY-MM-DD' корректно сравниваются с обоими видами.
+"""
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import and_
+from sqlalchemy.types import Date, DateTime
+
+
+def current_ym() -> str:
+    return date.today().strftime("%Y-%m")
+
+
+def normalize_ym(value, default=None) -> str:
+    """'2025-3' / '2025-03' / '2025-03-15' -> '2025-03'; мусор -> default (текущий месяц)."""
+    try:
+        year, month = str(value or "").strip().split("-")[:2]
+        return date(int(year), int(month), 1).strftime("%Y-%m")
+    except (TypeError, ValueError):
+        return default or current_ym()
+
+
+def month_bounds(ym: str) -> tuple[date, date]:
+    """Первый день месяца и первый день следующего месяца: [start, end)."""
+    start = datetime.strptime(normalize_ym(ym), "%Y-%m").date()
+    if start.month == 12:
+        end = date(start.year + 1, 1, 1)
+    else:
+        end = date(start.year, start.month + 1, 1)
+    return start, end
+
+
+def day_range_bounds(from_date: date, to_date: date) -> tuple[date, date]:
+    """Включительный интервал дней [from, to] -> полуинтервал [from, to + 1 день)."""
+    return from_date, to_date + timedelta(days=1)
+
+
+def month_params(ym: str, prefix: str = "m") -> dict:
+    """Параметры для сырого SQL: {prefix}_start / {prefix}_end.
+
+    В запросе: col >= :m_start AND col < :m_end
+    """
+    start, end = month_bounds(ym)
+    return {f"{prefix}_start": start.isoformat(), f"{prefix}_end": end.isoformat()}
+
+
+def in_range(column, start: date, end: date):
+    """Условие SQLAlchemy start <= column < end с типом границ под колонку."""
+    if isinstance(column.type, DateTime):
+        lo = datetime.combine(start, datetime.min.time())
+        hi = datetime.combine(end, datetime.min.time())
+    elif isinstance(column.type, Date):
+        lo, hi = start, end
+    else:
+        # Даты, хранящиеся строками, сравниваем со строками ISO
+        lo, hi = start.isoformat(), end.isoformat()
+    return and_(column >= lo, column < hi)
+
+
+def in_month(column, ym: str):
+    """Условие SQLAlchemy «колонка попадает в месяц ym»."""
+    start, end = month_bounds(ym)
+    return in_range(column, start, end)
@@ -0,0 +1,407 @@
+"""Проверка планов горячих запросов (EXPLAIN QUERY PLAN).
+
+Запуск:
+    python query_plans.py               # схема из моделей в памяти
+    python query_plans.py database.db   # реальная база
+    python -m pytest tests/test_query_plans.py
+
+Проверяются два набора запросов:
+- BUILDER_QUERIES — списки кандидатов, «Входящие» и «Мои подачи»: SQL
+  собирается теми же функциями, что в блюпринтах (_candidates_query,
+  _inbox_query, _partner_submissions_query + pagination.keyset_query);
+- HOT_QUERIES — остальные горячие запросы (SQL как в коде или из тех же
+  построителей, например duplicates.match_query).
+
+Для каждого печатается план. Любой SCAN таблицы (в том числе полный проход
+по индексу — «SCAN t USING INDEX …») считается регрессией, кроме маленьких
+справочников и явно перечисленных в TOP_N_SCANS выборок «последние N».
+Тогда скрипт завершается с кодом 1, а тест падает.
+"""
+import re
+import sys
+from datetime import datetime
+from types import SimpleNamespace
+
+from flask import Flask, g
+from sqlalchemy import create_engine, text
+from sqlalchemy.dialects import sqlite
+
+from blueprints.candidates import CANDIDATES_PAGE_SIZE, _candidates_query
+from blueprints.main import (
+    INBOX_PAGE_SIZE, PARTNER_ACTIVITY_SQL, SUBMISSIONS_PAGE_SIZE, _inbox_query, _partner_submissions_query,
+)
+from duplicates import match_query
+from models import Base, Candidate
+from pagination import keyset_query
+
+# Маленькие справочники, которые можно читать целиком
+SMALL_TABLES = {"jobs", "candidate_status_reasons", "training_sections", "training_lessons"}
+
+# Табличные функции над параметром запроса (список id в JSON), а не таблицы базы
+PARAM_TABLES = {"json_each"}
+
+# Выборки «последние N»: проход по индексу в порядке ORDER BY останавливается
+# после LIMIT строк. Разрешены только для названных запросов и только если
+# SQLite не сортирует результат сам (нет USE TEMP B-TREE FOR ORDER BY).
+TOP_N_SCANS = {
+    "dashboard: recent placements": {"placements"},
+    "candidates: staff list": {"candidates"},
+    "candidates: staff list, next page": {"candidates"},
+}
+
+# Границы месяца, как их отдаёт periods.month_params
+MONTH = {"m_start": "2025-01-01", "m_end": "2025-02-01"}
+
+# Курсор keyset-пагинации (created_at, id), как его привязывает pagination.keyset_page
+KEYSET = {"c_created": "2025-01-15 10:00:00.000000", "c_id": 1000}
+KEYSET_AFTER = (datetime(2025, 1, 15, 10, 0), 1000)
+
+
+
+def _literal_sql(statement) -> str:
+    """SQL запроса SQLAlchemy с подставленными значениями (для EXPLAIN без параметров)."""
+    return str(statement.compile(dialect=sqlite.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+# (название, SQL, параметры; None — значения уже подставлены)
+HOT_QUERIES = [
+    (
+        "header: unread notifications",
+        "SELECT COUNT(id) FROM notifications WHERE user_id = :uid AND is_read = 0",
+        {"uid": 1},
+    ),
+    (
+        "header: unread news",
+        """
+        SELECT COUNT(n.id) FROM news n
+        LEFT JOIN news_read r ON r.news_id = n.id AND r.user_id = :uid
+        WHERE n.is_published = 1 AND r.id IS NULL
+        """,
+        {"uid": 1},
+    ),
+    (
+        "notifications: feed",
+        "SELECT * FROM notifications WHERE user_id = :uid ORDER BY created_at DESC LIMIT 100",
+        {"uid": 1},
+    ),
+    (
+        "news: is read",
+        "SELECT id FROM news_read WHERE news_id = :nid AND user_id = :uid",
+        {"nid": 1, "uid": 1},
+    ),
+    (
+        "candidate: comments",
+        "SELECT * FROM candidate_comments WHERE candidate_id = :cid ORDER BY created_at DESC",
+        {"cid": 1},
+    ),
+    (
+        "candidates: unread comment counts",
+        """
+        SELECT cc.candidate_id, COUNT(cc.id) FROM candidate_comments cc
+        LEFT JOIN (
+          SELECT candidate_id, MAX(last_seen_at) AS last_seen_at FROM candidate_comment_seen
+          WHERE user_id = :uid AND candidate_id IN (1, 2, 3) GROUP BY candidate_id
+        ) s ON s.candidate_id = cc.candidate_id
+        WHERE cc.candidate_id IN (1, 2, 3) AND (s.last_seen_at IS NULL OR cc.created_at > s.last_seen_at)
+        GROUP BY cc.candidate_id
+        """,
+        {"uid": 1},
+    ),
+    (
+        "submit: duplicates by phone",
+        _literal_sql(match_query(Candidate.phone_key, "600100200", [7])),
+        None,
+    ),
+    (
+        "submit: duplicates by name",
+        _literal_sql(match_query(Candidate.name_key, "иван петров", [7, 8])),
+        None,
+    ),
+    (
+        "candidate: comment seen",
+        "SELECT * FROM candidate_comment_seen WHERE candidate_id = :cid AND user_id = :uid",
+        {"cid": 1, "uid": 1},
+    ),
+    (
+        "candidate: logs",
+        "SELECT * FROM candidate_logs WHERE candidate_id = :cid ORDER BY created_at DESC",
+        {"cid": 1},
+    ),
+    (
+        "candidate: docs",
+        "SELECT * FROM candidate_docs WHERE candidate_id = :cid ORDER BY uploaded_at DESC",
+        {"cid": 1},
+    ),
+    (
+        "candidate: placement",
+        "SELECT * FROM placements WHERE candidate_id = :cid",
+        {"cid": 1},
+    ),
+    (
+        "dashboard: partner stats",
+        """
+        SELECT COUNT(c.id), COUNT(p.id) FROM candidates c
+        LEFT JOIN placements p ON p.candidate_id = c.id
+        WHERE c.submitter_id = :uid
+        """,
+        {"uid": 1},
+    ),
+    (
+        "dashboard: recent placements",
+        "SELECT * FROM placements ORDER BY created_at DESC LIMIT 50",
+        {},
+    ),
+    (
+        "kpi: month starts",
+        "SELECT COUNT(id), SUM(partner_commission) FROM placements WHERE start_date >= :m_start AND start_date < :m_end",
+        MONTH,
+    ),
+    (
+        "kpi: month submissions",
+        "SELECT COUNT(id) FROM candidates WHERE created_at >= :m_start AND created_at < :m_end",
+        MONTH,
+    ),
+    (
+        "kpi: recruiter month starts",
+        """
+        SELECT COUNT(id) FROM placements
+        WHERE recruiter_id = :uid AND start_date >= :m_start AND start_date < :m_end
+        """,
+        {**MONTH, "uid": 1},
+    ),
+    (
+        "kpi: partner month submissions",
+        """
+        SELECT COUNT(id) FROM candidates
+        WHERE submitter_id = :uid AND created_at >= :m_start AND created_at < :m_end
+        """,
+        {**MONTH, "uid": 1},
+    ),
+    (
+        "kpi: partner month paid",
+        """
+        SELECT SUM(p.partner_commission) FROM placements p
+        JOIN candidates c ON c.id = p.candidate_id
+        WHERE c.submitter_id = :uid AND p.partner_paid = 1
+          AND p.partner_paid_at >= :m_start AND p.partner_paid_at < :m_end
+        """,
+        {**MONTH, "uid": 1},
+    ),
+    (
+        "kpi rollup: month totals",
+        "SELECT SUM(submissions), SUM(starts), SUM(partner_commission) FROM kpi_monthly WHERE ym = :ym",
+        {"ym": "2025-01"},
+    ),
+    (
+        "kpi rollup: top recruiters",
+        """
+        SELECT u.name, SUM(k.starts) AS starts FROM kpi_monthly k
+        JOIN users u ON u.id = k.recruiter_id
+        WHERE k.ym = :ym
+        GROUP BY u.id HAVING SUM(k.starts) > 0
+        ORDER BY starts DESC LIMIT 10
+        """,
+        {"ym": "2025-01"},
+    ),
+    (
+        "dashboard: partner activity",
+        PARTNER_ACTIVITY_SQL,
+        {"ym": "2025-01"},
+    ),
+    (
+        "partner health: stats for a set of partners",
+        """
+        SELECT partner_id, SUM(submissions), SUM(starts), MAX(last_submission_at) FROM kpi_monthly
+        WHERE partner_id IN (SELECT value FROM json_each(:ids))
+        GROUP BY partner_id
+        """,
+        {"ids": "[1, 2, 3]"},
+    ),
+    (
+        "dashboard: recruiter placements",
+        "SELECT COUNT(id) FROM placements WHERE recruiter_id = :uid",
+        {"uid": 1},
+    ),
+    (
+        "my partners: list",
+        "SELECT * FROM users WHERE role = 'partner' AND assigned_recruiter_id = :uid ORDER BY name",
+        {"uid": 1},
+    ),
+    (
+        "my partners: registration requests",
+        """
+        SELECT * FROM registration_requests
+        WHERE status = 'new' ORDER BY created_at DESC LIMIT 200
+        """,
+        {},
+    ),
+    (
+        "confirm month: partner placements",
+        """
+        SELECT p.id FROM placements p
+        JOIN candidates c ON c.id = p.candidate_id
+        JOIN users partner ON partner.id = c.submitter_id
+        WHERE partner.assigned_recruiter_id = :uid AND p.recruiter_confirmed = 0
+        """,
+        {"uid": 1},
+    ),
+    (
+        "finance: payments due",
+        """
+        SELECT p.id, p.amount_effective, c.full_name, j.title, u.name FROM placements p
+        JOIN candidates c ON c.id = p.candidate_id
+        JOIN jobs j ON j.id = p.job_id
+        JOIN users u ON u.id = c.submitter_id
+        WHERE p.partner_paid = 0 AND p.payable_from <= :as_of
+        ORDER BY u.name ASC, p.start_date ASC
+        """,
+        {"as_of": "2025-01-31"},
+    ),
+    (
+        "candidate: timeline comments page",
+        """
+        SELECT cm.id, cm.created_at, cm.text, u.name FROM candidate_comments cm
+        LEFT JOIN users u ON u.id = cm.author_id
+        WHERE cm.candidate_id = :cid AND cm.created_at <= :c_created
+          AND (cm.created_at < :c_created OR (cm.created_at = :c_created AND cm.id * 2 + 1 < :c_id))
+        ORDER BY cm.created_at DESC, cm.id DESC LIMIT 31
+        """,
+        {"cid": 1} | KEYSET,
+    ),
+    (
+        "candidate: timeline logs page",
+        """
+        SELECT l.id, l.created_at, l.action, l.details, u.name FROM candidate_logs l
+        LEFT JOIN users u ON u.id = l.user_id
+        WHERE l.candidate_id = :cid AND l.action NOT IN ('comment_add', 'status_change')
+          AND l.created_at <= :c_created
+          AND (l.created_at < :c_created OR (l.created_at = :c_created AND l.id * 2 < :c_id))
+        ORDER BY l.created_at DESC, l.id DESC LIMIT 31
+        """,
+        {"cid": 1} | KEYSET,
+    ),
+    (
+        "finance: paid history",
+        """
+        SELECT p.id FROM placements p
+        JOIN candidates c ON c.id = p.candidate_id
+        JOIN users u ON u.id = c.submitter_id
+        WHERE p.partner_paid = 1
+          AND p.partner_paid_at IS NOT NULL
+          AND p.partner_paid_at >= :from_date
+          AND p.partner_paid_at < :to_before
+        ORDER BY p.partner_paid_at DESC
+        """,
+        {"from_date": "2025-01-01", "to_before": "2025-02-01"},
+    ),
+]
+
+
+def _candidates(role):
+    g.user = SimpleNamespace(id=1, role=role)
+    return _candidates_query()[0], CANDIDATES_PAGE_SIZE
+
+
+def _inbox(role):
+    return _inbox_query(), INBOX_PAGE_SIZE
+
+
+def _submissions(role):
+    return _partner_submissions_query(SimpleNamespace(id=1, role=role))[0], SUBMISSIONS_PAGE_SIZE
+
+
+# (название, построитель, роль, строка запроса с фильтрами, следующая страница)
+BUILDER_QUERIES = [
+    ("candidates: staff list", _candidates, "recruiter", "", False),
+    ("candidates: staff list, next page", _candidates, "recruiter", "", True),
+    ("candidates: staff by job", _candidates, "recruiter", "job_id=1", True),
+    ("candidates: staff by status", _candidates, "recruiter", "status=Подан", True),
+    ("candidates: staff by partner", _candidates, "coordinator", "partner_id=1", True),
+    ("candidates: staff by recruiter", _candidates, "coordinator", "recruiter_id=1", True),
+    ("candidates: partner list", _candidates, "partner", "", True),
+    ("candidates: partner by job", _candidates, "partner", "job_id=1", True),
+    ("inbox", _inbox, "recruiter", "", False),
+    ("inbox: next page", _inbox, "recruiter", "", True),
+    ("partner submissions", _submissions, "partner", "", False),
+    ("partner submissions: next page", _submissions, "partner", "", True),
+    ("partner submissions: by job", _submissions, "partner", "job_id=1", True),
+    ("partner submissions: by status", _submissions, "partner", "status=Подан", True),
+]
+
+
+def builder_sql() -> list[tuple[str, str]]:
+    """SQL списков из построителей блюпринтов: [(название, SQL с подставленными значениями)]."""
+    app = Flask(__name__)
+    result = []
+    for name, build, role, args, next_page in BUILDER_QUERIES:
+        with app.test_request_context("/?" + args):
+            query, page_size = build(role)
+            query = keyset_query(query, Candidate.created_at, Candidate.id,
+                                 KEYSET_AFTER if next_page else None, page_size)
+            result.append((name, _literal_sql(query.statement)))
+    return result
+
+
+_SCAN_RE = re.compile(r"^SCAN (\S+)")
+
+
+def full_scans(conn, name: str, sql: str, params: dict | None = None) -> tuple[list[str], list[str]]:
+    """План запроса и список таблиц (алиасов), читаемых целиком."""
+    if params is None:
+        # SQL с подставленными значениями: двоеточия в литералах — не параметры
+        rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + sql)
+    else:
+        rows = conn.execute(text("EXPLAIN QUERY PLAN " + sql), params)
+    plan = [row[3] for row in rows]
+    sorts_itself = any(detail.startswith("USE TEMP B-TREE FOR ORDER BY") for detail in plan)
+    top_n = TOP_N_SCANS.get(name, set())
+    scans = []
+    for detail in plan:
+        m = _SCAN_RE.match(detail.strip())
+        if not m:
+            continue
+        table = m.group(1)
+        if table in SMALL_TABLES or table in PARAM_TABLES:
+            continue
+        if table in top_n and " USING " in detail and not sorts_itself:
+            continue
+        scans.append(table)
+    return plan, scans
+
+
+def check(engine, verbose: bool = True) -> list[tuple[str, list[str]]]:
+    """Прогнать все запросы; вернуть [(название, [таблицы со SCAN])]."""
+    queries = [(name, sql, None) for name, sql in builder_sql()] + HOT_QUERIES
+    failures = []
+    with engine.connect() as conn:
+        for name, sql, params in queries:
+            plan, scans = full_scans(conn, name, sql, params)
+            if verbose:
+                print(f"== {name}")
+                for detail in plan:
+                    print(f"   {detail}")
+            if scans:
+                failures.append((name, scans))
+    return failures
+
+
+def main(argv) -> int:
+    if len(argv) > 1:
+        engine = create_engine(f"sqlite:///{argv[1]}")
+    else:
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine)
+
+    failures = check(engine)
+    if failures:
+        print()
+        for name, scans in failures:
+            print(f"FULL SCAN: {name}: {', '.join(scans)}")
+        return 1
+    print()
+    print(f"OK: {len(BUILDER_QUERIES) + len(HOT_QUERIES)} queries, no full table scans")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,160 @@
+"""Кэш справочников в памяти воркера: списки вакансий, рекрутёров, партнёров, причин статусов.
+
+Списки для выпадающих меню раньше перечитывались на каждой странице. Теперь
+каждый список загружается один раз и хранится вместе с «версией» своих
+таблиц. Версии лежат в app_counters (ключи refcache:<группа>) и увеличиваются
+в той же транзакции, что и изменение данных, — через событие after_flush
+ORM-сессии, так что ни один обработчик не должен помнить об инвалидации.
+Каждый воркер gunicorn видит новую версию в базе и перечитывает список.
+
+Версии читаются одним запросом к app_counters не чаще раза за запрос.
+Массовые UPDATE/DELETE в обход ORM версии не меняют: после них вызывайте
+invalidate(...) вручную.
+"""
+import threading
+
+from flask import g, has_request_context
+from sqlalchemy import event, select, text
+from sqlalchemy.orm import Session
+
+from models import CandidateStatusReason, Job, User, db
+
+VERSION_PREFIX = "refcache:"
+
+# Таблица -> группа версий
+TABLE_GROUPS = {
+    "jobs": "jobs",
+    "users": "users",
+    "candidate_status_reasons": "reasons",
+}
+
+# name -> (группы, загрузчик)
+_loaders: dict[str, tuple[tuple[str, ...], callable]] = {}
+# name -> (версии групп, строки)
+_cache: dict[str, tuple[tuple[int, ...], tuple]] = {}
+_lock = threading.Lock()
+
+_BUMP_SQL = text(
+    "INSERT INTO app_counters (key, value) VALUES (:key, 1) "
+    "ON CONFLICT(key) DO UPDATE SET value = value + 1"
+)
+
+
+def reference(name: str, *groups: str):
+    """Зарегистрировать загрузчик справочника, зависящий от групп таблиц."""
+    def decorator(fn):
+        _loaders[name] = (groups, fn)
+        return fn
+    return decorator
+
+
+def _versions() -> dict[str, int]:
+    if has_request_context() and "refcache_versions" in g:
+        return g.refcache_versions
+    rows = db.session.execute(
+        text("SELECT key, value FROM app_counters WHERE key LIKE :prefix"), {"prefix": f"{VERSION_PREFIX}%"}
+    ).all()
+    versions = {key[len(VERSION_PREFIX):]: value for key, value in rows}
+    if has_request_context():
+        g.refcache_versions = versions
+    return versions
+
+
+def get(name: str) -> tuple:
+    """Строки справочника (Row с доступом по атрибутам), из кэша, если версии не менялись."""
+    groups, loader = _loaders[name]
+    versions = _versions()
+    stamp = tuple(versions.get(group, 0) for group in groups)
+    with _lock:
+        cached = _cache.get(name)
+    if cached and cached[0] == stamp:
+        return cached[1]
+    rows = tuple(loader())
+    with _lock:
+        _cache[name] = (stamp, rows)
+    return rows
+
+
+def invalidate(*groups: str, session=None) -> None:
+    """Увеличить версии групп (без коммита): все воркеры перечитают зависящие списки."""
+    session = session or db.session
+    for group in groups:
+        session.execute(_BUMP_SQL, {"key": VERSION_PREFIX + group})
+    if has_request_context():
+        g.pop("refcache_versions", None)
+
+
+@event.listens_for(Session, "after_flush")
+def _bump_changed_groups(session, flush_context):
+    groups = set()
+    for obj in session.new | session.deleted:
+        groups.add(TABLE_GROUPS.get(getattr(obj, "__tablename__", None)))
+    for obj in session.dirty:
+        group = TABLE_GROUPS.get(getattr(obj, "__tablename__", None))
+        if group and session.is_modified(obj, include_collections=False):
+            groups.add(group)
+    groups.discard(None)
+    if not groups:
+        return
+    connection = session.connection()
+    for group in sorted(groups):
+        connection.execute(_BUMP_SQL, {"key": VERSION_PREFIX + group})
+    if has_request_context():
+        g.pop("refcache_versions", None)
+
+
+# =====================
+#   СПРАВОЧНИКИ
+# =====================
+
+@reference("active_jobs", "jobs")
+def _active_jobs():
+    return db.session.execute(
+        select(Job.id, Job.title).where(Job.status == "active").order_by(Job.title.asc())
+    ).all()
+
+
+@reference("jobs", "jobs")
+def _jobs():
+    return db.session.execute(select(Job.id, Job.title).order_by(Job.title.asc())).all()
+
+
+@reference("recruiters", "users")
+def _recruiters():
+    """Все рекрутёры, включая отключённых (фильтр по стартам в истории)."""
+    return db.session.execute(
+        select(User.id, User.name).where(User.role == "recruiter").order_by(User.name.asc())
+    ).all()
+
+
+@reference("active_recruiters", "users")
+def _active_recruiters():
+    return db.session.execute(
+        select(User.id, User.name, User.email)
+        .where(User.role == "recruiter", User.is_active == True)
+        .order_by(User.name.asc())
+    ).all()
+
+
+@reference("active_partners", "users")
+def _active_partners():
+    return db.session.execute(
+        select(User.id, User.name, User.email)
+        .where(User.role == "partner", User.is_active == True)
+        .order_by(User.name.asc())
+    ).all()
+
+
+@reference("status_reasons", "reasons")
+def _status_reasons():
+    return db.session.execute(
+        select(
+            CandidateStatusReason.id,
+            CandidateStatusReason.code,
+            CandidateStatusReason.title_ru,
+            CandidateStatusReason.title_uk,
+            CandidateStatusReason.applies_to_status,
+        )
+        .where(CandidateStatusReason.is_active == True)
+        .order_by(CandidateStatusReason.sort_order, CandidateStatusReason.id)
+    ).all()
@@ -0,0 +1,145 @@
+"""Периодические задачи без внешнего брокера.
+
+Задача регистрируется декоратором @job(name, every) и запускается не чаще
+одного раза за интервал. Состояние хранится в таблице scheduled_jobs; запуск
+«захватывается» атомарным UPDATE, поэтому задача не выполнится дважды, даже
+если её одновременно проверяют несколько воркеров gunicorn и cron.
+
+Запуск:
+    flask --app app run-jobs                 # один проход (для cron, например каждые 15 минут)
+    flask --app app run-jobs --loop          # проверять задачи в цикле
+    flask --app app run-jobs --force NAME    # выполнить задачу немедленно
+    SCHEDULER_ENABLED=1                      # фоновый поток внутри каждого воркера приложения
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import or_
+
+from models import ScheduledJob, create_notification_once, db
+
+log = logging.getLogger(__name__)
+
+# name -> (интервал, функция(now) -> str с кратким итогом)
+JOBS: dict[str, tuple[timedelta, callable]] = {}
+
+_background_started = False
+
+
+def job(name: str, every: timedelta):
+    """Зарегистрировать периодическую задачу."""
+    def decorator(fn):
+        JOBS[name] = (every, fn)
+        return fn
+    return decorator
+
+
+def _claim(name: str, every: timedelta, now: datetime, force: bool) -> bool:
+    """Отметить старт задачи, если ей пора (или force). True — запуск наш."""
+    if not db.session.get(ScheduledJob, name):
+        db.session.add(ScheduledJob(name=name))
+        try:
+            db.session.commit()
+        except Exception:
+            # Строку одновременно создал другой процесс
+            db.session.rollback()
+    query = db.session.query(ScheduledJob).filter(ScheduledJob.name == name)
+    if not force:
+        query = query.filter(or_(ScheduledJob.last_started_at.is_(None),
+                                 ScheduledJob.last_started_at <= now - every))
+    claimed = query.update({ScheduledJob.last_started_at: now}, synchronize_session=False)
+    db.session.commit()
+    return claimed == 1
+
+
+def _finish(name: str, status: str, error: str = "") -> None:
+    db.session.query(ScheduledJob).filter(ScheduledJob.name == name).update(
+        {
+            ScheduledJob.last_finished_at: datetime.utcnow(),
+            ScheduledJob.last_status: status,
+            ScheduledJob.last_error: error,
+        },
+        synchronize_session=False,
+    )
+    db.session.commit()
+
+
+def run_due(now: datetime | None = None, force=()) -> dict[str, str]:
+    """Выполнить задачи, которым пора, и задачи из force. Возвращает {имя: итог}."""
+    now = now or datetime.utcnow()
+    results = {}
+    for name, (every, fn) in JOBS.items():
+        if not _claim(name, every, now, name in force):
+            continue
+        try:
+            summary = fn(now)
+            db.session.commit()
+        except Exception as exc:
+            db.session.rollback()
+            log.exception("Scheduled job %s failed", name)
+            _finish(name, "error", repr(exc))
+            results[name] = f"error: {exc!r}"
+            continue
+        _finish(name, "ok")
+        results[name] = summary or "ok"
+    return results
+
+
+def run_forever(app, poll_seconds: float = 60.0) -> None:
+    """Проверять задачи каждые poll_seconds секунд (блокирует поток)."""
+    while True:
+        with app.app_context():
+            try:
+                run_due()
+            except Exception:
+                log.exception("Scheduler pass failed")
+            finally:
+                db.session.remove()
+        time.sleep(poll_seconds)
+
+
+def start_background(app, poll_seconds: float = 60.0) -> None:
+    """Запустить проверку задач в фоновом потоке текущего процесса (один раз)."""
+    global _background_started
+    if _background_started:
+        return
+    _background_started = True
+    thread = threading.Thread(target=run_forever, args=(app, poll_seconds), name="scheduler", daemon=True)
+    thread.start()
+
+
+# =====================
+#   JOBS
+# =====================
+
+@job("sleepy_partners", every=timedelta(hours=24))
+def notify_sleepy_partners(now: datetime) -> str:
+    """Напомнить рекрутёрам о партнёрах без подач SLEEPY_DAYS+ дней.
+
+    Один проход по всем рекрутёрам; не больше одного напоминания на рекрутёра
+    за ISO-неделю (ключ sleepy_partners:YYYY-Www).
+    """
+    from partner_health import SLEEPY_DAYS, sleepy_partners_by_recruiter
+
+    today = now.date()
+    year, week, _ = today.isocalendar()
+    dedupe_key = f"sleepy_partners:{year}-W{week:02d}"
+
+    sleepy = sleepy_partners_by_recruiter(today)
+    created = 0
+    for recruiter_id, partner_ids in sleepy.items():
+        msg = f"У тебя {len(partner_ids)} партнёров без подач больше {SLEEPY_DAYS} дней."
+        created += create_notification_once(recruiter_id, msg, dedupe_key)
+    return f"{created} notifications for {len(sleepy)} recruiters"
+
+
+@job("candidate_duplicates", every=timedelta(hours=24))
+def cluster_candidate_duplicates(now: datetime) -> str:
+    """Пересчитать ключи дублей и кластеры по телефону для всей базы (см. duplicates.py)."""
+    from duplicates import backfill_keys, cluster_duplicates
+
+    changed = backfill_keys()
+    duplicates = cluster_duplicates()
+    return f"{changed} keys updated, {duplicates} duplicates"
@@ -0,0 +1,174 @@
+"""Полнотекстовый поиск кандидатов (SQLite FTS5).
+
+Виртуальная таблица candidate_search (rowid = candidates.id) хранит ФИО,
+телефон (как есть и одними цифрами), заметки, гражданство из анкеты и текст
+комментариев. Её поддерживают в актуальном состоянии триггеры на candidates,
+candidate_profiles и candidate_comments (DDL — models.CANDIDATE_SEARCH_DDL),
+поэтому код приложения о ней не знает. `flask rebuild-search` пересобирает
+таблицу целиком.
+
+Запрос пользователя превращается в набор префиксных термов через AND:
+«иван 600» -> "иван"* "600"*. Порядок — по bm25 с весами колонок.
+
+Бенчмарк (временная база, LIKE против FTS5):
+    python search.py              # 100 000 кандидатов
+    python search.py 250000
+"""
+import random
+import re
+import sys
+import time
+
+from sqlalchemy import select, text
+from sqlalchemy.sql import column, table
+
+from models import CANDIDATE_SEARCH_REBUILD, db
+
+# Виртуальная таблица для подзапросов SQLAlchemy (в моделях её нет)
+candidate_search = table("candidate_search", column("rowid"))
+
+# Колонки, по которым ищет партнёр: только данные, которые он сам ввёл
+PARTNER_COLUMNS = ("full_name", "phone", "citizenship")
+
+# Веса bm25 в порядке колонок: full_name, phone, notes, citizenship, comments
+BM25_WEIGHTS = (10.0, 5.0, 1.0, 2.0, 1.0)
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def fts_query(q: str | None, columns=None) -> str | None:
+    """Строка пользователя -> выражение MATCH; None, если искать нечего.
+
+    Слова экранируются кавычками, поэтому синтаксис FTS5 из ввода не исполняется.
+    """
+    tokens = _TOKEN_RE.findall(q or "")
+    if not tokens:
+        return None
+    expr = " ".join(f'"{token}"*' for token in tokens)
+    if columns:
+        expr = "{" + " ".join(columns) + "} : (" + expr + ")"
+    return expr
+
+
+def matching_ids(q: str | None, columns=None):
+    """Подзапрос id кандидатов, подходящих под q — для фильтра Candidate.id.in_(...)."""
+    expr = fts_query(q, columns)
+    if expr is None:
+        return None
+    return select(candidate_search.c.rowid).where(text("candidate_search MATCH :fts_q").bindparams(fts_q=expr))
+
+
+def ranked_search(q: str | None, columns=None, submitter_id: int | None = None, limit: int = 50) -> list[dict]:
+    """Кандидаты по релевантности: [{id, full_name, status, job_id, created_at, rank, snippet}].
+
+    submitter_id ограничивает выдачу кандидатами одного партнёра. Удалённые не показываются.
+    """
+    expr = fts_query(q, columns)
+    if expr is None:
+        return []
+    weights = ", ".join(str(w) for w in BM25_WEIGHTS)
+    sql = f"""
+        SELECT c.id AS id, c.full_name AS full_name, c.status AS status, c.job_id AS job_id,
+               c.created_at AS created_at,
+               bm25(candidate_search, {weights}) AS rank,
+               snippet(candidate_search, -1, '[', ']', '…', 8) AS snippet
+        FROM candidate_search
+        JOIN candidates c ON c.id = candidate_search.rowid
+        WHERE candidate_search MATCH :q AND c.status != 'Удалён'
+    """
+    params = {"q": expr, "limit": limit}
+    if submitter_id is not None:
+        sql += " AND c.submitter_id = :submitter_id"
+        params["submitter_id"] = submitter_id
+    sql += " ORDER BY rank LIMIT :limit"
+    return [dict(row) for row in db.session.execute(text(sql), params).mappings()]
+
+
+def rebuild_search() -> int:
+    """Пересобрать candidate_search из базы (без коммита). Возвращает число строк."""
+    for stmt in CANDIDATE_SEARCH_REBUILD:
+        db.session.execute(text(stmt))
+    return db.session.execute(text("SELECT COUNT(*) FROM candidate_search")).scalar() or 0
+
+
+# =====================
+#   BENCHMARK
+# =====================
+
+_FIRST = ["Иван", "Пётр", "Олег", "Андрей", "Мария", "Ольга", "Анна", "Taras", "Oksana", "Giorgi", "Nino", "Dmytro"]
+_LAST = ["Петров", "Коваленко", "Шевченко", "Бондаренко", "Мельник", "Ткаченко", "Kowalski", "Beridze",
+         "Kapanadze", "Lysenko", "Savchenko", "Kravets"]
+_CITIZENSHIP = ["UA", "GE", "BY", "MD", "KZ", "PL"]
+
+
+def _bench_session(candidates: int, comments_per_candidate: int = 2):
+    from datetime import datetime, timedelta
+
+    from sqlalchemy import create_engine, insert
+    from sqlalchemy.orm import Session
+
+    from models import CANDIDATE_SEARCH_DDL, Base, Candidate, CandidateComment, CandidateProfile
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = Session(engine)
+    rnd = random.Random(42)
+    now = datetime.utcnow()
+    cands, profiles, comments = [], [], []
+    for cid in range(1, candidates + 1):
+        name = f"{rnd.choice(_FIRST)} {rnd.choice(_LAST)}"
+        phone = f"+48 {rnd.randint(500, 899)}-{rnd.randint(100, 999)}-{rnd.randint(100, 999)}"
+        cands.append({"id": cid, "job_id": 1, "submitter_id": 1 + cid % 500, "full_name": name, "phone": phone,
+                      "created_at": now - timedelta(minutes=cid)})
+        profiles.append({"candidate_id": cid, "citizenship": rnd.choice(_CITIZENSHIP)})
+        for n in range(comments_per_candidate):
+            comments.append({"candidate_id": cid, "author_id": 1,
+                             "text": f"Звонок {n}: кандидат готов к выезду, пропуск {cid * 7 + n}"})
+    session.execute(insert(Candidate), cands)
+    session.execute(insert(CandidateProfile), profiles)
+    session.execute(insert(CandidateComment), comments)
+    # Триггеры создаём после массовой вставки и наполняем индекс одной пересборкой
+    for stmt in CANDIDATE_SEARCH_DDL:
+        session.execute(text(stmt))
+    started = time.perf_counter()
+    for stmt in CANDIDATE_SEARCH_REBUILD:
+        session.execute(text(stmt))
+    session.commit()
+    return session, cands[len(cands) // 2], time.perf_counter() - started
+
+
+def benchmark(candidates: int = 100_000, repeat: int = 20) -> None:
+    session, probe, build = _bench_session(candidates)
+    print(f"{candidates} кандидатов, пересборка индекса: {build:.1f} с")
+    # Искомый кандидат из середины базы: типичный поиск конкретного человека
+    last_name = probe["full_name"].split()[-1]
+    phone = probe["phone"][-11:]
+    digits = "".join(ch for ch in probe["phone"] if ch.isdigit())[-9:]
+    pass_no = str(probe["id"] * 7)
+    cases = [
+        ("ФИО", f"{probe['full_name']}", "c.full_name LIKE :like", f"%{probe['full_name']}%"),
+        ("фамилия", last_name, "c.full_name LIKE :like", f"%{last_name}%"),
+        ("телефон", digits, "c.phone LIKE :like", f"%{phone}%"),
+        ("комментарии", f"пропуск {pass_no}", "EXISTS (SELECT 1 FROM candidate_comments cm "
+                                              "WHERE cm.candidate_id = c.id AND cm.text LIKE :like)",
+         f"%пропуск {pass_no}%"),
+    ]
+    for label, q, like_where, like_value in cases:
+        started = time.perf_counter()
+        for _ in range(repeat):
+            like_rows = session.execute(text(f"SELECT c.id FROM candidates c WHERE {like_where} "
+                                             "ORDER BY c.created_at DESC LIMIT 50"), {"like": like_value}).all()
+        like_ms = (time.perf_counter() - started) / repeat * 1000
+
+        started = time.perf_counter()
+        for _ in range(repeat):
+            fts_rows = session.execute(text("SELECT rowid FROM candidate_search WHERE candidate_search MATCH :q "
+                                            "ORDER BY rank LIMIT 50"), {"q": fts_query(q)}).all()
+        fts_ms = (time.perf_counter() - started) / repeat * 1000
+        print(f"  {label:<12} LIKE {like_ms:8.1f} мс ({len(like_rows):>2})   "
+              f"FTS5 {fts_ms:7.1f} мс ({len(fts_rows):>2})")
+    session.close()
+
+
+if __name__ == "__main__":
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
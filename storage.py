@@ -0,0 +1,416 @@
+"""Хранилище загруженных файлов (документы, фото, подтверждения выплат).
+
+Файл пишется потоково во временный файл с подсчётом SHA-256 и затем
+переименовывается в путь по содержимому:
+
+    <UPLOAD_ROOT>/objects/ab/cd/abcd…<64 символа>.pdf
+
+Одинаковые файлы (тот же хеш и расширение) хранятся один раз. Путь
+относительно UPLOAD_ROOT записывается в базу (Job.thumbnail_image,
+JobHousingPhoto.filename, CandidateDoc.storage_path, PartnerDoc.storage_path,
+Placement.partner_payment_file), поэтому отдача файла — одно чтение строки
+из базы, без перебора вариантов на диске и без коллизий имён.
+
+Старые записи хранят имя файла относительно папки своего раздела
+(uploads/job_thumbs/<job_id>/photo.jpg и т. п.). Их один раз переносит в
+хранилище команда
+    flask --app app migrate-uploads
+до переноса такие файлы ищутся прежним способом (locate_legacy).
+
+Байты файла может отдавать прокси (Config.FILE_DELIVERY, см. send_stored).
+Для nginx и FILE_DELIVERY=x-accel нужен internal-location на UPLOAD_ROOT:
+
+    location /_protected_uploads/ {
+        internal;
+        alias /srv/crm/blueprints/uploads/;
+    }
+
+Бенчмарк режимов отдачи: `python storage.py [размер файла в МБ]`.
+"""
+import hashlib
+import os
+import posixpath
+import shutil
+import tempfile
+from typing import NamedTuple
+from urllib.parse import quote
+
+from werkzeug.security import safe_join
+from werkzeug.utils import secure_filename
+
+from config import Config
+
+OBJECTS_DIR = "objects"
+_TMP_DIR = "tmp"
+CHUNK_SIZE = 64 * 1024
+MAX_EXTENSION = 10
+
+# Версия в URL файла (?v=) — префикс SHA-256; такой URL кэшируется браузером «навсегда»
+VERSION_LENGTH = 16
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+# Разделы старой раскладки: папка внутри UPLOAD_ROOT
+JOB_THUMBS = "job_thumbs"
+JOB_HOUSING = "job_housing"
+CANDIDATE_DOCS = "candidate_docs"
+PARTNER_DOCS = "partner_docs"
+PAYMENTS = "payments"
+
+
+class StoredFile(NamedTuple):
+    path: str       # относительно UPLOAD_ROOT, пишется в базу
+    sha256: str
+    size: int
+    created: bool   # False — такой файл уже был в хранилище
+
+
+def upload_root() -> str:
+    return Config.UPLOAD_ROOT
+
+
+def is_stored(value: str | None) -> bool:
+    """Значение колонки — путь в хранилище (а не имя файла старой раскладки)."""
+    return bool(value) and value.startswith(OBJECTS_DIR + "/")
+
+
+def extension(filename: str | None) -> str:
+    """Расширение для пути в хранилище: «.pdf», «.jpg» или пусто."""
+    ext = os.path.splitext(secure_filename(filename or ""))[1].lower()
+    return ext if 1 < len(ext) <= MAX_EXTENSION else ""
+
+
+def save_stream(stream, ext: str = "") -> StoredFile:
+    """Записать поток в хранилище по SHA-256 содержимого."""
+    root = upload_root()
+    tmp_dir = os.path.join(root, _TMP_DIR)
+    os.makedirs(tmp_dir, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                size += len(chunk)
+                out.write(chunk)
+        sha = digest.hexdigest()
+        rel_path = f"{OBJECTS_DIR}/{sha[:2]}/{sha[2:4]}/{sha}{ext}"
+        dest = os.path.join(root, rel_path)
+        if os.path.exists(dest):
+            os.unlink(tmp_path)
+            return StoredFile(rel_path, sha, size, False)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        # Атомарно: параллельная загрузка того же файла просто перезапишет его тем же содержимым
+        os.replace(tmp_path, dest)
+        return StoredFile(rel_path, sha, size, True)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def save_upload(file) -> StoredFile | None:
+    """Сохранить загруженный файл (werkzeug FileStorage); None, если файл не выбран."""
+    if not file or not file.filename:
+        return None
+    return save_stream(file.stream, extension(file.filename))
+
+
+def path_of(rel_path: str) -> str | None:
+    """Абсолютный путь файла из базы; None, если путь выходит за UPLOAD_ROOT."""
+    return safe_join(upload_root(), rel_path)
+
+
+def display_name(filename: str | None) -> str:
+    """Имя файла для показа и сохранения пользователем: исходное имя без пути и управляющих символов.
+
+    Кириллица сохраняется (secure_filename её бы выбросил) — Content-Disposition
+    werkzeug кодирует сам.
+    """
+    name = (filename or "").replace("\\", "/").rsplit("/", 1)[-1]
+    name = "".join(ch for ch in name if ch.isprintable()).strip()[:200]
+    return name or "file"
+
+
+# =====================
+#   СТАРАЯ РАСКЛАДКА
+# =====================
+
+def locate_legacy(section: str, filename: str | None, owner_id: int | None = None) -> str | None:
+    """Найти файл старой раскладки: путь относительно UPLOAD_ROOT или None.
+
+    Повторяет прежний поиск обработчиков: имя как записано в базе, затем в
+    подпапке владельца (<owner_id>/<имя>), для документов кандидата — единственный
+    файл в папке кандидата. Нужен только до `flask migrate-uploads`.
+    """
+    root = upload_root()
+    options = []
+    if filename:
+        options.append(f"{section}/{filename}")
+        if owner_id is not None and "/" not in filename and os.sep not in filename:
+            options.append(f"{section}/{owner_id}/{filename}")
+    for rel_path in options:
+        path = safe_join(root, rel_path)
+        if path and os.path.isfile(path):
+            return rel_path
+    if section == CANDIDATE_DOCS and owner_id is not None:
+        owner_dir = safe_join(root, section, str(owner_id))
+        try:
+            files = [f for f in os.listdir(owner_dir) if os.path.isfile(os.path.join(owner_dir, f))]
+        except (OSError, TypeError):
+            return None
+        if len(files) == 1:
+            return f"{section}/{owner_id}/{files[0]}"
+    return None
+
+
+def import_legacy(rel_path: str) -> StoredFile:
+    """Скопировать файл старой раскладки в хранилище (оригинал остаётся на месте)."""
+    path = path_of(rel_path)
+    with open(path, "rb") as f:
+        stored = save_stream(f, extension(rel_path))
+    if stored.created:
+        shutil.copystat(path, path_of(stored.path))
+    return stored
+
+
+# =====================
+#   ОТДАЧА
+# =====================
+
+def resolve(value: str | None, section: str, owner_id: int | None = None) -> str | None:
+    """Путь файла из колонки базы: путь хранилища как есть, имя старой раскладки — через поиск."""
+    if is_stored(value):
+        return value
+    return locate_legacy(section, value, owner_id)
+
+
+PYTHON, X_ACCEL, X_SENDFILE = "python", "x-accel", "x-sendfile"
+DELIVERY_MODES = (PYTHON, X_ACCEL, X_SENDFILE)
+
+
+def delivery_mode() -> str:
+    """Режим отдачи из Config.FILE_DELIVERY; неизвестное значение — отдача самим Python."""
+    from flask import current_app
+
+    mode = current_app.config.get("FILE_DELIVERY", Config.FILE_DELIVERY)
+    return mode if mode in DELIVERY_MODES else PYTHON
+
+
+def accel_uri(rel_path: str) -> str:
+    """Внутренний URI nginx для X-Accel-Redirect: префикс + путь в UPLOAD_ROOT (URL-кодированный)."""
+    from flask import current_app
+
+    prefix = current_app.config.get("FILE_ACCEL_PREFIX", Config.FILE_ACCEL_PREFIX) or "/"
+    return prefix.rstrip("/") + "/" + quote(posixpath.normpath(rel_path).lstrip("/"))
+
+
+def content_hash(rel_path: str | None) -> str | None:
+    """SHA-256 содержимого из пути хранилища (имя объекта); None для старой раскладки."""
+    if not is_stored(rel_path):
+        return None
+    sha = posixpath.splitext(posixpath.basename(rel_path))[0]
+    return sha if len(sha) == 64 else None
+
+
+def version_of(value: str | None) -> str | None:
+    """Версия файла для URL (?v=...): префикс хеша содержимого; None — без версии."""
+    sha = content_hash(value)
+    return sha[:VERSION_LENGTH] if sha else None
+
+
+def not_modified():
+    """304 на версионированный URL, если у клиента уже есть эта версия (без обращения к базе).
+
+    Содержимое по адресу с ?v=<префикс хеша> не меняется, поэтому ETag клиента,
+    начинающийся с этой версии, подтверждает файл без поиска строки в базе.
+    Возвращает ответ 304 или None — тогда файл отдаётся как обычно.
+    """
+    from flask import current_app, request
+
+    version = request.args.get("v", "")
+    if len(version) != VERSION_LENGTH or request.method not in ("GET", "HEAD"):
+        return None
+    etag = next((tag for tag in request.if_none_match if len(tag) == 64 and tag.startswith(version)), None)
+    if etag is None:
+        return None
+    response = current_app.response_class(status=304)
+    response.set_etag(etag)
+    _set_cache_control(response, immutable=True)
+    return response
+
+
+def _set_cache_control(response, immutable: bool) -> None:
+    # Файлы доступны только после входа — в общие кэши (прокси, CDN) не попадают
+    cache = response.cache_control
+    cache.public = None
+    cache.private = True
+    if immutable:
+        cache.no_cache = None
+        cache.max_age = IMMUTABLE_MAX_AGE
+        cache.immutable = True
+        # Срок задаёт max-age; Expires убираем (response.expires = None выставил бы текущее время)
+        response.headers.pop("Expires", None)
+    else:
+        # Браузер хранит копию, но перед показом сверяет ETag (дешёвый 304)
+        cache.no_cache = True
+        cache.max_age = 0
+
+
+def send_stored(rel_path: str, download_name: str | None = None):
+    """Ответ с файлом из UPLOAD_ROOT (404, если файла нет).
+
+    Вызывается после проверки прав. ETag — хеш содержимого (для старой
+    раскладки — по mtime и размеру), Last-Modified — mtime файла; условные
+    запросы получают 304, Range — 206. Если URL несёт актуальную версию
+    файла (?v=, см. version_of), ответ кэшируется как immutable.
+
+    В режимах x-accel / x-sendfile ответ уходит без тела: файл передаёт
+    прокси, воркер сразу свободен. 304 по-прежнему отвечает Flask, Range
+    обрабатывает прокси.
+    """
+    from flask import current_app, request
+    from werkzeug.utils import send_from_directory
+
+    mode = delivery_mode()
+    offload = mode != PYTHON
+    response = send_from_directory(
+        os.path.abspath(upload_root()),
+        rel_path,
+        environ=request.environ,
+        download_name=download_name,
+        etag=content_hash(rel_path) or True,
+        use_x_sendfile=offload,
+        conditional=not offload,
+        max_age=current_app.get_send_file_max_age,
+        response_class=current_app.response_class,
+    )
+    version = request.args.get("v")
+    _set_cache_control(response, immutable=bool(version) and version == version_of(rel_path))
+    if offload:
+        # Без accept_ranges: Range отдаёт прокси, здесь только If-None-Match / If-Modified-Since
+        response.make_conditional(request.environ)
+        if response.status_code == 304:
+            del response.headers["X-Sendfile"]
+            return response
+    if mode == X_ACCEL:
+        # nginx берёт тело и длину из файла, а Content-Type/Content-Disposition — из нашего ответа
+        del response.headers["X-Sendfile"]
+        response.headers["X-Accel-Redirect"] = accel_uri(rel_path)
+        response.content_length = 0
+    return response
+
+
+# =====================
+#   ПЕРЕНОС СТАРЫХ ФАЙЛОВ
+# =====================
+
+def migrate_legacy() -> dict[str, tuple[int, int]]:
+    """Перенести файлы старой раскладки в хранилище и записать пути в базу (без коммита).
+
+    Возвращает {раздел: (перенесено записей, файлов не найдено)}. Записи без
+    файла на диске остаются как были.
+    """
+    from models import CandidateDoc, Job, JobHousingPhoto, PartnerDoc, Placement, db
+
+    imported: dict[str, str] = {}
+
+    def store(section, value, owner_id=None):
+        rel_path = locate_legacy(section, value, owner_id)
+        if rel_path is None:
+            return None
+        if rel_path not in imported:
+            imported[rel_path] = import_legacy(rel_path).path
+        return imported[rel_path]
+
+    def not_stored(column):
+        return (column != "") & column.isnot(None) & ~column.like(f"{OBJECTS_DIR}/%")
+
+    sections = (
+        (JOB_THUMBS, db.session.query(Job).filter(not_stored(Job.thumbnail_image)),
+         lambda o: (o.thumbnail_image, o.id), lambda o, p: setattr(o, "thumbnail_image", p)),
+        (JOB_HOUSING, db.session.query(JobHousingPhoto).filter(not_stored(JobHousingPhoto.filename)),
+         lambda o: (o.filename, o.job_id), lambda o, p: setattr(o, "filename", p)),
+        (CANDIDATE_DOCS, db.session.query(CandidateDoc).filter((CandidateDoc.storage_path == "") | CandidateDoc.storage_path.is_(None)),
+         lambda o: (o.filename, o.candidate_id), lambda o, p: setattr(o, "storage_path", p)),
+        (PARTNER_DOCS, db.session.query(PartnerDoc).filter((PartnerDoc.storage_path == "") | PartnerDoc.storage_path.is_(None)),
+         lambda o: (o.filename, o.partner_id), lambda o, p: setattr(o, "storage_path", p)),
+        (PAYMENTS, db.session.query(Placement).filter(not_stored(Placement.partner_payment_file)),
+         lambda o: (o.partner_payment_file, None), lambda o, p: setattr(o, "partner_payment_file", p)),
+    )
+    stats = {}
+    for section, query, get, set_path in sections:
+        moved = missing = 0
+        for obj in query.all():
+            value, owner_id = get(obj)
+            path = store(section, value, owner_id)
+            if path is None:
+                missing += 1
+                continue
+            set_path(obj, path)
+            moved += 1
+        db.session.flush()
+        stats[section] = (moved, missing)
+    return stats
+
+
+# =====================
+#   BENCHMARK
+# =====================
+
+def benchmark(size_mb: int = 50, requests: int = 20) -> None:
+    """Сколько байт и времени файл держит воркер в каждом режиме отдачи.
+
+    Тело ответа вычитывается целиком, как это делает gunicorn: в режиме python
+    воркер занят, пока клиент не скачает файл, в x-accel / x-sendfile — только
+    на проверку и заголовки.
+    """
+    import time
+
+    from flask import Flask
+    from werkzeug.test import EnvironBuilder, run_wsgi_app
+
+    with tempfile.TemporaryDirectory() as tmp:
+        Config.UPLOAD_ROOT = tmp
+        chunk = os.urandom(1024 * 1024)
+        stored = save_stream(_Repeat(chunk, size_mb), ".pdf")
+
+        app = Flask(__name__)
+        app.add_url_rule("/file", "file", lambda: send_stored(stored.path, download_name="скан паспорта.pdf"))
+        for mode in DELIVERY_MODES:
+            app.config["FILE_DELIVERY"] = mode
+            started = time.perf_counter()
+            sent = 0
+            for _ in range(requests):
+                app_iter, status, headers = run_wsgi_app(app, EnvironBuilder(path="/file").get_environ())
+                sent += sum(len(part) for part in app_iter)
+                getattr(app_iter, "close", lambda: None)()
+            elapsed = (time.perf_counter() - started) / requests
+            per_request = sent / requests / 2**20
+            print(f"{mode:<10} {status}: {elapsed * 1000:6.2f} мс, через воркер {per_request:5.1f} МБ, "
+                  f"при клиенте 1 МБ/с воркер занят {per_request + elapsed:5.1f} с")
+            for name in ("Content-Type", "Content-Length", "X-Accel-Redirect", "X-Sendfile"):
+                if name in headers:
+                    print(f"    {name}: {headers[name]}")
+
+
+class _Repeat:
+    """Поток из count повторов блока (файл для бенчмарка без лишней памяти)."""
+
+    def __init__(self, block: bytes, count: int):
+        self.block, self.count = block, count
+
+    def read(self, _size=-1) -> bytes:
+        if not self.count:
+            return b""
+        self.count -= 1
+        return self.block
+
+
+if __name__ == "__main__":
+    import sys
+
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 50)
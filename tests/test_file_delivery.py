@@ -0,0 +1,175 @@
+"""Отдача файлов через прокси (Config.FILE_DELIVERY, storage.send_stored).
+
+В режимах x-accel / x-sendfile воркер не передаёт байты файла: ответ без
+тела с заголовком для прокси. Права проверяются до этого — на отказ
+заголовок прокси не выставляется.
+"""
+import io
+import os
+from datetime import date
+
+import pytest
+from werkzeug.security import safe_join
+
+import storage
+from models import Candidate, CandidateDoc, Job, Placement, User, db
+
+OFFLOAD_HEADERS = ("X-Accel-Redirect", "X-Sendfile")
+
+
+@pytest.fixture(scope="module")
+def files(app):
+    """Пользователи, вакансия с обложкой, кандидат с документом и выплата с подтверждением."""
+    with app.app_context():
+        users = {
+            role: User(name=role, email=f"{role}@delivery.test", password_hash="", role=role)
+            for role in ("partner", "other_partner", "recruiter", "coordinator")
+        }
+        users["other_partner"].role = "partner"
+        db.session.add_all(users.values())
+        db.session.flush()
+
+        thumb = storage.save_stream(io.BytesIO(b"PNG-thumb"), ".png")
+        doc = storage.save_stream(io.BytesIO(b"%PDF-candidate-doc"), ".pdf")
+        payment = storage.save_stream(io.BytesIO(b"%PDF-payment"), ".pdf")
+
+        job = Job(title="Склад", location="Wrocław", thumbnail_image=thumb.path)
+        deleted_job = Job(title="Удалённая", location="Łódź", status="deleted", thumbnail_image=thumb.path)
+        db.session.add_all([job, deleted_job])
+        db.session.flush()
+        cand = Candidate(job_id=job.id, submitter_id=users["partner"].id, full_name="Иван Петров")
+        db.session.add(cand)
+        db.session.flush()
+        cand_doc = CandidateDoc(candidate_id=cand.id, filename="паспорт.pdf", storage_path=doc.path)
+        placement = Placement(candidate_id=cand.id, job_id=job.id, recruiter_id=users["recruiter"].id,
+                              start_date=date(2025, 1, 10), partner_payment_file=payment.path)
+        db.session.add_all([cand_doc, placement])
+        db.session.commit()
+        result = {
+            "users": {role: u.id for role, u in users.items()},
+            "urls": {
+                "job_thumb": (f"/job-thumb/{job.id}", thumb.path, b"PNG-thumb"),
+                "candidate_doc": (f"/candidate-doc/{cand_doc.id}", doc.path, b"%PDF-candidate-doc"),
+                "finance_payment_file": (f"/finance/payment-file/{placement.id}", payment.path, b"%PDF-payment"),
+            },
+            "deleted_thumb": f"/job-thumb/{deleted_job.id}",
+        }
+        db.session.remove()
+    return result
+
+
+@pytest.fixture
+def delivery(app):
+    """delivery(mode) — переключить режим отдачи на время теста."""
+    def set_mode(mode):
+        app.config["FILE_DELIVERY"] = mode
+    yield set_mode
+    app.config["FILE_DELIVERY"] = storage.PYTHON
+
+
+ROUTES = ("job_thumb", "candidate_doc", "finance_payment_file")
+
+
+@pytest.mark.parametrize("route", ROUTES)
+def test_python_mode_streams_file(files, login, delivery, route):
+    delivery(storage.PYTHON)
+    url, _rel_path, body = files["urls"][route]
+    r = login(files["users"]["coordinator"]).get(url)
+    assert r.status_code == 200
+    assert r.get_data() == body
+    assert not any(name in r.headers for name in OFFLOAD_HEADERS)
+
+
+@pytest.mark.parametrize("route", ROUTES)
+def test_x_accel_mode_hands_file_to_proxy(app, files, login, delivery, route):
+    delivery(storage.X_ACCEL)
+    url, rel_path, _body = files["urls"][route]
+    r = login(files["users"]["coordinator"]).get(url)
+    assert r.status_code == 200
+    assert r.get_data() == b""
+    assert r.headers["Content-Length"] == "0"
+    assert "X-Sendfile" not in r.headers
+    prefix = app.config["FILE_ACCEL_PREFIX"].rstrip("/")
+    assert r.headers["X-Accel-Redirect"] == f"{prefix}/{rel_path}"
+
+
+@pytest.mark.parametrize("route", ROUTES)
+def test_x_sendfile_mode_hands_file_to_proxy(files, login, delivery, route):
+    delivery(storage.X_SENDFILE)
+    url, rel_path, _body = files["urls"][route]
+    r = login(files["users"]["coordinator"]).get(url)
+    assert r.status_code == 200
+    assert r.get_data() == b""
+    assert "X-Accel-Redirect" not in r.headers
+    assert r.headers["X-Sendfile"] == safe_join(os.path.abspath(storage.upload_root()), rel_path)
+    assert os.path.isfile(r.headers["X-Sendfile"])
+
+
+def test_download_name_kept_for_proxy(files, login, delivery):
+    delivery(storage.X_ACCEL)
+    url, _rel_path, _body = files["urls"]["candidate_doc"]
+    r = login(files["users"]["partner"]).get(url)
+    assert "filename*=UTF-8''%D0%BF%D0%B0%D1%81%D0%BF%D0%BE%D1%80%D1%82.pdf" in r.headers["Content-Disposition"]
+    assert r.headers["Content-Type"] == "application/pdf"
+
+
+@pytest.mark.parametrize("mode", storage.DELIVERY_MODES)
+@pytest.mark.parametrize("route", ("candidate_doc", "finance_payment_file"))
+def test_permission_denied_before_offload(files, login, delivery, mode, route):
+    delivery(mode)
+    url, _rel_path, body = files["urls"][route]
+    r = login(files["users"]["other_partner"]).get(url)
+    assert r.status_code == 403
+    assert not any(name in r.headers for name in OFFLOAD_HEADERS)
+    assert body not in r.get_data()
+
+
+@pytest.mark.parametrize("mode", storage.DELIVERY_MODES)
+def test_deleted_job_thumb_is_404_before_offload(files, login, delivery, mode):
+    delivery(mode)
+    r = login(files["users"]["coordinator"]).get(files["deleted_thumb"])
+    assert r.status_code == 404
+    assert not any(name in r.headers for name in OFFLOAD_HEADERS)
+
+
+@pytest.mark.parametrize("mode", storage.DELIVERY_MODES)
+def test_anonymous_redirected_before_offload(app, files, delivery, mode):
+    delivery(mode)
+    url, _rel_path, _body = files["urls"]["candidate_doc"]
+    r = app.test_client().get(url)
+    assert r.status_code == 302
+    assert not any(name in r.headers for name in OFFLOAD_HEADERS)
+
+
+def test_unknown_mode_falls_back_to_python(files, login, delivery):
+    delivery("nginx-please")
+    url, _rel_path, body = files["urls"]["finance_payment_file"]
+    assert login(files["users"]["coordinator"]).get(url).get_data() == body
+
+
+@pytest.mark.parametrize("mode", storage.DELIVERY_MODES)
+def test_versioned_url_is_immutable_without_expires(files, login, delivery, mode):
+    delivery(mode)
+    url, rel_path, _body = files["urls"]["job_thumb"]
+    client = login(files["users"]["coordinator"])
+    r = client.get(f"{url}?v={storage.version_of(rel_path)}")
+    assert r.status_code == 200
+    assert r.cache_control.immutable
+    assert r.cache_control.max_age == storage.IMMUTABLE_MAX_AGE
+    assert "Expires" not in r.headers
+
+    r304 = client.get(f"{url}?v={storage.version_of(rel_path)}", headers={"If-None-Match": r.headers["ETag"]})
+    assert r304.status_code == 304
+    assert r304.get_data() == b""
+    assert r304.cache_control.immutable
+    assert r304.cache_control.max_age == storage.IMMUTABLE_MAX_AGE
+    assert "Expires" not in r304.headers
+    assert not any(name in r304.headers for name in OFFLOAD_HEADERS)
+
+
+def test_unversioned_url_is_revalidated(files, login, delivery):
+    delivery(storage.PYTHON)
+    url, _rel_path, _body = files["urls"]["job_thumb"]
+    r = login(files["users"]["coordinator"]).get(url)
+    assert r.cache_control.no_cache
+    assert not r.cache_control.immutable
@@ -0,0 +1,56 @@
+"""Выплата партнёру за период (finance.finance_partner_payment): дата as_of в любом формате ISO."""
+from datetime import date
+
+import pytest
+
+from models import Candidate, Job, Placement, User, db
+
+
+@pytest.fixture(scope="module")
+def users_and_placements(app):
+    """Партнёр с двумя неоплаченными выходами: один к выплате с 2026-10-01, другой — с 2026-11-10."""
+    with app.app_context():
+        partner = User(name="partner", email="partner@payment.test", password_hash="", role="partner",
+                       settlement_day=0)
+        coordinator = User(name="coordinator", email="coordinator@payment.test", password_hash="",
+                           role="coordinator")
+        job = Job(title="Выплаты", location="Kraków")
+        db.session.add_all([partner, coordinator, job])
+        db.session.flush()
+        result = {"partner": partner.id, "coordinator": coordinator.id}
+        for key, payable_from in (("due", date(2026, 10, 1)), ("not_due", date(2026, 11, 10))):
+            cand = Candidate(job_id=job.id, submitter_id=partner.id, full_name=f"Кандидат {key}")
+            db.session.add(cand)
+            db.session.flush()
+            pl = Placement(candidate_id=cand.id, job_id=job.id, recruiter_id=coordinator.id,
+                           start_date=date(2026, 9, 1), payable_from=payable_from, amount_effective=100)
+            db.session.add(pl)
+            db.session.flush()
+            result[key] = pl.id
+        db.session.commit()
+        db.session.remove()
+    return result
+
+
+@pytest.fixture
+def placements(app, users_and_placements):
+    """Те же выходы, снова неоплаченные перед каждым тестом."""
+    with app.app_context():
+        db.session.query(Placement).filter(
+            Placement.id.in_([users_and_placements["due"], users_and_placements["not_due"]])
+        ).update({"partner_paid": False, "partner_paid_at": None})
+        db.session.commit()
+        db.session.remove()
+    return users_and_placements
+
+
+@pytest.mark.parametrize("as_of", ["2026-10-17", "20261017"])
+def test_only_due_placements_are_marked_paid(app, login, placements, as_of):
+    client = login(placements["coordinator"])
+    r = client.post(f"/finance/payments/partner/{placements['partner']}?as_of={as_of}")
+    assert r.status_code == 302
+    assert "as_of=2026-10-17" in r.headers["Location"]
+    with app.app_context():
+        assert db.session.get(Placement, placements["due"]).partner_paid
+        assert not db.session.get(Placement, placements["not_due"]).partner_paid
+        db.session.remove()
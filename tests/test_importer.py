@@ -0,0 +1,199 @@
+"""Загрузка кандидатов списком (importer.py): чтение CSV / XLSX, проверка строк и отчёт об ошибках."""
+import io
+import zipfile
+from datetime import datetime
+from xml.sax.saxutils import escape
+
+import pytest
+
+import importer
+from importer import ImportFileError, import_candidates, read_rows
+from models import Candidate, CandidateProfile, Job, Notification, User, db
+
+HEADER = ["ФИО", "Телефон", "Пол", "Возраст", "Водительские права", "Планируемый приезд", "ID вакансии"]
+
+
+@pytest.fixture(scope="module")
+def refs(app):
+    """Партнёр с закреплённым рекрутёром, вакансия «только мужчины до 40 лет» и закрытая вакансия."""
+    with app.app_context():
+        recruiter = User(name="recruiter", email="recruiter@import.test", password_hash="", role="recruiter")
+        db.session.add(recruiter)
+        db.session.flush()
+        partner = User(name="Партнёр Импорт", email="partner@import.test", password_hash="", role="partner",
+                       assigned_recruiter_id=recruiter.id)
+        job = Job(title="Склад", location="Łódź", gender_preference="male", age_to=40)
+        closed = Job(title="Закрыта", location="Łódź", status="closed")
+        db.session.add_all([partner, job, closed])
+        db.session.commit()
+        result = {"recruiter": recruiter.id, "partner": partner.id, "job": job.id, "closed": closed.id}
+        db.session.remove()
+    return result
+
+
+@pytest.fixture
+def session(app):
+    """Контекст приложения; загрузка не коммитится и откатывается после теста."""
+    with app.app_context():
+        yield db.session
+        db.session.rollback()
+        db.session.remove()
+
+
+def _csv(lines, delimiter=",", encoding="utf-8"):
+    return io.BytesIO("\n".join(delimiter.join(line) for line in lines).encode(encoding))
+
+
+def _xlsx(lines):
+    """Минимальная книга: строки через sharedStrings, числа — как числа (как сохраняет Excel)."""
+    strings, rows = [], []
+    for r, line in enumerate(lines, start=1):
+        cells = []
+        for c, value in enumerate(line):
+            ref = f"{chr(65 + c)}{r}"
+            if isinstance(value, (int, float)):
+                cells.append(f'<c r="{ref}"><v>{value}</v></c>')
+            elif value != "":
+                strings.append(value)
+                cells.append(f'<c r="{ref}" t="s"><v>{len(strings) - 1}</v></c>')
+        rows.append(f'<row r="{r}">{"".join(cells)}</row>')
+    ns = 'xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+    rel_ns = 'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"'
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        zf.writestr("xl/workbook.xml", f'<workbook {ns} {rel_ns}><sheets>'
+                                       f'<sheet name="Лист1" sheetId="1" r:id="rId1"/></sheets></workbook>')
+        zf.writestr("xl/_rels/workbook.xml.rels",
+                    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+                    '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+                    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+                    '</Relationships>')
+        zf.writestr("xl/sharedStrings.xml",
+                    f'<sst {ns}>' + "".join(f"<si><t>{escape(s)}</t></si>" for s in strings) + "</sst>")
+        zf.writestr("xl/worksheets/sheet1.xml", f'<worksheet {ns}><sheetData>{"".join(rows)}</sheetData></worksheet>')
+    buf.seek(0)
+    return buf
+
+
+def _import(refs, stream, filename, job_id=None, actor_id=None):
+    return import_candidates(read_rows(stream, filename), refs["partner"], job_id, actor_id=actor_id)
+
+
+def test_row_errors_are_reported_and_valid_rows_imported(refs, session):
+    job, closed = str(refs["job"]), str(refs["closed"])
+    lines = [
+        HEADER,
+        ["Иван Годный", "+48 600 000 001", "м", "30", "да", "05.11.2026", job],
+        ["", "+48 600 000 002", "м", "30", "", "", job],
+        ["Олег Закрытый", "", "м", "30", "", "", closed],
+        ["Мария Женщина", "", "ж", "30", "", "", job],
+        ["Пётр Старший", "", "м", "41", "", "", job],
+        ["Пётр Юный", "", "м", "12", "", "", job],
+        ["Павел Дата", "", "м", "30", "", "31.02.2026", job],
+        ["Павел Права", "", "м", "30", "может быть", "", job],
+        ["Павел Возраст", "", "м", "тридцать", "", "", job],
+        ["Павел Пол", "", "x", "30", "", "", job],
+        ["", "", "", "", "", "", ""],
+        ["Степан Годный", "600000011", "M", "", "нет", "2026-11-05", job],
+    ]
+    result = _import(refs, _csv(lines), "list.csv")
+
+    assert result.imported == 2
+    assert result.skipped == 9
+    errors = dict(result.errors)
+    assert errors[3] == "не заполнено ФИО"
+    assert errors[4] == f"вакансия #{closed} не найдена или закрыта"
+    assert errors[5] == "вакансия «Склад» только для: мужчин"
+    assert errors[6] == "вакансия «Склад» до 40 лет, возраст 41"
+    assert errors[7].startswith("возраст вне диапазона")
+    assert errors[8].startswith("дата не распознана: «31.02.2026»")
+    assert errors[9] == "ожидается да/нет: «может быть»"
+    assert errors[10] == "не число: «тридцать»"
+    assert errors[11].startswith("пол не распознан: «x»")
+    assert 12 not in errors
+
+    imported = {c.full_name: c for c in session.query(Candidate).filter(Candidate.id.in_(result.candidate_ids))}
+    assert set(imported) == {"Иван Годный", "Степан Годный"}
+    ivan = imported["Иван Годный"]
+    assert (ivan.submitter_id, ivan.job_id, ivan.status, ivan.gender) == (refs["partner"], refs["job"], "Подан", "male")
+    profile = session.query(CandidateProfile).filter_by(candidate_id=ivan.id).one()
+    assert profile.has_driver_license and profile.age == 30
+    assert profile.planned_arrival == datetime(2026, 11, 5)
+
+
+@pytest.mark.parametrize("delimiter", [",", ";", "\t"])
+@pytest.mark.parametrize("encoding", ["utf-8", "utf-8-sig", "cp1251"])
+def test_csv_encoding_and_delimiter_are_detected(refs, session, delimiter, encoding):
+    lines = [["ФИО", "Пол", "Опыт работы"], ["Иван Кодировкин", "м", "склад, погрузчик"]]
+    if delimiter == ",":
+        lines[1][2] = '"склад, погрузчик"'
+    result = _import(refs, _csv(lines, delimiter, encoding), "list.csv", job_id=refs["job"])
+    assert (result.imported, result.errors) == (1, [])
+    cid = result.candidate_ids[0]
+    assert session.get(Candidate, cid).full_name == "Иван Кодировкин"
+    assert session.query(CandidateProfile).filter_by(candidate_id=cid).one().work_experience == "склад, погрузчик"
+
+
+def test_xlsx_shared_strings_numbers_and_excel_dates(refs, session):
+    lines = [
+        HEADER,
+        ["Иван Эксель", 48600000021, "м", 30, "да", 46331, refs["job"]],
+        ["Олег Эксель", "", "м", 55, "", "", refs["job"]],
+    ]
+    result = _import(refs, _xlsx(lines), "list.xlsx")
+    assert result.imported == 1
+    assert result.errors == [(3, "вакансия «Склад» до 40 лет, возраст 55")]
+    cand = session.get(Candidate, result.candidate_ids[0])
+    assert (cand.full_name, cand.phone, cand.job_id) == ("Иван Эксель", "48600000021", refs["job"])
+    profile = session.query(CandidateProfile).filter_by(candidate_id=cand.id).one()
+    assert profile.age == 30 and profile.has_driver_license
+    assert profile.planned_arrival == datetime(2026, 11, 5)
+
+
+def test_whole_file_errors(refs, session):
+    with pytest.raises(ImportFileError, match="Поддерживаются файлы"):
+        read_rows(io.BytesIO(b""), "list.pdf")
+    with pytest.raises(ImportFileError, match="Excel"):
+        list(read_rows(io.BytesIO(b"not a zip"), "list.xlsx"))
+    with pytest.raises(ImportFileError, match="Файл пустой"):
+        _import(refs, io.BytesIO(b""), "list.csv", job_id=refs["job"])
+    with pytest.raises(ImportFileError, match="Нет колонок: gender"):
+        _import(refs, _csv([["ФИО"], ["Иван"]]), "list.csv", job_id=refs["job"])
+    with pytest.raises(ImportFileError, match="Нет колонок: job_id"):
+        _import(refs, _csv([["ФИО", "Пол"], ["Иван", "м"]]), "list.csv")
+    with pytest.raises(ImportFileError, match=f"Вакансия #{refs['closed']}"):
+        _import(refs, _csv([["ФИО", "Пол"], ["Иван", "м"]]), "list.csv", job_id=refs["closed"])
+
+
+def test_max_rows_limit(refs, session, monkeypatch):
+    monkeypatch.setattr(importer, "MAX_ROWS", 3)
+    lines = [["ФИО", "Пол"]] + [[f"Иван Лимит {n}", "м"] for n in range(3)]
+    assert _import(refs, _csv(lines), "list.csv", job_id=refs["job"]).imported == 3
+    session.rollback()
+    lines.append(["Иван Лимит 3", "м"])
+    with pytest.raises(ImportFileError, match="Больше 3 строк"):
+        _import(refs, _csv(lines), "list.csv", job_id=refs["job"])
+
+
+def _notifications(session, refs):
+    return session.query(Notification).filter_by(user_id=refs["recruiter"]).all()
+
+
+def test_assigned_recruiter_gets_one_summary_notification(refs, session):
+    lines = [["ФИО", "Телефон", "Пол"], ["Иван Сводка", "+48 600 000 031", "м"],
+             ["Иван Сводка Дубль", "600000031", "м"], ["Олег Сводка", "", "м"]]
+    result = _import(refs, _csv(lines), "list.csv", job_id=refs["job"], actor_id=refs["partner"])
+    assert (result.imported, result.duplicates) == (3, 1)
+    assert result.warnings == [(3, "возможный дубль: совпадает телефон со строкой 2")]
+    first, dupe, _other = result.candidate_ids
+    assert session.get(Candidate, dupe).duplicate_of_id == first
+    notes = _notifications(session, refs)
+    assert [n.message for n in notes] == [
+        "Партнёр Партнёр Импорт загрузил списком кандидатов: 3, из них возможных дублей по телефону: 1"
+    ]
+
+
+def test_recruiter_is_not_notified_about_own_upload(refs, session):
+    lines = [["ФИО", "Пол"], ["Иван Сам", "м"]]
+    _import(refs, _csv(lines), "list.csv", job_id=refs["job"], actor_id=refs["recruiter"])
+    assert _notifications(session, refs) == []
@@ -0,0 +1,105 @@
+"""kpi_monthly после обработчиков (kpi_snapshot / kpi_apply) совпадает с полной пересборкой.
+
+Дашборд руководства читает только kpi_monthly, поэтому пропущенный хук в
+любом обработчике тихо искажает цифры. Тест проходит по всем путям, которые
+меняют кандидатов и трудоустройства, и сравнивает таблицу с KPI_MONTHLY_REBUILD.
+"""
+import io
+
+import pytest
+from sqlalchemy import text
+
+from models import KPI_MONTHLY_REBUILD, Candidate, Job, User, db
+
+KPI_COLUMNS = ("ym", "recruiter_id", "partner_id", "job_id", "submissions", "starts",
+               "partner_commission", "recruiter_commission", "last_submission_at")
+
+
+@pytest.fixture(scope="module")
+def refs(app):
+    """Партнёр (с закреплённым рекрутёром), рекрутёр, координатор и две вакансии."""
+    with app.app_context():
+        recruiter = User(name="recruiter", email="recruiter@kpi.test", password_hash="", role="recruiter")
+        coordinator = User(name="coordinator", email="coordinator@kpi.test", password_hash="", role="coordinator")
+        db.session.add_all([recruiter, coordinator])
+        db.session.flush()
+        partner = User(name="partner", email="partner@kpi.test", password_hash="", role="partner",
+                       assigned_recruiter_id=recruiter.id)
+        jobs = [Job(title="KPI склад", location="Opole", partner_fee_amount=500),
+                Job(title="KPI завод", location="Opole", partner_fee_amount=800, promo_multiplier=1.5)]
+        db.session.add_all([partner, *jobs])
+        db.session.commit()
+        result = {"partner": partner.id, "recruiter": recruiter.id, "coordinator": coordinator.id,
+                  "jobs": [j.id for j in jobs]}
+        db.session.remove()
+    return result
+
+
+def _kpi_rows(partner_id):
+    rows = db.session.execute(
+        text(f"SELECT {', '.join(KPI_COLUMNS)} FROM kpi_monthly WHERE partner_id = :pid"),
+        {"pid": partner_id},
+    ).all()
+    return sorted(tuple(round(v, 2) if isinstance(v, float) else v for v in row) for row in rows)
+
+
+def _rebuilt_rows(partner_id):
+    """Строки партнёра после KPI_MONTHLY_REBUILD; сама таблица не меняется (откат)."""
+    try:
+        for stmt in KPI_MONTHLY_REBUILD:
+            db.session.execute(text(stmt))
+        return _kpi_rows(partner_id)
+    finally:
+        db.session.rollback()
+
+
+def _candidate_ids(partner_id):
+    return [cid for (cid,) in db.session.query(Candidate.id).filter(Candidate.submitter_id == partner_id)
+            .order_by(Candidate.id)]
+
+
+def test_kpi_rollups_match_full_rebuild(app, login, refs):
+    partner, recruiter, coordinator = (login(refs[k]) for k in ("partner", "recruiter", "coordinator"))
+    job_a, job_b = refs["jobs"]
+
+    # Подачи через форму
+    for n, (job_id, gender) in enumerate([(job_a, "male"), (job_a, "female"), (job_b, "male"), (job_b, "male")]):
+        r = partner.post(f"/jobs/{job_id}/submit",
+                         data={"full_name": f"KPI Кандидат {n}", "phone": f"+48 700 100 {n:03d}",
+                               "candidate_gender": gender})
+        assert r.status_code == 302
+    with app.app_context():
+        a, b, c, d = _candidate_ids(refs["partner"])
+        db.session.remove()
+
+    # Выход на работу, повторная фиксация другим сотрудником в другом месяце
+    assert recruiter.post(f"/candidates/{a}/start", data={"start_date": "2026-09-14", "partner_commission": "500",
+                                                          "recruiter_commission": "100"}).status_code == 302
+    assert recruiter.post(f"/candidates/{b}/start", data={"start_date": "2026-10-01", "partner_commission": "0",
+                                                          "recruiter_commission": "50"}).status_code == 302
+    assert coordinator.post(f"/candidates/{a}/start", data={"start_date": "2026-10-03", "partner_commission": "650",
+                                                            "recruiter_commission": "120"}).status_code == 302
+
+    # Смена статуса (с трудоустройством и без), удаление, массовая смена статуса
+    assert recruiter.post(f"/candidates/{b}/status", data={"status": "Не отработал"}).status_code == 302
+    assert recruiter.post(f"/candidates/{c}/status", data={"status": "Не вышел"}).status_code == 302
+    assert coordinator.post(f"/candidates/{a}/delete").status_code == 302
+    assert recruiter.post("/candidates/bulk-status",
+                          data={"status": "Отработал месяц", "candidate_ids": [str(b), str(c), str(d)]}
+                          ).status_code == 302
+
+    # Загрузка списком
+    csv_file = io.BytesIO("ФИО;Телефон;Пол\nKPI Импорт 1;+48 700 200 001;м\nKPI Импорт 2;;м\n".encode())
+    r = partner.post("/candidates/import", data={"job_id": str(job_b), "file": (csv_file, "list.csv")},
+                     content_type="multipart/form-data")
+    assert r.status_code == 200
+
+    with app.app_context():
+        assert len(_candidate_ids(refs["partner"])) == 6
+        actual = _kpi_rows(refs["partner"])
+        expected = _rebuilt_rows(refs["partner"])
+        db.session.remove()
+    assert actual == expected
+    # Удалённый кандидат не считается подачей, но его выход на работу остаётся
+    assert sum(row[4] for row in actual) == 5
+    assert sum(row[5] for row in actual) == 2
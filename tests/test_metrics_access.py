@@ -0,0 +1,34 @@
+"""/metrics закрыт по умолчанию: без METRICS_TOKEN его нет, с токеном — только по Bearer."""
+import pytest
+
+
+@pytest.fixture
+def metrics_token(app):
+    def set_token(value):
+        app.config["METRICS_TOKEN"] = value
+    yield set_token
+    app.config["METRICS_TOKEN"] = ""
+
+
+def test_metrics_hidden_without_token(app, metrics_token):
+    metrics_token("")
+    r = app.test_client().get("/metrics")
+    assert r.status_code == 404
+    assert b"crm_" not in r.get_data()
+
+
+@pytest.mark.parametrize("header", [None, "Bearer wrong", "s3cret", "Bearer s3cret "])
+def test_metrics_rejects_wrong_token(app, metrics_token, header):
+    metrics_token("s3cret")
+    headers = {"Authorization": header} if header else {}
+    r = app.test_client().get("/metrics", headers=headers)
+    assert r.status_code == 403
+    assert b"crm_" not in r.get_data()
+
+
+def test_metrics_with_token(app, metrics_token):
+    metrics_token("s3cret")
+    r = app.test_client().get("/metrics", headers={"Authorization": "Bearer s3cret"})
+    assert r.status_code == 200
+    assert r.headers["Content-Type"].startswith("text/plain")
+    assert b"crm_inbox_size" in r.get_data()
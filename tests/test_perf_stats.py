@@ -0,0 +1,86 @@
+"""/admin/perf строится из общих для всех воркеров метрик, а не из памяти одного воркера."""
+import sqlite3
+
+import pytest
+
+import metrics
+import perf
+from config import Config
+from models import User, db
+
+
+def _other_worker_requests(endpoint, totals, sql_count=2):
+    """Приращения, которые слил бы в общий файл другой воркер gunicorn."""
+    rows = {}
+
+    def add(name, labels, value):
+        key = (name, metrics._format_labels(labels))
+        rows[key] = rows.get(key, 0.0) + value
+
+    for total in totals:
+        for le in metrics.LATENCY_BUCKETS:
+            if total <= le:
+                add("crm_request_duration_seconds_bucket", {"endpoint": endpoint, "le": le}, 1)
+        add("crm_request_duration_seconds_bucket", {"endpoint": endpoint, "le": "+Inf"}, 1)
+        add("crm_request_duration_seconds_sum", {"endpoint": endpoint}, total)
+        add("crm_request_duration_seconds_count", {"endpoint": endpoint}, 1)
+        add("crm_request_sql_queries_total", {"endpoint": endpoint}, sql_count)
+    conn = sqlite3.connect(Config.METRICS_DB_PATH)
+    with conn:
+        conn.executemany(
+            "INSERT INTO metric_samples (name, labels, value) VALUES (?, ?, ?) "
+            "ON CONFLICT(name, labels) DO UPDATE SET value = value + excluded.value",
+            [(name, labels, value) for (name, labels), value in rows.items()],
+        )
+    conn.close()
+
+
+@pytest.fixture
+def clean_stats(app):
+    perf.reset_stats()
+    yield
+    perf.reset_stats()
+
+
+def test_quantile_interpolates_within_bucket():
+    buckets = [(0.1, 50), (0.5, 100), (float("inf"), 100)]
+    assert perf._quantile(0.5, buckets) == pytest.approx(0.1)
+    assert perf._quantile(0.75, buckets) == pytest.approx(0.3)
+    assert perf._quantile(0.25, buckets) == pytest.approx(0.05)
+    # В бакете +Inf — верхняя конечная граница
+    assert perf._quantile(0.99, [(0.1, 1), (float("inf"), 10)]) == pytest.approx(0.1)
+    assert perf._quantile(0.5, []) == 0.0
+
+
+def test_stats_merge_all_workers(clean_stats):
+    # Этот воркер: 10 быстрых запросов; другой воркер: 10 медленных
+    for _ in range(10):
+        metrics._on_request("jobs.jobs", {"total": 0.004, "sql_count": 4, "sql_time": 0.001, "tpl_time": 0.002})
+    _other_worker_requests("jobs.jobs", [2.0] * 10, sql_count=4)
+
+    (row,) = [s for s in perf.endpoint_stats() if s["endpoint"] == "jobs.jobs"]
+    assert row["count"] == 20
+    assert row["avg_sql_count"] == 4.0
+    assert row["p50_ms"] <= 5.0
+    assert 1000.0 < row["p95_ms"] <= 2500.0
+    assert row["avg_ms"] == pytest.approx((0.004 * 10 + 2.0 * 10) / 20 * 1000, abs=0.1)
+
+
+def test_reset_clears_shared_stats(clean_stats):
+    _other_worker_requests("news.news", [0.01])
+    assert any(s["endpoint"] == "news.news" for s in perf.endpoint_stats())
+    perf.reset_stats()
+    assert not any(s["endpoint"] == "news.news" for s in perf.endpoint_stats())
+
+
+def test_admin_perf_page_shows_other_workers(app, login, clean_stats):
+    with app.app_context():
+        coordinator = User(name="Координатор", email="coord@perf.test", password_hash="", role="coordinator")
+        db.session.add(coordinator)
+        db.session.commit()
+        coordinator_id = coordinator.id
+        db.session.remove()
+    _other_worker_requests("candidates.candidates", [0.3] * 5)
+    html = login(coordinator_id).get("/admin/perf").get_data(as_text=True)
+    assert "candidates.candidates" in html
+    assert "по всем воркерам" in html
@@ -0,0 +1,45 @@
+"""Регрессия планов: горячие запросы не читают таблицы целиком (см. query_plans.py)."""
+import pytest
+from sqlalchemy import create_engine
+
+import query_plans
+from models import Base
+
+
+@pytest.fixture(scope="module")
+def engine():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    return engine
+
+
+def test_hot_queries_have_no_full_scans(engine):
+    assert query_plans.check(engine, verbose=False) == []
+
+
+def test_builder_queries_are_keyset_pages():
+    # Проверяется SQL построителей блюпринтов, а не копия: страница — keyset с LIMIT
+    for name, sql in query_plans.builder_sql():
+        assert "ORDER BY candidates.created_at DESC, candidates.id DESC" in sql, name
+        assert "LIMIT" in sql, name
+        if name.endswith("next page"):
+            assert "(candidates.created_at, candidates.id) <" in sql, name
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT * FROM placements WHERE partner_paid = 0",
+    # Полный проход по индексу тоже читает всю таблицу
+    "SELECT * FROM candidates ORDER BY created_at DESC",
+    "SELECT partner_id, SUM(submissions) FROM kpi_monthly GROUP BY partner_id",
+])
+def test_index_scans_are_reported(engine, sql):
+    with engine.connect() as conn:
+        _plan, scans = query_plans.full_scans(conn, "test", sql, {})
+    assert scans
+
+
+def test_top_n_scan_allowed_only_for_listed_queries(engine):
+    sql = "SELECT * FROM placements ORDER BY created_at DESC LIMIT 50"
+    with engine.connect() as conn:
+        assert query_plans.full_scans(conn, "dashboard: recent placements", sql, {})[1] == []
+        assert query_plans.full_scans(conn, "some other query", sql, {})[1] == ["placements"]
@@ -0,0 +1,82 @@
+"""Лента кандидата: комментарии и журнал действий (candidate_logs) одним списком.
+
+Лента отдаётся страницами «новые сверху» с keyset-курсором, как списки
+кандидатов (см. pagination.py). Каждая ветка (комментарии, журнал) читает
+не больше limit + 1 строк по индексу (candidate_id, created_at) от курсора,
+затем ветки сливаются и обрезаются до limit. Поэтому страница стоит одинаково
+и для нового кандидата, и для кандидата с тысячами записей.
+
+id комментариев и записей журнала пересекаются, поэтому в курсор идёт
+составной ключ uid = id * 2 + вид (1 — комментарий, 0 — журнал).
+
+Записи журнала, дублирующие комментарий (добавление комментария, смена
+статуса — у неё есть системный комментарий), в ленту не попадают.
+"""
+from sqlalchemy import and_, literal, or_, select, union_all
+
+from models import CandidateComment, CandidateLog, User, db
+from pagination import Page, decode_cursor, encode_cursor
+
+TIMELINE_PAGE_SIZE = 30
+TIMELINE_MAX_PAGE = 100
+
+COMMENT, LOG = "comment", "log"
+_KIND_BIT = {COMMENT: 1, LOG: 0}
+
+# Действия журнала, для которых уже есть комментарий с тем же текстом
+MIRRORED_LOG_ACTIONS = ("comment_add", "status_change")
+
+LOG_ACTION_LABELS = {
+    "candidate_deleted": "Кандидат удалён",
+    "comment_add": "Комментарий",
+    "status_change": "Смена статуса",
+}
+
+
+def _branch(model, kind: str, author_col, text_col, action_col, candidate_id: int, after, limit: int, *where):
+    uid = model.id * 2 + _KIND_BIT[kind]
+    query = (
+        select(
+            literal(kind).label("kind"),
+            model.id.label("id"),
+            uid.label("uid"),
+            model.created_at.label("created_at"),
+            author_col.label("author_id"),
+            User.name.label("author_name"),
+            text_col.label("text"),
+            action_col.label("action"),
+        )
+        .outerjoin(User, User.id == author_col)
+        .where(model.candidate_id == candidate_id, *where)
+    )
+    if after:
+        created_at, after_uid = after
+        # created_at <= курсора — граница диапазона по индексу, uid разбирает совпадения
+        query = query.where(
+            model.created_at <= created_at,
+            or_(model.created_at < created_at, and_(model.created_at == created_at, uid < after_uid)),
+        )
+    return query.order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1).subquery()
+
+
+def candidate_timeline(candidate_id: int, cursor: str | None = None, limit: int = TIMELINE_PAGE_SIZE) -> Page:
+    """Страница ленты кандидата после курсора: Page(rows=[mapping, ...], next_cursor).
+
+    Строка: kind ("comment" / "log"), id, uid, created_at, author_id, author_name, text, action.
+    """
+    limit = min(max(limit, 1), TIMELINE_MAX_PAGE)
+    after = decode_cursor(cursor)
+    comments = _branch(CandidateComment, COMMENT, CandidateComment.author_id, CandidateComment.text,
+                       literal(None), candidate_id, after, limit)
+    logs = _branch(CandidateLog, LOG, CandidateLog.user_id, CandidateLog.details, CandidateLog.action,
+                   candidate_id, after, limit, CandidateLog.action.notin_(MIRRORED_LOG_ACTIONS))
+    merged = union_all(select(comments), select(logs)).subquery()
+    rows = db.session.execute(
+        select(merged).order_by(merged.c.created_at.desc(), merged.c.uid.desc()).limit(limit + 1)
+    ).mappings().all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["created_at"], rows[-1]["uid"])
+    return Page(list(rows), next_cursor)